@@ -1,255 +1,318 @@
+import time
+INICIO_PROCESSO = time.perf_counter()  # referência do orçamento de inicialização, antes dos demais imports
+
 import tkinter as tk
-from tkinter import messagebox, ttk
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas as pdf_canvas
-import sqlite3
+from tkinter import filedialog, messagebox, ttk
 import datetime
+import csv
+import os
+import queue
+import argparse
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from atendimento_core import (AtendimentoController, AtendimentoModel, CAMINHO_BANCO, ORDEM_PRIORIDADES, STATUS_ATENDIMENTO,
+                              TAMANHO_PAGINA, diagnostico, formatar_cpf, normalizar_cpf, registro)
+
+# Intervalo (ms) em que a interface verifica os resultados das consultas em segundo plano
+INTERVALO_RESULTADOS_MS = 30
+
+# Intervalo (ms) entre as verificações de alterações feitas no banco pelas outras telas e estações
+INTERVALO_SINCRONIZACAO_MS = 2000
+
+# Orçamento de inicialização: tempo (ms) até a primeira tela ser desenhada
+ORCAMENTO_INICIALIZACAO_MS = 300
+
+# Quantidade de telas mantidas construídas para navegação rápida; as mais antigas são destruídas
+LIMITE_VIEWS_EM_CACHE = 4
+
+# Formatos oferecidos na tela de relatórios e na exportação do histórico (extensão do arquivo gerado)
+FORMATOS_RELATORIO = {"PDF": "pdf", "CSV": "csv", "JSON Lines": "jsonl", "XLSX": "xlsx"}
+TIPOS_ARQUIVO_EXPORTACAO = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Excel", "*.xlsx")]
+TIPOS_ARQUIVO_ANEXO = [("Documentos e imagens", "*.pdf *.jpg *.jpeg *.png *.tif *.tiff *.doc *.docx"), ("Todos os arquivos", "*.*")]
+
+
+def _formatar_tamanho(tamanho):
+    for unidade in ("B", "KB", "MB"):
+        if tamanho < 1024:
+            return f"{tamanho:.0f} {unidade}"
+        tamanho /= 1024
+    return f"{tamanho:.1f} GB"
+
+
+def _abrir_no_sistema(caminho):
+    # Abre o arquivo com o programa padrão do sistema operacional
+    if sys.platform.startswith("win"):
+        os.startfile(caminho)
+    else:
+        import subprocess
+        subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", caminho])
+
+# Executor de consultas - roda as leituras do banco fora da thread do Tk
+# Cada thread do pool tem o seu próprio controller (e conexão); os resultados voltam para a interface pelo root.after
+class ExecutorConsultas:
+    def __init__(self, root, criar_controller, num_threads=2):
+        self.root = root
+        self.criar_controller = criar_controller
+        self._locais = threading.local()
+        self._resultados = queue.Queue()
+        self._chamadas = queue.Queue()
+        self._pendentes = {}  # chave -> última tarefa enviada com essa chave
+        self._pool = ThreadPoolExecutor(
+            max_workers=num_threads, initializer=self._iniciar_thread, thread_name_prefix="consultas"
+        )
+        self.root.after(INTERVALO_RESULTADOS_MS, self._processar_resultados)
+
+    def _iniciar_thread(self):
+        self._locais.controller = self.criar_controller()
+
+    def _executar(self, tarefa):
+        return tarefa(self._locais.controller)
+
+    def submeter(self, tarefa, ao_concluir, ao_falhar=None, chave=None):
+        # tarefa recebe o controller da thread; ao_concluir e ao_falhar rodam na thread do Tk
+        # Uma nova tarefa com a mesma chave torna a anterior obsoleta (ex.: o usuário mudou o filtro)
+        if chave is not None and chave in self._pendentes:
+            self._pendentes[chave].cancel()
+        futuro = self._pool.submit(self._executar, tarefa)
+        if chave is not None:
+            self._pendentes[chave] = futuro
+        futuro.add_done_callback(lambda f: self._resultados.put((f, chave, ao_concluir, ao_falhar)))
+        return futuro
+
+    def chamar_na_interface(self, funcao, *args):
+        # Pode ser chamado de qualquer thread; a função roda depois na thread do Tk (ex.: progresso)
+        self._chamadas.put((funcao, args))
+
+    def cancelar(self, chave):
+        futuro = self._pendentes.pop(chave, None)
+        if futuro is not None:
+            futuro.cancel()
+
+    def cancelar_de(self, dono):
+        # Cancela as tarefas de um dono: chave igual a ele ou uma tupla (dono, ...)
+        for chave in list(self._pendentes):
+            if chave is dono or (isinstance(chave, tuple) and chave[0] is dono):
+                self.cancelar(chave)
+
+    def _processar_resultados(self):
+        while True:
+            try:
+                funcao, args = self._chamadas.get_nowait()
+            except queue.Empty:
+                break
+            self._chamar_com_seguranca(funcao, *args)
+        while True:
+            try:
+                futuro, chave, ao_concluir, ao_falhar = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            if futuro.cancelled():
+                continue
+            if chave is not None:
+                # Descarta resultados de tarefas que já foram substituídas por outra mais nova
+                if self._pendentes.get(chave) is not futuro:
+                    continue
+                del self._pendentes[chave]
+            erro = futuro.exception()
+            if erro is None:
+                self._chamar_com_seguranca(ao_concluir, futuro.result())
+            elif ao_falhar is not None:
+                self._chamar_com_seguranca(ao_falhar, erro)
+            else:
+                messagebox.showerror("Erro", f"Falha ao consultar o banco de dados: {erro}")
+        self.root.after(INTERVALO_RESULTADOS_MS, self._processar_resultados)
 
-# Model - Responsável pela interação com o banco de dados
-class AtendimentoModel:
-    def __init__(self):
-        self.conexao = sqlite3.connect('atendimentos.db')
-        self.cursor = self.conexao.cursor()
-        self._criar_tabelas()
+    def _chamar_com_seguranca(self, funcao, *args):
+        # Um erro em um callback (ex.: tela já destruída) não pode interromper a entrega dos demais
+        try:
+            funcao(*args)
+        except Exception:
+            self.root.report_callback_exception(*sys.exc_info())
+
+    def encerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Tabela paginada - carrega a próxima página somente quando a rolagem chega perto do fim
+# Com consultar_alteracoes, a tabela também acompanha as gravações feitas no banco (nesta ou em
+# outra estação), atualizando no lugar apenas as linhas alteradas
+class CarregadorPaginado:
+    def __init__(self, treeview, scrollbar, executor, consultar_pagina, converter_linha, rotulo_status=None,
+                 tamanho_pagina=TAMANHO_PAGINA, consultar_alteracoes=None, ao_sincronizar=None, nome="Tabela"):
+        self.treeview = treeview
+        self.scrollbar = scrollbar
+        self.executor = executor
+        self.consultar_pagina = consultar_pagina  # função (controller, cursor, tamanho) -> (linhas, próximo cursor)
+        self.converter_linha = converter_linha    # função linha -> valores exibidos na tabela
+        self.rotulo_status = rotulo_status        # label opcional para indicar o carregamento
+        self.tamanho_pagina = tamanho_pagina
+        self.consultar_alteracoes = consultar_alteracoes  # função (controller, versão) -> controller.consultar_alteracoes(...)
+        self.ao_sincronizar = ao_sincronizar              # chamada depois de aplicar alterações na tabela
+        self.nome = nome                                  # identifica a tabela no diagnóstico
+        self.proximo_cursor = None
+        self.fim = True
+        self.versao = None   # versão do registro de alterações refletida na tabela
+        self._chaves = {}    # item da tabela -> chave de ordenação (data_horario, id)
+        self._carregando = False
+        self._sincronizando = False
+        self.treeview.configure(yscrollcommand=self._ao_rolar)
+        self.scrollbar.configure(command=self.treeview.yview)
+        if self.consultar_alteracoes is not None:
+            self._agendamento = self.treeview.after(INTERVALO_SINCRONIZACAO_MS, self._verificar_alteracoes)
+            self.treeview.bind("<Destroy>", lambda evento: self.treeview.after_cancel(self._agendamento), add="+")
+
+    def recarregar(self):
+        self.treeview.delete(*self.treeview.get_children())
+        self._chaves.clear()
+        self.proximo_cursor = None
+        self.versao = None
+        self.fim = False
+        self._carregando = False
+        self.carregar_mais()
+
+    def carregar_mais(self):
+        if self.fim or self._carregando:
+            return
+        self._carregando = True
+        self._mostrar_status("Carregando...")
+        self._inicio_pagina = time.perf_counter()
+        cursor = self.proximo_cursor
+        tamanho = self.tamanho_pagina
+        sincronizar = self.consultar_alteracoes is not None and cursor is None
+        self.executor.submeter(
+            lambda controller: self._buscar_pagina(controller, cursor, tamanho, sincronizar),
+            self._receber_pagina, self._falhar, chave=self
+        )
 
-    def _criar_tabelas(self):
-        
-        # Cria a tabela de municipes
-        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='municipes'")
-        if not self.cursor.fetchone():
-            self.cursor.execute('''
-            CREATE TABLE municipes (
-                cpf TEXT PRIMARY KEY,
-                nome TEXT NOT NULL,
-                endereco TEXT,
-                bairro TEXT NOT NULL DEFAULT 'Bairro Não Informado',
-                telefone TEXT NOT NULL,
-                rg TEXT,
-                titulo_eleitor TEXT,
-                zona TEXT,
-                secao TEXT
-            )
-            ''')
-            print("Tabela 'municipes' criada com sucesso.")
-
-        # Cria a tabela de atendimentos
-        # Verificar e criar a tabela de atendimentos, se não existir
-        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='atendimentos'")
-        if not self.cursor.fetchone():
-            self.cursor.execute('''
-            CREATE TABLE atendimentos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cpf TEXT NOT NULL,
-                tipo_pedido TEXT NOT NULL,
-                descricao TEXT,
-                anexos TEXT,
-                data_horario TEXT NOT NULL,
-                prazo_resolucao TEXT,
-                assessor TEXT,
-                prioridade TEXT NOT NULL DEFAULT 'Normal',
-                status TEXT NOT NULL DEFAULT 'Pendente',
-                FOREIGN KEY (cpf) REFERENCES municipes (cpf)
-            )
-            ''')
-        print("Tabela 'atendimentos' criada com sucesso.")
-
-        # Confirma as alterações no banco de dados
-        self.conexao.commit()
-        print("Tabelas criadas e prontas para uso.")
-
-
-
-    def registrar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
-        self.cursor.execute('''
-        INSERT OR IGNORE INTO municipes (cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao))
-        self.conexao.commit()
-
-    def buscar_municipes(self, termo):
-        self.cursor.execute('''
-        SELECT * FROM municipes WHERE nome LIKE ? OR cpf LIKE ?
-        ''', (f"%{termo}%", f"%{termo}%"))
-        return self.cursor.fetchall()
-    
-    def buscar_municipe_por_cpf(self, cpf):
-        self.cursor.execute('''
-            SELECT cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao 
-            FROM municipes 
-            WHERE cpf = ?
-        ''', (cpf,))
-        return self.cursor.fetchone()
-
-
-    def atualizar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
-        self.cursor.execute('''
-        UPDATE municipes
-        SET nome = ?, endereco = ?, bairro = ?, telefone = ?, rg = ?, titulo_eleitor = ?, zona = ?, secao = ?
-        WHERE cpf = ?
-        ''', (nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao, cpf))
-        self.conexao.commit()
-
-    def registrar_atendimento(self, cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status):
-        self.cursor.execute('''
-        INSERT INTO atendimentos (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status))
-        self.conexao.commit()
-
-    def consultar_atendimentos(self, filtro_nome=None, filtro_cpf=None):
-        query = '''
-        SELECT 
-            a.id,               -- 0: ID do atendimento
-            m.cpf,              -- 1: CPF do munícipe
-            m.nome,             -- 2: Nome do munícipe
-            a.tipo_pedido,      -- 3: Tipo de pedido
-            a.descricao,        -- 4: Descrição do atendimento
-            a.data_horario,     -- 5: Data e horário do atendimento
-            a.prazo_resolucao,  -- 6: Prazo para resolução
-            a.assessor,         -- 7: Assessor responsável
-            a.status,           -- 8: Status do atendimento
-            a.prioridade        -- 9: Prioridade do atendimento
-        FROM atendimentos a
-        JOIN municipes m ON a.cpf = m.cpf
-        '''
-        parametros = []
-        condicoes = []
-
-        # Filtros opcionais
-        if filtro_cpf:
-            condicoes.append("m.cpf = ?")
-            parametros.append(filtro_cpf)
-        if filtro_nome:
-            condicoes.append("m.nome LIKE ?")
-            parametros.append(f"%{filtro_nome}%")
-        if condicoes:
-            query += " WHERE " + " AND ".join(condicoes)
-
-        # Adicionando a cláusula ORDER BY
-        query += " ORDER BY a.data_horario DESC"
-
-        self.cursor.execute(query, parametros)
-        return self.cursor.fetchall()
-
-
-    def atualizar_atendimento(self, atendimento_id, cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade):
-        self.cursor.execute('''
-        UPDATE atendimentos
-        SET cpf = ?, tipo_pedido = ?, descricao = ?, status = ?, prazo_resolucao = ?, assessor = ?, prioridade = ?
-        WHERE id = ?
-        ''', (cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade, atendimento_id))
-        self.conexao.commit()
-
-    def consultar_municipes(self):
-        self.cursor.execute('''
-        SELECT cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao FROM municipes
-        ''')
-        return self.cursor.fetchall()
-
-    def fechar_conexao(self):
-        self.conexao.close()
-
-# Controller - Responsável pela lógica da aplicação
-class AtendimentoController:
-    def __init__(self, model):
-        self.model = model
-
-    def registrar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
-        self.model.registrar_municipe(cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
-
-    def buscar_municipes(self, termo):
-        return self.model.buscar_municipes(termo)
-    
-    def buscar_municipe_por_cpf(self, cpf):
-        return self.model.buscar_municipe_por_cpf(cpf)
-
-    def atualizar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
-        self.model.atualizar_municipe(cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
-
-    def registrar_atendimento(self, cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status="Pendente"):
-        self.model.registrar_atendimento(cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status)
-
-    def consultar_atendimentos(self, filtro_nome=None, filtro_cpf=None):
-        return self.model.consultar_atendimentos(filtro_nome, filtro_cpf)
-
-    def consultar_todos_atendimentos(self):
-        return self.model.consultar_atendimentos()  # Sem filtros retorna todos os atendimentos
-
-    def atualizar_atendimento(self, atendimento_id, cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade):
-        self.model.atualizar_atendimento(atendimento_id, cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade)
-
-    def consultar_municipes(self):
-        return self.model.consultar_municipes()
-
-    def gerar_relatorio_pdf(self, atendimentos, caminho_pdf="relatorio_atendimentos.pdf"):
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-
-        c = canvas.Canvas(caminho_pdf, pagesize=letter)
-        c.setFont("Helvetica", 10)
-        c.drawString(100, 750, "Relatório Completo de Atendimentos")
-        c.drawString(100, 735, "-" * 80)
-
-        y = 720
-        for atendimento in atendimentos:
-            try:
-                # Atualize os índices de acordo com a consulta SQL
-                c.drawString(100, y, f"ID: {atendimento[0]}")                 # ID
-                c.drawString(100, y - 15, f"CPF: {atendimento[1]}")           # CPF
-                c.drawString(100, y - 30, f"Nome: {atendimento[2]}")          # Nome
-                c.drawString(100, y - 45, f"Tipo de Pedido: {atendimento[3]}")# Tipo de Pedido
-                c.drawString(100, y - 60, f"Descrição: {atendimento[4]}")     # Descrição
-                c.drawString(100, y - 75, f"Data/Horário: {atendimento[5]}")  # Data e Horário
-                c.drawString(100, y - 90, f"Prazo: {atendimento[6]}")         # Prazo
-                c.drawString(100, y - 105, f"Assessor: {atendimento[7]}")     # Assessor
-                c.drawString(100, y - 120, f"Status: {atendimento[8]}")       # Status
-                c.drawString(100, y - 135, f"Prioridade: {atendimento[9]}")   # Prioridade
-                y -= 160
-
-                # Verifique se a página precisa ser mudada
-                if y < 50:
-                    c.showPage()
-                    c.setFont("Helvetica", 10)
-                    y = 750
-            except IndexError:
-                print(f"Erro ao acessar os dados do atendimento: {atendimento}")
-
-        c.save()
-        print(f"Relatório salvo em {caminho_pdf}")
-
-    
-    def gerar_relatorio_municipe(self, cpf):
-        return self.model.consultar_atendimentos(filtro_cpf=cpf)
-
-    def gerar_relatorio_tipo_pedido(self, tipo_pedido):
-        query = '''
-        SELECT a.id, m.nome, m.cpf, a.tipo_pedido, a.status, a.prioridade, m.bairro
-        FROM atendimentos a
-        JOIN municipes m ON a.cpf = m.cpf
-        WHERE a.tipo_pedido = ?
-        '''
-        self.model.cursor.execute(query, (tipo_pedido,))
-        return self.model.cursor.fetchall()
-
-    def gerar_relatorio_bairro(self, bairro):
-        query = '''
-        SELECT a.id, m.nome, m.cpf, a.tipo_pedido, a.status, a.prioridade, m.bairro
-        FROM atendimentos a
-        JOIN municipes m ON a.cpf = m.cpf
-        WHERE m.bairro = ?
-        '''
-        self.model.cursor.execute(query, (bairro,))
-        return self.model.cursor.fetchall()
+    def _buscar_pagina(self, controller, cursor, tamanho, sincronizar):
+        # A versão é lida antes da primeira página; o que mudar entre as duas leituras
+        # apenas é aplicado de novo na próxima sincronização
+        versao = controller.versao_alteracoes() if sincronizar else None
+        return versao, self.consultar_pagina(controller, cursor, tamanho)
+
+    def _receber_pagina(self, resultado):
+        versao, (linhas, self.proximo_cursor) = resultado
+        if versao is not None:
+            self.versao = versao
+        for linha in linhas:
+            if str(linha[0]) not in self._chaves:  # pode já ter chegado por uma sincronização
+                self._inserir(linha, "end")
+        self.fim = self.proximo_cursor is None
+        self._carregando = False
+        self._mostrar_status("")
+        # Tempo percebido pelo usuário: do pedido da página até as linhas aparecerem na tabela
+        diagnostico.registrar_tela(f"{self.nome}: página", time.perf_counter() - self._inicio_pagina)
+
+    def _inserir(self, linha, posicao):
+        # O id do atendimento identifica o item, para que a sincronização o encontre depois
+        item = str(linha[0])
+        self.treeview.insert("", posicao, iid=item, values=self.converter_linha(linha))
+        self._chaves[item] = (linha[5], linha[0])
+
+    def inserir(self, linha, posicao):
+        # Linha incluída pela própria tela (ex.: cartão movido no quadro de tarefas)
+        if str(linha[0]) not in self._chaves:
+            self._inserir(linha, posicao)
+
+    def remover(self, item):
+        if item in self._chaves:
+            self.treeview.delete(item)
+            del self._chaves[item]
+
+    def sincronizar(self):
+        # Busca as alterações desde a última versão vista (sem efeito se já houver uma busca em andamento)
+        if self.consultar_alteracoes is None or self.versao is None or self._carregando or self._sincronizando:
+            return
+        self._sincronizando = True
+        desde = self.versao
+        self.executor.submeter(
+            lambda controller: self.consultar_alteracoes(controller, desde),
+            self._aplicar_alteracoes, self._falhar_sincronizacao, chave=(self, "alteracoes")
+        )
+
+    def _verificar_alteracoes(self):
+        # Repetido enquanto a tabela existir; só consulta o banco quando ela está visível
+        if self.treeview.winfo_ismapped():
+            self.sincronizar()
+        self._agendamento = self.treeview.after(INTERVALO_SINCRONIZACAO_MS, self._verificar_alteracoes)
+
+    def _aplicar_alteracoes(self, resultado):
+        self._sincronizando = False
+        if self.versao is None:
+            return  # a tabela foi recarregada enquanto as alterações eram buscadas
+        if resultado is None:
+            self.recarregar()
+            return
+        versao, ids, linhas = resultado
+        if versao <= self.versao:
+            return
+        self.versao = versao
+        inicio = time.perf_counter()
+
+        atuais = {str(linha[0]): linha for linha in linhas}
+        # Excluídos ou que deixaram de atender aos filtros da tela
+        for atendimento_id in ids:
+            item = str(atendimento_id)
+            if item not in atuais and item in self._chaves:
+                self.treeview.delete(item)
+                del self._chaves[item]
+        for item, linha in atuais.items():
+            chave = (linha[5], linha[0])
+            if self._chaves.get(item) == chave:
+                self.treeview.item(item, values=self.converter_linha(linha))
+                continue
+            if item in self._chaves:
+                # A data mudou: o item muda de posição
+                self.treeview.delete(item)
+                del self._chaves[item]
+            # Linhas além da última página carregada chegam depois, pela paginação
+            if self.fim or chave > tuple(self.proximo_cursor):
+                self._inserir(linha, self._posicao(chave))
+        diagnostico.registrar_tela(f"{self.nome}: sincronização", time.perf_counter() - inicio)
+        if self.ao_sincronizar is not None:
+            self.ao_sincronizar()
+
+    def _posicao(self, chave):
+        # Posição na ordem da tabela (data_horario, id) decrescente
+        for posicao, item in enumerate(self.treeview.get_children()):
+            if self._chaves[item] < chave:
+                return posicao
+        return "end"
+
+    def _falhar_sincronizacao(self, erro):
+        # Falhas da verificação periódica não interrompem o uso; a próxima verificação tenta de novo
+        self._sincronizando = False
+
+    def _falhar(self, erro):
+        self._carregando = False
+        self._mostrar_status("")
+        messagebox.showerror("Erro", f"Falha ao carregar os atendimentos: {erro}")
+
+    def _mostrar_status(self, texto):
+        if self.rotulo_status is not None:
+            self.rotulo_status.config(text=texto)
+
+    def _ao_rolar(self, primeiro, ultimo):
+        self.scrollbar.set(primeiro, ultimo)
+        # Busca a próxima página quando o último item visível está nos 10% finais da tabela
+        if not self.fim and float(ultimo) > 0.9:
+            self.treeview.after_idle(self.carregar_mais)
 
 
 # Telas do sistema
 # Tela de Registro de Atendimento
 class RegistroAtendimentoView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
         self.municipe_dados = None
+        # Munícipes da última busca, na ordem da lista de seleção
+        self.municipes_encontrados = []
         self._construir_interface()
 
     def _construir_interface(self):
@@ -289,7 +352,7 @@ class RegistroAtendimentoView(ttk.Frame):
         self.entrada_descricao.grid(row=3, column=1, pady=2)
 
         # Prazo de Resolução
-        ttk.Label(left_frame, text="Prazo de Resolução (em dias):").grid(row=4, column=0, sticky=tk.W, pady=2)
+        ttk.Label(left_frame, text="Prazo de Resolução (dias ou data):").grid(row=4, column=0, sticky=tk.W, pady=2)
         self.entrada_prazo_resolucao = ttk.Entry(left_frame, width=50)
         self.entrada_prazo_resolucao.grid(row=4, column=1, pady=2)
 
@@ -305,9 +368,18 @@ class RegistroAtendimentoView(ttk.Frame):
                                                 state="readonly", width=47)
         self.prioridade_dropdown.grid(row=6, column=1, pady=2)
 
+        # Anexos (gravados depois do atendimento, em segundo plano)
+        ttk.Label(left_frame, text="Anexos:").grid(row=7, column=0, sticky=tk.W, pady=2)
+        anexos_frame = ttk.Frame(left_frame)
+        anexos_frame.grid(row=7, column=1, sticky=tk.W, pady=2)
+        ttk.Button(anexos_frame, text="Selecionar Arquivos", command=self.selecionar_anexos).grid(row=0, column=0)
+        self.rotulo_anexos = ttk.Label(anexos_frame, text="Nenhum arquivo")
+        self.rotulo_anexos.grid(row=0, column=1, padx=5)
+        self.arquivos_anexos = []
+
         # Botões
-        ttk.Button(left_frame, text="Salvar Atendimento", command=self.salvar_atendimento).grid(row=7, column=1, sticky=tk.W, pady=10)
-        ttk.Button(left_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=8, column=1, sticky=tk.W, pady=10)
+        ttk.Button(left_frame, text="Salvar Atendimento", command=self.salvar_atendimento).grid(row=8, column=1, sticky=tk.W, pady=10)
+        ttk.Button(left_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=9, column=1, sticky=tk.W, pady=10)
 
         # ===================== Right Frame =====================
         ttk.Label(right_frame, text="Informações do Munícipe", font=("Helvetica", 14)).grid(row=0, column=0, columnspan=2, pady=10)
@@ -339,20 +411,29 @@ class RegistroAtendimentoView(ttk.Frame):
     def buscar_municipe(self):
         termo = self.entrada_busca.get()
         if termo:
-            municipes = self.controller.buscar_municipes(termo)
-            self.combo_municipes["values"] = [f"{m[1]} - {m[0]}" for m in municipes]  # Nome - CPF
-            if municipes:
-                self.combo_municipes.set("Selecione um munícipe")
-            else:
-                messagebox.showinfo("Atenção", "Nenhum munícipe encontrado.")
+            # A busca roda em segundo plano; uma nova busca descarta a anterior
+            self.combo_municipes.set("Buscando...")
+            self.executor.submeter(
+                lambda controller: controller.buscar_municipes(termo),
+                self._exibir_municipes_encontrados, chave=self
+            )
         else:
             messagebox.showerror("Erro", "Por favor, insira um nome ou CPF para buscar.")
 
+    def _exibir_municipes_encontrados(self, municipes):
+        self.municipes_encontrados = municipes
+        self.combo_municipes["values"] = [f"{m[1]} - {formatar_cpf(m[0])}" for m in municipes]  # Nome - CPF
+        if municipes:
+            self.combo_municipes.set("Selecione um munícipe")
+        else:
+            self.combo_municipes.set("")
+            messagebox.showinfo("Atenção", "Nenhum munícipe encontrado.")
+
     def selecionar_municipe(self, event):
-        selecionado = self.combo_municipes.get()
-        if selecionado:
-            cpf = selecionado.split(" - ")[1]  # Extrai o CPF do texto "Nome - CPF"
-            self.municipe_dados = self.controller.buscar_municipes(cpf)[0]  # Retorna o primeiro registro encontrado
+        # A busca já trouxe o cadastro completo: a posição na lista indica qual foi escolhido
+        indice = self.combo_municipes.current()
+        if 0 <= indice < len(self.municipes_encontrados):
+            self.municipe_dados = self.municipes_encontrados[indice]
             self.preencher_informacoes_municipe()
 
     def preencher_informacoes_municipe(self):
@@ -379,19 +460,56 @@ class RegistroAtendimentoView(ttk.Frame):
             messagebox.showerror("Erro", "Por favor, preencha todos os campos obrigatórios.")
             return
 
-        self.controller.registrar_atendimento(
+        atendimento_id = self.controller.registrar_atendimento(
             self.municipe_dados[0], tipo_pedido, descricao, "", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             self.entrada_prazo_resolucao.get(), self.entrada_assessor.get(), prioridade
         )
-        messagebox.showinfo("Sucesso", "Atendimento registrado com sucesso!")
+        mensagem = "Atendimento registrado com sucesso!"
+        if self.arquivos_anexos:
+            arquivos = list(self.arquivos_anexos)
+            self.executor.submeter(
+                lambda controller: [controller.anexar_arquivo(atendimento_id, caminho) for caminho in arquivos],
+                lambda hashes: None,
+                lambda erro: messagebox.showerror("Erro", f"Falha ao gravar os anexos do atendimento {atendimento_id}: {erro}")
+            )
+            mensagem += f"\n{len(arquivos)} anexo(s) sendo gravado(s) em segundo plano."
+        messagebox.showinfo("Sucesso", mensagem)
+        self.limpar_formulario()
         self.switch_view(DashboardView)
 
+    def limpar_formulario(self):
+        # A tela é reaproveitada pela aplicação, então o próximo registro deve começar em branco
+        self.municipe_dados = None
+        for rotulo, texto in ((self.info_nome, "Nome"), (self.info_endereco, "Endereço"), (self.info_bairro, "Bairro"),
+                              (self.info_telefone, "Telefone"), (self.info_rg, "RG"),
+                              (self.info_titulo_eleitor, "Título de Eleitor"), (self.info_zona, "Zona"),
+                              (self.info_secao, "Seção")):
+            rotulo.config(text=f"{texto}: N/A")
+        self.entrada_busca.delete(0, tk.END)
+        self.municipes_encontrados = []
+        self.combo_municipes["values"] = []
+        self.combo_municipes.set("")
+        self.tipo_pedido_var.set("Selecione o tipo de pedido")
+        self.entrada_descricao.delete("1.0", tk.END)
+        self.entrada_prazo_resolucao.delete(0, tk.END)
+        self.entrada_assessor.delete(0, tk.END)
+        self.prioridade_var.set("Normal")
+        self.arquivos_anexos = []
+        self.rotulo_anexos.config(text="Nenhum arquivo")
+
+    def selecionar_anexos(self):
+        arquivos = filedialog.askopenfilenames(title="Selecionar anexos", filetypes=TIPOS_ARQUIVO_ANEXO)
+        if arquivos:
+            self.arquivos_anexos = list(arquivos)
+            self.rotulo_anexos.config(text=f"{len(arquivos)} arquivo(s) selecionado(s)")
+
 # Tela de Registro de Munícipe
 class RegistroMunicipeView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
         self._construir_interface()
 
     def _construir_interface(self):
@@ -437,6 +555,16 @@ class RegistroMunicipeView(ttk.Frame):
         ttk.Button(self, text="Salvar Munícipe", command=self.salvar_municipe).grid(row=9, column=1, sticky=tk.W, pady=10)
         ttk.Button(self, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=10, column=1, sticky=tk.W, pady=10)
 
+        # Importação em lote a partir de planilhas CSV
+        importacao_frame = ttk.Frame(self)
+        importacao_frame.grid(row=11, column=1, sticky=tk.W, pady=10)
+        ttk.Button(importacao_frame, text="Importar Munícipes (CSV)",
+                   command=lambda: self.importar_csv("municipes")).grid(row=0, column=0, padx=(0, 5))
+        ttk.Button(importacao_frame, text="Importar Atendimentos (CSV)",
+                   command=lambda: self.importar_csv("atendimentos")).grid(row=0, column=1)
+        self.rotulo_status = ttk.Label(self, text="", foreground="gray")
+        self.rotulo_status.grid(row=12, column=1, sticky=tk.W)
+
     def salvar_municipe(self):
         cpf = self.entrada_cpf.get()
         nome = self.entrada_nome.get()
@@ -447,6 +575,9 @@ class RegistroMunicipeView(ttk.Frame):
         if not (cpf and nome and telefone and bairro):
             messagebox.showerror("Erro", "Por favor, preencha todos os campos obrigatórios.")
             return
+        if normalizar_cpf(cpf) is None:
+            messagebox.showerror("Erro", "CPF inválido: confira os números digitados.")
+            return
         # Registrar o munícipe no banco
         self.controller.registrar_municipe(
             cpf, nome, self.entrada_endereco.get(), bairro, telefone,
@@ -454,14 +585,60 @@ class RegistroMunicipeView(ttk.Frame):
             self.entrada_zona.get(), self.entrada_secao.get()
         )
         messagebox.showinfo("Sucesso", "Munícipe registrado com sucesso!")
+        self.limpar_formulario()
         self.switch_view(DashboardView)
 
+    def limpar_formulario(self):
+        # A tela é reaproveitada pela aplicação, então o próximo cadastro deve começar em branco
+        for entrada in (self.entrada_cpf, self.entrada_nome, self.entrada_endereco, self.entrada_bairro,
+                        self.entrada_telefone, self.entrada_rg, self.entrada_titulo, self.entrada_zona,
+                        self.entrada_secao):
+            entrada.delete(0, tk.END)
+
+    def importar_csv(self, tipo):
+        caminho_csv = filedialog.askopenfilename(
+            title="Selecionar arquivo CSV", filetypes=[("Planilha CSV", "*.csv"), ("Todos os arquivos", "*.*")]
+        )
+        if not caminho_csv:
+            return
+
+        # A importação roda em segundo plano com a conexão da thread de consultas
+        if tipo == "municipes":
+            tarefa = lambda controller: controller.importar_municipes_csv(caminho_csv)
+        else:
+            tarefa = lambda controller: controller.importar_atendimentos_csv(caminho_csv)
+        self.rotulo_status.config(text="Importando...")
+        self.executor.submeter(
+            tarefa, lambda resultado: self._exibir_resultado_importacao(caminho_csv, resultado), self._falhar_importacao
+        )
+
+    def _exibir_resultado_importacao(self, caminho_csv, resultado):
+        self.rotulo_status.config(text="")
+        mensagem = f"{resultado['inseridos']} registros importados."
+        if resultado.get("duplicados"):  # só na importação de munícipes
+            mensagem += f"\n{resultado['duplicados']} CPFs já cadastrados foram ignorados."
+        if resultado["rejeitados"]:
+            # As linhas rejeitadas são gravadas ao lado do arquivo importado
+            caminho_rejeitados = os.path.splitext(caminho_csv)[0] + "_rejeitados.csv"
+            with open(caminho_rejeitados, "w", newline="", encoding="utf-8-sig") as arquivo:
+                escritor = csv.writer(arquivo, delimiter=";")
+                escritor.writerow(["linha", "motivo"])
+                escritor.writerows(resultado["rejeitados"])
+            mensagem += f"\n{len(resultado['rejeitados'])} linhas rejeitadas (detalhes em {caminho_rejeitados})."
+        messagebox.showinfo("Importação", mensagem)
+
+    def _falhar_importacao(self, erro):
+        self.rotulo_status.config(text="")
+        messagebox.showerror("Erro", f"Falha ao importar o arquivo: {erro}")
+
 # Tela de Histórico de Atendimentos
 class HistoricoAtendimentoView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
+        self.filtros = None
         self._construir_interface()
 
     def _construir_interface(self):
@@ -479,6 +656,19 @@ class HistoricoAtendimentoView(ttk.Frame):
 
         ttk.Button(filtro_frame, text="Filtrar", command=self.carregar_atendimentos).grid(row=0, column=4, padx=10, pady=5)
 
+        # Histórico completo: inclui os atendimentos já movidos para o arquivo morto
+        self.incluir_arquivo = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filtro_frame, text="Histórico completo", variable=self.incluir_arquivo,
+                        command=self.carregar_atendimentos).grid(row=0, column=5, padx=5, pady=5)
+
+        ttk.Label(filtro_frame, text="Buscar na Descrição:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        self.filtro_texto = ttk.Entry(filtro_frame, width=30)
+        self.filtro_texto.grid(row=1, column=1, padx=5, pady=5)
+
+        # Indica quando uma consulta está em andamento
+        self.rotulo_status = ttk.Label(filtro_frame, text="", foreground="gray")
+        self.rotulo_status.grid(row=1, column=2, columnspan=3, sticky=tk.W, padx=5, pady=5)
+
         # Tabela Interativa
         tabela_frame = ttk.Frame(self)
         tabela_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
@@ -505,38 +695,85 @@ class HistoricoAtendimentoView(ttk.Frame):
         self.treeview.column("Status", width=100, anchor="center")
         self.treeview.column("Prioridade", width=100, anchor="center")
 
+        barra_rolagem = ttk.Scrollbar(tabela_frame, orient="vertical")
+        barra_rolagem.pack(side="right", fill="y")
         self.treeview.pack(fill="both", expand=True)
 
+        # A tabela busca os atendimentos por páginas conforme a rolagem
+        self.carregador = CarregadorPaginado(
+            self.treeview, barra_rolagem, self.executor, self._buscar_pagina,
+            lambda atendimento: (
+                atendimento[0],  # ID
+                atendimento[1],  # CPF
+                atendimento[2],  # Nome
+                atendimento[3],  # Tipo de Pedido
+                atendimento[8],  # Status
+                atendimento[9]   # Prioridade
+            ),
+            rotulo_status=self.rotulo_status,
+            consultar_alteracoes=self._consultar_alteracoes,
+            nome="Histórico de Atendimentos"
+        )
+
         # Botões de Ação
         botoes_frame = ttk.Frame(self)
         botoes_frame.grid(row=2, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
 
         ttk.Button(botoes_frame, text="Editar Atendimento Selecionado", command=self.editar_atendimento).grid(row=0, column=0, padx=5)
-        ttk.Button(botoes_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=0, column=1, padx=5)
+        ttk.Button(botoes_frame, text="Exportar", command=self.exportar_atendimentos).grid(row=0, column=1, padx=5)
+        ttk.Button(botoes_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=0, column=2, padx=5)
 
         # Configurar redimensionamento
         self.grid_rowconfigure(1, weight=1)  # Tabela expande verticalmente
         self.grid_columnconfigure(0, weight=1)  # Layout se ajusta horizontalmente
 
+    def ao_exibir(self):
+        # Ao voltar para a tela, aplica apenas o que foi alterado enquanto ela estava escondida
+        self.carregador.sincronizar()
+
     def carregar_atendimentos(self):
-        filtro_nome = self.filtro_nome.get()
-        filtro_cpf = self.filtro_cpf.get()
-        atendimentos = self.controller.consultar_atendimentos(filtro_nome, filtro_cpf)
+        # Guarda os filtros usados, para que as próximas páginas sigam a mesma consulta
+        self.filtros = (self.filtro_nome.get(), self.filtro_cpf.get(), self.filtro_texto.get(), self.incluir_arquivo.get())
+        self.carregador.recarregar()
+
+    def _buscar_pagina(self, controller, cursor, tamanho):
+        # Executado em segundo plano, com o controller da thread de consultas
+        filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo = self.filtros
+        return controller.consultar_atendimentos_pagina(filtro_nome, filtro_cpf, filtro_texto, cursor, tamanho,
+                                                        incluir_arquivo=incluir_arquivo)
+
+    def _consultar_alteracoes(self, controller, versao):
+        filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo = self.filtros
+        return controller.consultar_alteracoes(versao, filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo=incluir_arquivo)
+
+    def exportar_atendimentos(self):
+        # Exporta todos os atendimentos do filtro aplicado (não só as páginas já carregadas na tabela)
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar atendimentos", defaultextension=".csv", filetypes=TIPOS_ARQUIVO_EXPORTACAO,
+            initialfile=f"atendimentos_{datetime.datetime.now():%Y%m%d_%H%M%S}.csv"
+        )
+        if not caminho:
+            return
+        filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo = self.filtros or (None, None, None, False)
+        progresso = lambda feitos, total: self.executor.chamar_na_interface(
+            self.rotulo_status.config, {"text": f"Exportando: {feitos} de {total} atendimentos"}
+        )
+        self.rotulo_status.config(text="Exportando...")
+        self.executor.submeter(
+            lambda controller: controller.exportar_atendimentos(caminho, None, filtro_nome, filtro_cpf, filtro_texto,
+                                                                ao_progresso=progresso, incluir_arquivo=incluir_arquivo),
+            lambda exportados: self._concluir_exportacao(caminho, exportados),
+            self._falhar_exportacao,
+            chave=(self, "exportar", caminho)
+        )
 
-        # Limpar a tabela antes de carregar os dados
-        for item in self.treeview.get_children():
-            self.treeview.delete(item)
+    def _concluir_exportacao(self, caminho, exportados):
+        self.rotulo_status.config(text="")
+        messagebox.showinfo("Exportação", f"{exportados} atendimento(s) exportado(s) para {caminho}")
 
-        # Adicionar dados à tabela
-        for atendimento in atendimentos:
-            self.treeview.insert("", "end", values=(
-                atendimento[0],  # ID
-                atendimento[1],  # CPF
-                atendimento[2],  # Nome
-                atendimento[3],  # Tipo de Pedido
-                atendimento[8],  # Status
-                atendimento[9]   # Prioridade
-            ))
+    def _falhar_exportacao(self, erro):
+        self.rotulo_status.config(text="")
+        messagebox.showerror("Erro", f"Falha ao exportar os atendimentos: {erro}")
 
     def editar_atendimento(self):
         try:
@@ -548,10 +785,12 @@ class HistoricoAtendimentoView(ttk.Frame):
             atendimento_id = atendimento_data[0]
 
             # Buscar o atendimento pelo ID
-            atendimento = next((a for a in self.controller.consultar_atendimentos() if a[0] == atendimento_id), None)
+            atendimento = self.controller.buscar_atendimento_por_id(atendimento_id)
 
             if atendimento:
-                EditarAtendimentoView(self, self.controller, atendimento_id)
+                EditarAtendimentoView(self, self.controller, atendimento_id, atendimento, self.executor)
+            elif self.filtros and self.filtros[3]:
+                messagebox.showinfo("Arquivo morto", "Este atendimento está no arquivo morto e não pode ser editado.")
             else:
                 messagebox.showerror("Erro", "Atendimento não encontrado.")
         except IndexError:
@@ -559,18 +798,24 @@ class HistoricoAtendimentoView(ttk.Frame):
 
 # Tela de Edição de Atendimento // MUDARR
 class EditarAtendimentoView(tk.Toplevel):
-    def __init__(self, parent, controller, atendimento_id):
+    def __init__(self, parent, controller, atendimento_id, atendimento_dados=None, executor=None):
         super().__init__(parent)
         self.controller = controller
+        self.executor = executor
         self.atendimento_id = atendimento_id
+        self.anexos = {}  # hash -> (hash, nome_arquivo, tamanho, tipo, adicionado_em)
+        self.cancelamento = threading.Event()
         self.title("Editar Atendimento")
-        self.geometry("600x500")
-        self._construir_interface()
+        self.geometry("640x760")
+        self._construir_interface(atendimento_dados)
+        # Fechar a janela interrompe a cópia de um anexo em andamento
+        self.bind("<Destroy>", lambda event: self.cancelamento.set() if event.widget is self else None)
+        self.carregar_anexos()
 
-    def _construir_interface(self):
-        # Recuperar os dados do atendimento
-        atendimento = self.controller.consultar_atendimentos()
-        atendimento_dados = [a for a in atendimento if a[0] == self.atendimento_id][0]
+    def _construir_interface(self, atendimento_dados=None):
+        # Recuperar os dados do atendimento, caso a tela anterior ainda não os tenha buscado
+        if atendimento_dados is None:
+            atendimento_dados = self.controller.buscar_atendimento_por_id(self.atendimento_id)
 
         # Configuração de layout com espaçamento e alinhamento
         padding_y = 5  # Espaçamento vertical
@@ -610,7 +855,7 @@ class EditarAtendimentoView(tk.Toplevel):
         self.entrada_descricao.grid(row=3, column=1, pady=padding_y)
 
         # Campo Prazo de Resolução
-        ttk.Label(self, text="Prazo de Resolução (em dias):").grid(row=4, column=0, sticky=tk.W, pady=padding_y)
+        ttk.Label(self, text="Prazo de Resolução (dias ou data):").grid(row=4, column=0, sticky=tk.W, pady=padding_y)
         self.prazo_var = tk.StringVar(value=atendimento_dados[6])  # Prazo de Resolução
         self.entrada_prazo = ttk.Entry(self, textvariable=self.prazo_var, width=50)
         self.entrada_prazo.grid(row=4, column=1, pady=padding_y)
@@ -645,8 +890,150 @@ class EditarAtendimentoView(tk.Toplevel):
         )
         self.prioridade_dropdown.grid(row=7, column=1, pady=padding_y)
 
+        # Anexos: os arquivos ficam no armazém em disco e são copiados em segundo plano
+        anexos_frame = ttk.LabelFrame(self, text="Anexos")
+        anexos_frame.grid(row=8, column=0, columnspan=2, padx=5, pady=padding_y, sticky="nsew")
+        self.treeview_anexos = ttk.Treeview(anexos_frame, columns=("Arquivo", "Tamanho", "Adicionado em"), show="headings", height=6)
+        for campo, largura in (("Arquivo", 200), ("Tamanho", 70), ("Adicionado em", 120)):
+            self.treeview_anexos.heading(campo, text=campo)
+            self.treeview_anexos.column(campo, width=largura)
+        self.treeview_anexos.grid(row=0, column=0, columnspan=4, sticky="nsew")
+        self.treeview_anexos.bind("<<TreeviewSelect>>", self.mostrar_previa)
+        self.treeview_anexos.bind("<Double-1>", lambda event: self.abrir_anexo())
+        self.previa = ttk.Label(anexos_frame, text="", wraplength=180, justify="left")
+        self.previa.grid(row=0, column=4, rowspan=2, padx=5, sticky="n")
+        ttk.Button(anexos_frame, text="Anexar Arquivo", command=self.anexar_arquivo).grid(row=1, column=0, pady=5)
+        ttk.Button(anexos_frame, text="Abrir", command=self.abrir_anexo).grid(row=1, column=1, pady=5)
+        ttk.Button(anexos_frame, text="Salvar Cópia", command=self.salvar_copia_anexo).grid(row=1, column=2, pady=5)
+        ttk.Button(anexos_frame, text="Remover", command=self.remover_anexo).grid(row=1, column=3, pady=5)
+        self.barra_anexo = ttk.Progressbar(anexos_frame, mode="determinate")
+        self.barra_anexo.grid(row=2, column=0, columnspan=4, sticky="ew")
+        self.rotulo_anexo = ttk.Label(anexos_frame, text="", foreground="gray")
+        self.rotulo_anexo.grid(row=3, column=0, columnspan=5, sticky=tk.W)
+
         # Botão para Salvar Alterações
-        ttk.Button(self, text="Salvar Alterações", command=self.salvar_alteracoes).grid(row=8, column=1, pady=20)
+        ttk.Button(self, text="Salvar Alterações", command=self.salvar_alteracoes).grid(row=9, column=1, pady=20)
+
+    def _em_segundo_plano(self, tarefa, ao_concluir, ao_falhar, chave=None):
+        # Sem executor (tela aberta por código antigo) a tarefa roda na hora, na thread do Tk
+        if self.executor is not None:
+            self.executor.submeter(tarefa, ao_concluir, ao_falhar, chave=chave)
+            return
+        try:
+            resultado = tarefa(self.controller)
+        except Exception as erro:
+            ao_falhar(erro)
+        else:
+            ao_concluir(resultado)
+
+    def _falhar_anexo(self, erro):
+        if not self.winfo_exists():
+            return
+        self.barra_anexo["value"] = 0
+        self.rotulo_anexo.config(text="")
+        messagebox.showerror("Erro", f"Falha ao acessar os anexos: {erro}", parent=self)
+
+    def carregar_anexos(self):
+        atendimento_id = self.atendimento_id
+        self._em_segundo_plano(lambda controller: controller.consultar_anexos(atendimento_id), self._exibir_anexos,
+                               self._falhar_anexo, chave=(self, "anexos"))
+
+    def _exibir_anexos(self, anexos):
+        self.anexos = {anexo[0]: anexo for anexo in anexos}
+        self.treeview_anexos.delete(*self.treeview_anexos.get_children())
+        for hash_anexo, nome_arquivo, tamanho, _tipo, adicionado_em in anexos:
+            self.treeview_anexos.insert("", "end", iid=hash_anexo, values=(nome_arquivo, _formatar_tamanho(tamanho), adicionado_em))
+
+    def _anexo_selecionado(self):
+        selecionados = self.treeview_anexos.selection()
+        if not selecionados:
+            messagebox.showerror("Erro", "Por favor, selecione um anexo.", parent=self)
+            return None
+        return self.anexos[selecionados[0]]
+
+    def anexar_arquivo(self):
+        arquivos = filedialog.askopenfilenames(title="Anexar arquivos", filetypes=TIPOS_ARQUIVO_ANEXO, parent=self)
+        if not arquivos:
+            return
+        atendimento_id = self.atendimento_id
+        cancelamento = self.cancelamento
+        chamar_na_interface = self.executor.chamar_na_interface if self.executor is not None else lambda funcao, *args: funcao(*args)
+
+        def anexar(controller):
+            for indice, caminho in enumerate(arquivos, 1):
+                nome = os.path.basename(caminho)
+                ao_progresso = lambda feitos, total, nome=nome, indice=indice: chamar_na_interface(
+                    self._atualizar_progresso_anexo, nome, indice, len(arquivos), feitos, total)
+                if controller.anexar_arquivo(atendimento_id, caminho, ao_progresso, cancelamento) is None:
+                    break
+
+        self.rotulo_anexo.config(text="Anexando...")
+        self._em_segundo_plano(anexar, self._concluir_anexacao, self._falhar_anexo)
+
+    def _atualizar_progresso_anexo(self, nome, indice, quantidade, feitos, total):
+        self.barra_anexo["maximum"] = max(total, 1)
+        self.barra_anexo["value"] = feitos
+        self.rotulo_anexo.config(text=f"Anexando {nome} ({indice} de {quantidade}): {_formatar_tamanho(feitos)} de {_formatar_tamanho(total)}")
+
+    def _concluir_anexacao(self, resultado):
+        if not self.winfo_exists():
+            return  # a janela foi fechada durante a cópia
+        self.barra_anexo["value"] = 0
+        self.rotulo_anexo.config(text="")
+        self.carregar_anexos()
+
+    def mostrar_previa(self, event):
+        selecionados = self.treeview_anexos.selection()
+        if not selecionados:
+            return
+        hash_anexo = selecionados[0]
+
+        def gerar_previa(controller):
+            # Miniatura para imagens, texto da primeira página para PDFs; geradas uma vez e guardadas no armazém
+            miniatura = controller.miniatura_anexo(hash_anexo)
+            return miniatura, None if miniatura else controller.previa_anexo(hash_anexo)
+
+        self.previa.config(image="", text="Carregando prévia...")
+        self._em_segundo_plano(gerar_previa, lambda previa: self._exibir_previa(hash_anexo, *previa),
+                               lambda erro: self.previa.config(image="", text="Prévia indisponível"), chave=(self, "previa"))
+
+    def _exibir_previa(self, hash_anexo, miniatura, texto):
+        if miniatura:
+            self._imagem_previa = tk.PhotoImage(file=miniatura)  # a referência evita que o Tk descarte a imagem
+            self.previa.config(image=self._imagem_previa, text="")
+        else:
+            self.previa.config(image="", text=texto[:400] if texto else (self.anexos[hash_anexo][3] or "Sem prévia"))
+
+    def abrir_anexo(self):
+        anexo = self._anexo_selecionado()
+        if anexo is None:
+            return
+        hash_anexo, nome_arquivo = anexo[0], anexo[1]
+
+        def copiar_temporario(controller):
+            # Abre uma cópia com o nome original: o programa externo reconhece o tipo e não altera o armazém
+            import tempfile
+            return controller.copiar_anexo(hash_anexo, os.path.join(tempfile.mkdtemp(prefix="anexo_"), nome_arquivo))
+
+        self._em_segundo_plano(copiar_temporario, _abrir_no_sistema, self._falhar_anexo)
+
+    def salvar_copia_anexo(self):
+        anexo = self._anexo_selecionado()
+        if anexo is None:
+            return
+        hash_anexo, nome_arquivo = anexo[0], anexo[1]
+        caminho = filedialog.asksaveasfilename(title="Salvar cópia do anexo", initialfile=nome_arquivo, parent=self)
+        if caminho:
+            self._em_segundo_plano(lambda controller: controller.copiar_anexo(hash_anexo, caminho),
+                                   lambda caminho: self.rotulo_anexo.config(text=f"Cópia salva em {caminho}"), self._falhar_anexo)
+
+    def remover_anexo(self):
+        anexo = self._anexo_selecionado()
+        if anexo is None or not messagebox.askyesno("Remover anexo", f"Remover o anexo {anexo[1]}?", parent=self):
+            return
+        atendimento_id, hash_anexo = self.atendimento_id, anexo[0]
+        self._em_segundo_plano(lambda controller: controller.remover_anexo(atendimento_id, hash_anexo),
+                               lambda resultado: self.carregar_anexos(), self._falhar_anexo)
 
 
     def salvar_alteracoes(self):
@@ -680,7 +1067,7 @@ class EditarMunicipeView(tk.Toplevel):
     def _construir_interface(self, municipe_dados):
         # Campo CPF (desabilitado para edição)
         ttk.Label(self, text="CPF:").grid(row=0, column=0, sticky=tk.W, pady=5)
-        self.cpf_var = tk.StringVar(value=municipe_dados[0])
+        self.cpf_var = tk.StringVar(value=formatar_cpf(municipe_dados[0]))
         self.entrada_cpf = ttk.Entry(self, textvariable=self.cpf_var, width=50, state='disabled')  # CPF não é editável
         self.entrada_cpf.grid(row=0, column=1, pady=5)
 
@@ -749,7 +1136,11 @@ class EditarMunicipeView(tk.Toplevel):
         # Validar campos obrigatórios
         if nome and telefone and bairro:
             # Atualizar no banco de dados
-            self.controller.atualizar_municipe(self.cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+            try:
+                self.controller.atualizar_municipe(self.cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+            except ValueError as erro:
+                messagebox.showerror("Erro", str(erro))
+                return
             messagebox.showinfo("Sucesso", "Munícipe atualizado com sucesso!")
             self.destroy()
         else:
@@ -757,10 +1148,14 @@ class EditarMunicipeView(tk.Toplevel):
 
 # Tela de Histórico de Munícipes
 class HistoricoMunicipeView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
+        # Cadastros exibidos, pelo iid da linha: o Tk converte um CPF só com dígitos em número ("01234567890"
+        # volta como 1234567890), então a edição usa a linha como veio do banco, não os valores da tabela
+        self.municipes_exibidos = {}
         self._construir_interface()
 
     def _construir_interface(self):
@@ -784,16 +1179,28 @@ class HistoricoMunicipeView(ttk.Frame):
         # Carregar Munícipes
         self.carregar_municipes()
 
+    def ao_exibir(self):
+        self.carregar_municipes()
+
     def carregar_municipes(self):
-        municipes = self.controller.consultar_municipes()
+        # A lista é consultada em segundo plano e inserida quando chegar
+        self.executor.submeter(
+            lambda controller: controller.consultar_municipes(),
+            self._exibir_municipes, chave=self
+        )
+
+    def _exibir_municipes(self, municipes):
+        self.treeview.delete(*self.treeview.get_children())
+        self.municipes_exibidos = {}
         for municipe in municipes:
-            self.treeview.insert("", "end", values=municipe)
+            item = self.treeview.insert("", "end", values=(formatar_cpf(municipe[0]), *municipe[1:]))
+            self.municipes_exibidos[item] = municipe
 
     def editar_municipe(self):
         try:
             # Obter o item selecionado na tabela
             selected_item = self.treeview.selection()[0]
-            municipe_data = self.treeview.item(selected_item)['values']  # Pega os valores do munícipe
+            municipe_data = self.municipes_exibidos.get(selected_item)  # Linha do munícipe como veio do banco
 
             if municipe_data:
                 # Passar os dados do munícipe para a janela de edição
@@ -806,10 +1213,11 @@ class HistoricoMunicipeView(ttk.Frame):
 
 
 class DashboardView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
         self._construir_interface()
 
     def _construir_interface(self):
@@ -836,19 +1244,28 @@ class DashboardView(ttk.Frame):
 
         ttk.Label(resumo_frame, text="Resumo", font=("Helvetica", 18)).grid(row=0, column=0, columnspan=2, pady=10)
 
-        atendimentos_abertos = ttk.Label(
-            resumo_frame, text="Atendimentos Abertos: 5", font=("Helvetica", 14), foreground="red"
+        self.atendimentos_abertos = ttk.Label(
+            resumo_frame, text="Atendimentos Abertos: ...", font=("Helvetica", 14), foreground="red"
+        )
+        self.atendimentos_abertos.grid(row=1, column=0, padx=10, pady=5, sticky="w")
+
+        self.tarefas_pendentes = ttk.Label(
+            resumo_frame, text="Tarefas Pendentes: ...", font=("Helvetica", 14), foreground="orange"
         )
-        atendimentos_abertos.grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.tarefas_pendentes.grid(row=1, column=1, padx=10, pady=5, sticky="e")
 
-        tarefas_pendentes = ttk.Label(
-            resumo_frame, text="Tarefas Pendentes: 3", font=("Helvetica", 14), foreground="orange"
+        self.atendimentos_atrasados = ttk.Label(
+            resumo_frame, text="Atrasados: ...", font=("Helvetica", 14), foreground="darkred"
         )
-        tarefas_pendentes.grid(row=1, column=1, padx=10, pady=5, sticky="e")
+        self.atendimentos_atrasados.grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky="w")
 
         # Tabela interativa no centro
         tabela_frame = ttk.Frame(main_frame)
         tabela_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+
+        # Indica quando a tabela está sendo carregada
+        self.rotulo_status = ttk.Label(main_frame, text="", foreground="gray")
+        self.rotulo_status.grid(row=2, column=0, sticky="w", padx=10)
         
         self.treeview = ttk.Treeview(
             tabela_frame, 
@@ -871,8 +1288,38 @@ class DashboardView(ttk.Frame):
         self.treeview.column("Prioridade", width=100, anchor="center")
 
         # Adicionar tabela à tela
+        barra_rolagem = ttk.Scrollbar(tabela_frame, orient="vertical")
+        barra_rolagem.pack(side="right", fill="y")
         self.treeview.pack(fill="both", expand=True)
 
+        # A tabela busca os atendimentos por páginas conforme a rolagem
+        self.carregador = CarregadorPaginado(
+            self.treeview, barra_rolagem, self.executor,
+            lambda controller, cursor, tamanho: controller.consultar_atendimentos_pagina(cursor=cursor, tamanho=tamanho),
+            lambda atendimento: (
+                atendimento[0],  # ID do atendimento
+                atendimento[2],  # Nome do munícipe
+                atendimento[3],  # Tipo de pedido
+                atendimento[8],  # Status do atendimento
+                atendimento[9],  # Prioridade do atendimento
+            ),
+            rotulo_status=self.rotulo_status,
+            consultar_alteracoes=lambda controller, versao: controller.consultar_alteracoes(versao),
+            ao_sincronizar=self.carregar_indicadores,
+            nome="Dashboard"
+        )
+
+        # Painel de atrasados: prazo vencido, os mais urgentes primeiro (duplo clique abre o atendimento)
+        atrasados_frame = ttk.LabelFrame(main_frame, text="Atendimentos Atrasados")
+        atrasados_frame.grid(row=3, column=0, sticky="nsew", padx=10, pady=10)
+        colunas_atrasados = ("ID", "Nome", "Tipo de Pedido", "Prioridade", "Prazo", "Atraso")
+        self.treeview_atrasados = ttk.Treeview(atrasados_frame, columns=colunas_atrasados, show="headings", height=6)
+        for coluna, largura in zip(colunas_atrasados, (50, 150, 150, 80, 130, 70)):
+            self.treeview_atrasados.heading(coluna, text=coluna)
+            self.treeview_atrasados.column(coluna, width=largura, anchor="w" if coluna in ("Nome", "Tipo de Pedido") else "center")
+        self.treeview_atrasados.pack(fill="both", expand=True)
+        self.treeview_atrasados.bind("<Double-1>", self.abrir_atrasado)
+
         # Configuração para redimensionamento
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(1, weight=1)
@@ -880,33 +1327,62 @@ class DashboardView(ttk.Frame):
         # Carregar os atendimentos no Dashboard
         self.carregar_atendimentos()
 
+    def ao_exibir(self):
+        # Os indicadores são lidos de novo sempre; a tabela recebe apenas as linhas alteradas
+        self.carregador.sincronizar()
+        self.carregar_indicadores()
+
     def carregar_atendimentos(self):
-        # Consultar todos os atendimentos sem filtros
-        atendimentos = self.controller.consultar_atendimentos()
+        # Carrega apenas a primeira página; as demais vêm com a rolagem
+        self.carregador.recarregar()
+        self.carregar_indicadores()
+
+    def carregar_indicadores(self):
+        # Os indicadores vêm da tabela de resumo mantida pelo banco, sem contar os atendimentos
+        self.executor.submeter(
+            lambda controller: controller.indicadores_dashboard(),
+            self._exibir_indicadores, chave=(self, "indicadores")
+        )
+        self.carregar_atrasados()
 
-        # Limpar a tabela antes de carregar os dados
-        self.treeview.delete(*self.treeview.get_children())
+    def _exibir_indicadores(self, indicadores):
+        self.atendimentos_abertos.config(text=f"Atendimentos Abertos: {indicadores['abertos']}")
+        self.tarefas_pendentes.config(text=f"Tarefas Pendentes: {indicadores['pendentes']}")
 
-        # Adicionar dados à tabela do Dashboard
-        for atendimento in atendimentos:
-            self.treeview.insert(
-                "",
-                "end",
-                values=(
-                    atendimento[0],  # ID do atendimento
-                    atendimento[2],  # Nome do munícipe
-                    atendimento[3],  # Tipo de pedido
-                    atendimento[8],  # Status do atendimento
-                    atendimento[9],  # Prioridade do atendimento
-                )
-            )
+    def carregar_atrasados(self):
+        # Relido a cada exibição: um atendimento passa a atrasado com o tempo, sem nenhuma gravação
+        self.executor.submeter(
+            lambda controller: (controller.contar_atrasados(), controller.consultar_atrasados()),
+            self._exibir_atrasados, chave=(self, "atrasados")
+        )
+
+    def _exibir_atrasados(self, resultado):
+        por_prioridade, atrasados = resultado
+        self.atendimentos_atrasados.config(text=f"Atrasados: {sum(por_prioridade.values())}")
+        self.treeview_atrasados.delete(*self.treeview_atrasados.get_children())
+        agora = datetime.datetime.now()
+        for atendimento_id, _cpf, nome, tipo_pedido, prioridade, _status, data_limite, _assessor in atrasados:
+            atraso = (agora - datetime.datetime.strptime(data_limite, "%Y-%m-%d %H:%M:%S")).days
+            self.treeview_atrasados.insert("", "end", iid=str(atendimento_id), values=(
+                atendimento_id, nome, tipo_pedido, prioridade, data_limite[:16], f"{atraso} dia(s)"
+            ))
+
+    def abrir_atrasado(self, event):
+        selecionados = self.treeview_atrasados.selection()
+        if not selecionados:
+            return
+        atendimento_id = int(selecionados[0])
+        atendimento = self.controller.buscar_atendimento_por_id(atendimento_id)
+        if atendimento:
+            EditarAtendimentoView(self, self.controller, atendimento_id, atendimento, self.executor)
 
 # Tela de Relatórios
 class RelatorioView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
         self.municipe_info_labels = {}
         self._construir_interface()
 
@@ -945,11 +1421,27 @@ class RelatorioView(ttk.Frame):
         self.entrada_bairro.grid(row=4, column=1, pady=2)
         ttk.Button(left_frame, text="Gerar", command=self.gerar_relatorio_bairro).grid(row=4, column=2, pady=2)
 
+        # Formato do arquivo gerado pelos botões de relatório
+        ttk.Label(left_frame, text="Formato:").grid(row=5, column=0, sticky=tk.W, pady=2)
+        self.formato_var = tk.StringVar(value="PDF")
+        ttk.Combobox(left_frame, textvariable=self.formato_var, values=list(FORMATOS_RELATORIO),
+                     state="readonly", width=27).grid(row=5, column=1, pady=2)
+
         # Botão para Gerar Todos os Relatórios
-        ttk.Button(left_frame, text="Gerar Todos os Relatórios", command=self.gerar_todos_relatorios).grid(row=5, column=1, pady=10)
+        ttk.Button(left_frame, text="Gerar Todos os Relatórios", command=self.gerar_todos_relatorios).grid(row=6, column=1, pady=10)
+        ttk.Button(left_frame, text="Estatísticas (PDF)", command=self.gerar_relatorio_estatistico).grid(row=6, column=2, pady=10)
 
         # Botão para Voltar ao Dashboard
-        ttk.Button(left_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=6, column=1, pady=10)
+        ttk.Button(left_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=7, column=1, pady=10)
+
+        # Progresso da geração do relatório
+        self.rotulo_status = ttk.Label(left_frame, text="", foreground="gray")
+        self.rotulo_status.grid(row=8, column=0, columnspan=3, pady=5)
+        self.barra_progresso = ttk.Progressbar(left_frame, mode="determinate", length=300)
+        self.barra_progresso.grid(row=9, column=0, columnspan=2, pady=5)
+        self.botao_cancelar = ttk.Button(left_frame, text="Cancelar", command=self.cancelar_relatorio, state="disabled")
+        self.botao_cancelar.grid(row=9, column=2, pady=5)
+        self.cancelamento = None
 
         # ===================== Right Frame =====================
         ttk.Label(right_frame, text="Informações do Munícipe", font=("Helvetica", 14)).grid(row=0, column=0, columnspan=2, pady=10)
@@ -964,64 +1456,152 @@ class RelatorioView(ttk.Frame):
     def gerar_relatorio_cpf(self):
         cpf = self.entrada_cpf.get()
         if cpf:
-            atendimentos = self.controller.gerar_relatorio_municipe(cpf)
-            if atendimentos:
-                municipe_dados = self.controller.buscar_municipe_por_cpf(cpf)
-                if municipe_dados:
-                    self.atualizar_informacoes_municipe(municipe_dados)
-                else:
-                    self.limpar_informacoes_municipe()
-                self.controller.gerar_relatorio_pdf(atendimentos, caminho_pdf=f"relatorio_{cpf}.pdf")
-                messagebox.showinfo("Relatório", f"Relatório gerado para o CPF {cpf}.")
-            else:
-                messagebox.showerror("Erro", "Nenhum atendimento encontrado para o CPF fornecido.")
-                self.limpar_informacoes_municipe()
+            self.buscar_municipe(mostrar_erro=False)
+            self._gerar_relatorio(
+                lambda controller: controller.gerar_relatorio_municipe(cpf),
+                lambda controller, caminho, **opcoes: controller.exportar_atendimentos(caminho, filtro_cpf=cpf, **opcoes),
+                f"relatorio_{cpf}", f"Relatório gerado para o CPF {cpf}.", "Nenhum atendimento encontrado para o CPF fornecido."
+            )
         else:
             messagebox.showerror("Erro", "Por favor, insira o CPF.")
 
     def gerar_relatorio_tipo_pedido(self):
         tipo_pedido = self.tipo_pedido_var.get()
         if tipo_pedido:
-            atendimentos = self.controller.gerar_relatorio_tipo_pedido(tipo_pedido)
-            if atendimentos:
-                self.controller.gerar_relatorio_pdf(atendimentos, caminho_pdf=f"relatorio_{tipo_pedido}.pdf")
-                messagebox.showinfo("Relatório", f"Relatório gerado para o tipo de pedido {tipo_pedido}.")
-            else:
-                messagebox.showerror("Erro", "Nenhum atendimento encontrado para o tipo de pedido selecionado.")
+            self._gerar_relatorio(
+                lambda controller: controller.gerar_relatorio_tipo_pedido(tipo_pedido),
+                lambda controller, caminho, **opcoes: controller.exportar_relatorio_tipo_pedido(tipo_pedido, caminho, **opcoes),
+                f"relatorio_{tipo_pedido}", f"Relatório gerado para o tipo de pedido {tipo_pedido}.",
+                "Nenhum atendimento encontrado para o tipo de pedido selecionado."
+            )
         else:
             messagebox.showerror("Erro", "Por favor, selecione um tipo de pedido.")
 
     def gerar_relatorio_bairro(self):
         bairro = self.entrada_bairro.get()
         if bairro:
-            atendimentos = self.controller.gerar_relatorio_bairro(bairro)
-            if atendimentos:
-                self.controller.gerar_relatorio_pdf(atendimentos, caminho_pdf=f"relatorio_{bairro}.pdf")
-                messagebox.showinfo("Relatório", f"Relatório gerado para o bairro {bairro}.")
-            else:
-                messagebox.showerror("Erro", "Nenhum atendimento encontrado para o bairro fornecido.")
+            self._gerar_relatorio(
+                lambda controller: controller.gerar_relatorio_bairro(bairro),
+                lambda controller, caminho, **opcoes: controller.exportar_relatorio_bairro(bairro, caminho, **opcoes),
+                f"relatorio_{bairro}", f"Relatório gerado para o bairro {bairro}.", "Nenhum atendimento encontrado para o bairro fornecido."
+            )
         else:
             messagebox.showerror("Erro", "Por favor, insira o bairro.")
 
     def gerar_todos_relatorios(self):
-        atendimentos = self.controller.consultar_todos_atendimentos()
-        if atendimentos:
-            self.controller.gerar_relatorio_pdf(atendimentos, caminho_pdf="relatorio_completo.pdf")
-            messagebox.showinfo("Relatório", "Relatório completo gerado com sucesso.")
-        else:
-            messagebox.showerror("Erro", "Nenhum atendimento encontrado.")
+        self._gerar_relatorio(
+            lambda controller: controller.consultar_todos_atendimentos(),
+            lambda controller, caminho, **opcoes: controller.exportar_atendimentos(caminho, **opcoes),
+            "relatorio_completo", "Relatório completo gerado com sucesso.", "Nenhum atendimento encontrado."
+        )
 
-    def buscar_municipe(self):
+    def gerar_relatorio_estatistico(self):
+        # Contagens por mês, tipo de pedido e bairro, calculadas no banco (rápido mesmo com milhões de atendimentos)
+        caminho_pdf = "relatorio_estatistico.pdf"
+        self.rotulo_status.config(text="Gerando relatório estatístico...")
+        self.executor.submeter(
+            lambda controller: controller.gerar_relatorio_estatistico_pdf(caminho_pdf),
+            lambda gerado: self._concluir_relatorio_estatistico(caminho_pdf),
+            self._falhar_relatorio_estatistico,
+            chave=(self, "estatistico")
+        )
+
+    def _concluir_relatorio_estatistico(self, caminho_pdf):
+        self.rotulo_status.config(text="")
+        messagebox.showinfo("Relatório", f"Relatório estatístico salvo em {caminho_pdf}.")
+
+    def _falhar_relatorio_estatistico(self, erro):
+        self.rotulo_status.config(text="")
+        messagebox.showerror("Erro", f"Falha ao gerar o relatório estatístico: {erro}")
+
+    def _gerar_relatorio(self, consultar, exportar, nome_arquivo, mensagem_sucesso, mensagem_vazio):
+        # Consulta e gera o PDF em segundo plano (as páginas são desenhadas em processos paralelos)
+        # Nos demais formatos as linhas são gravadas em lotes, direto do banco para o arquivo
+        if self.cancelamento is not None:
+            messagebox.showerror("Erro", "Aguarde o relatório em andamento ou cancele-o.")
+            return
+        cancelamento = threading.Event()
+        self.cancelamento = cancelamento
+        extensao = FORMATOS_RELATORIO[self.formato_var.get()]
+        caminho = f"{nome_arquivo}.{extensao}"
+        ao_progresso = lambda feitos, total: self.executor.chamar_na_interface(self._atualizar_progresso, feitos, total)
+
+        def tarefa(controller):
+            if extensao != "pdf":
+                exportados = exportar(controller, caminho, ao_progresso=ao_progresso, cancelamento=cancelamento)
+                # Cancelada, a exportação retorna False e já apagou o arquivo parcial (False == 0, por isso o "is")
+                if exportados is False:
+                    return False
+                if exportados == 0:
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+                    return None
+                return exportados
+            atendimentos = consultar(controller)
+            if not atendimentos:
+                return None
+            self.executor.chamar_na_interface(self._atualizar_progresso, 0, len(atendimentos))
+            return controller.gerar_relatorio_pdf(
+                atendimentos, caminho_pdf=caminho, cancelamento=cancelamento, ao_progresso=ao_progresso
+            )
+
+        def concluir(gerado):
+            self._finalizar_relatorio()
+            if gerado is None:
+                messagebox.showerror("Erro", mensagem_vazio)
+            elif gerado:
+                messagebox.showinfo("Relatório", mensagem_sucesso)
+            else:
+                messagebox.showinfo("Relatório", "Geração do relatório cancelada.")
+
+        def falhar(erro):
+            self._finalizar_relatorio()
+            messagebox.showerror("Erro", f"Falha ao gerar o relatório: {erro}")
+
+        self.rotulo_status.config(text="Consultando atendimentos...")
+        self.barra_progresso["value"] = 0
+        self.botao_cancelar.config(state="normal")
+        self.executor.submeter(tarefa, concluir, falhar)
+
+    def _atualizar_progresso(self, feitos, total):
+        self.barra_progresso["maximum"] = max(total, 1)
+        self.barra_progresso["value"] = feitos
+        self.rotulo_status.config(text=f"Gerando relatório: {feitos} de {total} atendimentos")
+
+    def cancelar_relatorio(self):
+        if self.cancelamento is not None:
+            self.cancelamento.set()
+            self.rotulo_status.config(text="Cancelando...")
+
+    def ao_descartar(self):
+        # A tela vai ser destruída: interrompe o relatório em andamento
+        self.cancelar_relatorio()
+
+    def _finalizar_relatorio(self):
+        self.cancelamento = None
+        self.rotulo_status.config(text="")
+        self.barra_progresso["value"] = 0
+        self.botao_cancelar.config(state="disabled")
+
+    def buscar_municipe(self, mostrar_erro=True):
         cpf = self.entrada_cpf.get()
         if cpf:
-            municipe_dados = self.controller.buscar_municipe_por_cpf(cpf)
-            if municipe_dados:
-                self.atualizar_informacoes_municipe(municipe_dados)
-            else:
-                messagebox.showerror("Erro", "Nenhum munícipe encontrado com o CPF fornecido.")
+            self.executor.submeter(
+                lambda controller: controller.buscar_municipe_por_cpf(cpf),
+                lambda municipe_dados: self._exibir_municipe(municipe_dados, mostrar_erro),
+                chave=self
+            )
         else:
             messagebox.showerror("Erro", "Por favor, insira o CPF para buscar o munícipe.")
 
+    def _exibir_municipe(self, municipe_dados, mostrar_erro):
+        if municipe_dados:
+            self.atualizar_informacoes_municipe(municipe_dados)
+        else:
+            self.limpar_informacoes_municipe()
+            if mostrar_erro:
+                messagebox.showerror("Erro", "Nenhum munícipe encontrado com o CPF fornecido.")
+
     def atualizar_informacoes_municipe(self, municipe_dados):
         campos = ["CPF", "Nome", "Endereço", "Bairro", "Telefone", "RG", "Título de Eleitor", "Zona", "Seção"]
         for i, campo in enumerate(campos):
@@ -1033,36 +1613,386 @@ class RelatorioView(ttk.Frame):
 
 # Tela de Gerenciamento de Tarefas (Kanban)
 class TarefasView(ttk.Frame):
-    def __init__(self, root, controller, switch_view):
+    def __init__(self, root, controller, switch_view, executor):
         super().__init__(root)
         self.controller = controller
         self.switch_view = switch_view
+        self.executor = executor
         self._construir_interface()
+        self.carregar_quadro()
 
     def _construir_interface(self):
-        ttk.Label(self, text="Tarefas - Kanban View").pack()
-        ttk.Button(self, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).pack(pady=10)
+        ttk.Label(self, text="Quadro de Tarefas", font=("Helvetica", 16)).grid(row=0, column=0, columnspan=len(STATUS_ATENDIMENTO), pady=10)
+
+        # Uma coluna por status; cada coluna busca só as páginas de cartões que chegam a ser vistas
+        self.colunas = {}        # status -> frame da coluna
+        self.titulos = {}        # status -> label com o total da coluna
+        self.carregadores = {}   # status -> CarregadorPaginado da coluna
+        self.totais = {}         # status -> total de atendimentos no status
+        self._cartoes = {}       # item -> linha do atendimento exibida no quadro
+        self._movendo = set()    # cartões com gravação em andamento
+        self._arrastando = None
+        for indice, status in enumerate(STATUS_ATENDIMENTO):
+            coluna = ttk.Frame(self)
+            coluna.grid(row=1, column=indice, padx=5, sticky="nsew")
+            self.titulos[status] = ttk.Label(coluna, text=status, font=("Helvetica", 12))
+            self.titulos[status].grid(row=0, column=0, columnspan=2, pady=5)
+
+            treeview = ttk.Treeview(coluna, columns=("ID", "Nome", "Tipo", "Prioridade", "Prazo"), show="headings", height=20)
+            for campo, largura in (("ID", 50), ("Nome", 150), ("Tipo", 100), ("Prioridade", 70), ("Prazo", 80)):
+                treeview.heading(campo, text=campo)
+                treeview.column(campo, width=largura)
+            treeview.grid(row=1, column=0, sticky="nsew")
+            barra = ttk.Scrollbar(coluna, orient="vertical")
+            barra.grid(row=1, column=1, sticky="ns")
+            coluna.grid_rowconfigure(1, weight=1)
+            coluna.grid_columnconfigure(0, weight=1)
+
+            treeview.bind("<ButtonPress-1>", self._iniciar_arraste)
+            treeview.bind("<B1-Motion>", self._arrastar)
+            treeview.bind("<ButtonRelease-1>", self._soltar)
+            treeview.bind("<Button-3>", self._abrir_menu)
+            treeview.bind("<Double-1>", self.abrir_cartao)
+
+            self.colunas[status] = coluna
+            self.carregadores[status] = CarregadorPaginado(
+                treeview, barra, self.executor,
+                lambda controller, cursor, tamanho, status=status: controller.consultar_coluna_quadro(status, cursor, tamanho),
+                self._valores_cartao, nome=f"Quadro: {status}"
+            )
+            self.grid_columnconfigure(indice, weight=1)
+
+        self.rotulo_status = ttk.Label(self, text="", foreground="gray")
+        self.rotulo_status.grid(row=2, column=0, columnspan=len(STATUS_ATENDIMENTO), sticky=tk.W)
+        botoes = ttk.Frame(self)
+        botoes.grid(row=3, column=0, columnspan=len(STATUS_ATENDIMENTO), pady=10)
+        ttk.Button(botoes, text="Atualizar", command=self.carregar_quadro).grid(row=0, column=0, padx=5)
+        ttk.Button(botoes, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=0, column=1, padx=5)
+        self.grid_rowconfigure(1, weight=1)
+
+    def ao_exibir(self):
+        self.carregar_quadro()
+
+    def carregar_quadro(self):
+        self._cartoes.clear()
+        for carregador in self.carregadores.values():
+            carregador.recarregar()
+        # Os totais vêm do resumo mantido pelo banco, sem contar os atendimentos de cada coluna
+        self.executor.submeter(lambda controller: controller.consultar_resumo()["status"], self._exibir_totais,
+                               chave=(self, "totais"))
+
+    def _exibir_totais(self, totais):
+        self.totais = {status: totais.get(status, 0) for status in STATUS_ATENDIMENTO}
+        self._atualizar_titulos()
+
+    def _atualizar_titulos(self):
+        for status, titulo in self.titulos.items():
+            titulo.config(text=f"{status} ({self.totais[status]})" if status in self.totais else status)
+
+    def _valores_cartao(self, linha):
+        # Chamada pelo carregador ao inserir o cartão; a linha completa fica guardada para movê-lo depois
+        self._cartoes[str(linha[0])] = linha
+        atendimento_id, _cpf, nome, tipo_pedido, prioridade, _data_horario, _status, data_limite = linha
+        return (atendimento_id, nome, tipo_pedido, prioridade, data_limite[:10] if data_limite else "")
+
+    @staticmethod
+    def _ordem_cartao(linha):
+        # Mesma ordem da consulta da coluna: prioridade, data do atendimento, id
+        prioridade = ORDEM_PRIORIDADES.index(linha[4]) if linha[4] in ORDEM_PRIORIDADES else len(ORDEM_PRIORIDADES)
+        return (prioridade, linha[5], linha[0])
+
+    def _status_da_coluna(self, widget):
+        # Os nomes dos widgets do Tk são hierárquicos: ".!tarefasview.!frame2.!treeview" pertence à coluna ".!tarefasview.!frame2"
+        nome = str(widget)
+        for status, coluna in self.colunas.items():
+            if nome == str(coluna) or nome.startswith(str(coluna) + "."):
+                return status
+        return None
+
+    def _iniciar_arraste(self, event):
+        item = event.widget.identify_row(event.y)
+        self._arrastando = (item, self._status_da_coluna(event.widget)) if item else None
+
+    def _arrastar(self, event):
+        if self._arrastando is not None:
+            event.widget.configure(cursor="hand2")
+
+    def _soltar(self, event):
+        event.widget.configure(cursor="")
+        if self._arrastando is None:
+            return
+        item, status_origem = self._arrastando
+        self._arrastando = None
+        destino = self.winfo_containing(event.x_root, event.y_root)
+        status_destino = self._status_da_coluna(destino) if destino is not None else None
+        if status_destino is not None and status_destino != status_origem:
+            self.mover(item, status_origem, status_destino)
+
+    def _abrir_menu(self, event):
+        item = event.widget.identify_row(event.y)
+        if not item:
+            return
+        event.widget.selection_set(item)
+        status_origem = self._status_da_coluna(event.widget)
+        menu = tk.Menu(self, tearoff=0)
+        for status in STATUS_ATENDIMENTO:
+            if status != status_origem:
+                menu.add_command(label=f"Mover para {status}",
+                                 command=lambda status=status: self.mover(item, status_origem, status))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def mover(self, item, status_origem, status_destino):
+        # Interface otimista: o cartão muda de coluna na hora e a gravação (uma linha) roda em segundo plano;
+        # se ela falhar, o cartão volta para a coluna de origem
+        if item in self._movendo or item not in self._cartoes:
+            return
+        self._movendo.add(item)
+        self._trocar_coluna(item, status_origem, status_destino)
+        self.executor.submeter(
+            lambda controller: controller.mover_atendimento(int(item), status_destino, status_origem),
+            lambda movido: self._confirmar_movimento(movido, item, status_origem, status_destino),
+            lambda erro: self._desfazer_movimento(item, status_origem, status_destino, f"Falha ao mover o atendimento: {erro}")
+        )
+
+    def _trocar_coluna(self, item, status_origem, status_destino):
+        linha = self._cartoes[item]
+        self.carregadores[status_origem].remover(item)
+        linha = (*linha[:6], status_destino, *linha[7:])
+        self._cartoes[item] = linha
+        destino = self.carregadores[status_destino]
+        chave = self._ordem_cartao(linha)
+        filhos = destino.treeview.get_children()
+        # Cartões depois do último carregado aparecem quando a coluna chegar até eles
+        if destino.fim or (filhos and chave < self._ordem_cartao(self._cartoes[filhos[-1]])):
+            posicao = next((indice for indice, filho in enumerate(filhos) if chave < self._ordem_cartao(self._cartoes[filho])), "end")
+            destino.inserir(linha, posicao)
+            destino.treeview.selection_set(item)
+            destino.treeview.see(item)
+        for status, variacao in ((status_origem, -1), (status_destino, 1)):
+            if status in self.totais:
+                self.totais[status] += variacao
+        self._atualizar_titulos()
+
+    def _confirmar_movimento(self, movido, item, status_origem, status_destino):
+        if movido:
+            self._movendo.discard(item)
+            return
+        # Outra estação alterou o atendimento antes: o quadro é lido de novo
+        self._desfazer_movimento(item, status_origem, status_destino,
+                                 "O atendimento foi alterado em outra estação. O quadro foi atualizado.")
+        self.carregar_quadro()
+
+    def _desfazer_movimento(self, item, status_origem, status_destino, mensagem):
+        self._movendo.discard(item)
+        if item in self._cartoes:
+            self._trocar_coluna(item, status_destino, status_origem)
+        messagebox.showerror("Erro", mensagem)
+
+    def abrir_cartao(self, event):
+        selecionados = event.widget.selection()
+        if not selecionados:
+            return
+        atendimento_id = int(selecionados[0])
+        atendimento = self.controller.buscar_atendimento_por_id(atendimento_id)
+        if atendimento:
+            EditarAtendimentoView(self, self.controller, atendimento_id, atendimento, self.executor)
+
+# Tela de Diagnóstico - tempos das consultas, das operações e das telas, para investigar lentidão
+class DiagnosticoView(ttk.Frame):
+    def __init__(self, root, controller, switch_view, executor):
+        super().__init__(root)
+        self.controller = controller
+        self.switch_view = switch_view
+        self.executor = executor
+        self.dados = None
+        self._construir_interface()
+
+    def _construir_interface(self):
+        ttk.Label(self, text="Diagnóstico", font=("Helvetica", 16)).pack(pady=10)
+        self.rotulo_status = ttk.Label(self, text="", foreground="gray")
+        self.rotulo_status.pack()
+
+        abas = ttk.Notebook(self)
+        abas.pack(fill="both", expand=True, padx=10, pady=10)
+        colunas_tempos = ("Nome", "Quantidade", "Total (ms)", "Média (ms)", "Máximo (ms)")
+        self.tabela_consultas = self._criar_tabela(abas, "Consultas", colunas_tempos)
+        self.tabela_lentas = self._criar_tabela(abas, "Consultas Lentas", ("Quando", "Tempo (ms)", "Thread", "Consulta", "Parâmetros"))
+        self.tabela_metodos = self._criar_tabela(abas, "Operações", colunas_tempos + ("Erros",))
+        self.tabela_telas = self._criar_tabela(abas, "Telas", colunas_tempos)
+
+        botoes_frame = ttk.Frame(self)
+        botoes_frame.pack(pady=10)
+        ttk.Button(botoes_frame, text="Atualizar", command=self.atualizar).grid(row=0, column=0, padx=5)
+        ttk.Button(botoes_frame, text="Exportar JSON", command=self.exportar_json).grid(row=0, column=1, padx=5)
+        ttk.Button(botoes_frame, text="Zerar", command=self.zerar).grid(row=0, column=2, padx=5)
+        ttk.Button(botoes_frame, text="Voltar ao Dashboard", command=lambda: self.switch_view(DashboardView)).grid(row=0, column=3, padx=5)
+
+        self.atualizar()
+
+    def _criar_tabela(self, abas, titulo, colunas):
+        frame = ttk.Frame(abas)
+        abas.add(frame, text=titulo)
+        tabela = ttk.Treeview(frame, columns=colunas, show="headings")
+        for coluna in colunas:
+            tabela.heading(coluna, text=coluna)
+            tabela.column(coluna, width=400 if coluna in ("Nome", "Consulta") else 90, anchor="w")
+        barra_rolagem = ttk.Scrollbar(frame, orient="vertical", command=tabela.yview)
+        tabela.configure(yscrollcommand=barra_rolagem.set)
+        barra_rolagem.pack(side="right", fill="y")
+        tabela.pack(fill="both", expand=True)
+        return tabela
+
+    def ao_exibir(self):
+        self.atualizar()
+
+    def atualizar(self):
+        # No modo estação, as consultas são as do servidor; operações e telas são medidas nesta estação
+        self.rotulo_status.config(text="Carregando...")
+        self.executor.submeter(lambda controller: controller.obter_diagnostico(), self._exibir, chave=self)
+
+    def _exibir(self, dados_banco):
+        local = diagnostico.instantaneo()
+        self.dados = {
+            "gerado_em": local["gerado_em"],
+            "limite_lenta_ms": dados_banco["limite_lenta_ms"],
+            "consultas": dados_banco["consultas"],
+            "consultas_lentas": dados_banco["consultas_lentas"],
+            "metodos": local["metodos"],
+            "telas": local["telas"],
+        }
+        for tabela, chave in ((self.tabela_consultas, "consultas"), (self.tabela_metodos, "metodos"), (self.tabela_telas, "telas")):
+            tabela.delete(*tabela.get_children())
+            for linha in self.dados[chave]:
+                valores = (linha["nome"], linha["quantidade"], linha["total_ms"], linha["media_ms"], linha["maximo_ms"])
+                tabela.insert("", "end", values=valores + ((linha["erros"],) if "erros" in linha else ()))
+        self.tabela_lentas.delete(*self.tabela_lentas.get_children())
+        for lenta in reversed(self.dados["consultas_lentas"]):
+            self.tabela_lentas.insert("", "end", values=(lenta["quando"], lenta["ms"], lenta["thread"], lenta["sql"], lenta["parametros"] or ""))
+        self.rotulo_status.config(
+            text=f"Atualizado em {self.dados['gerado_em']} - consultas lentas: acima de {self.dados['limite_lenta_ms']:g} ms"
+        )
+
+    def exportar_json(self):
+        if self.dados is None:
+            return
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar diagnóstico", defaultextension=".json", filetypes=[("JSON", "*.json")],
+            initialfile=f"diagnostico_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        )
+        if caminho:
+            diagnostico.exportar_json(caminho, self.dados)
+            messagebox.showinfo("Diagnóstico", f"Diagnóstico exportado para {caminho}")
+
+    def zerar(self):
+        diagnostico.zerar()
+        self.executor.submeter(lambda controller: controller.zerar_diagnostico(), lambda _: self.atualizar())
 
 # MainApplication - Classe Principal que gerencia a navegação
 class MainApplication:
-    def __init__(self, root):
+    def __init__(self, root, caminho_banco=CAMINHO_BANCO, url_servidor=None, ao_exibir_primeira_tela=None, backup_automatico=False):
         self.root = root
         self.root.geometry("1000x600")
         self.root.title("Sistema de Atendimento ao Gabinete")
-        self.model = AtendimentoModel()
-        self.controller = AtendimentoController(self.model)
+        if url_servidor:
+            # Modo estação: todas as operações com o banco passam pelo servidor
+            # O cliente HTTP só é importado neste modo
+            from servidor_atendimento import ControllerRemoto
+            self.model = None
+            self.controller = ControllerRemoto(url_servidor)
+            criar_controller = lambda: ControllerRemoto(url_servidor)
+        else:
+            self.model = AtendimentoModel(caminho_banco)
+            self.controller = AtendimentoController(self.model)
+            # As threads de consulta usam os mesmos caches de munícipes e de agregações da interface
+            criar_controller = lambda: AtendimentoController(
+                AtendimentoModel(caminho_banco), self.controller.cache_municipes, self.controller.cache_agregacoes
+            )
+        # Backup diário em segundo plano: normalmente é o servidor que faz; com o banco local compartilhado, só
+        # a estação aberta com --backup-automatico (a trava na pasta impede dois backups ao mesmo tempo)
+        self.agendador_backup = None
+        if backup_automatico and not url_servidor:
+            from backup_atendimento import AgendadorBackup
+            self.agendador_backup = AgendadorBackup(caminho_banco).iniciar()
+        # As consultas das telas rodam em segundo plano, com conexões próprias
+        self.executor = ExecutorConsultas(self.root, criar_controller)
+        # Mantém o registro de alterações usado na sincronização das telas com tamanho limitado
+        self.executor.submeter(lambda controller: controller.limpar_alteracoes(), lambda removidas: None)
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
+        # Tela de diagnóstico, sem botão no menu: aberta pelo suporte com Ctrl+Shift+D
+        self.root.bind("<Control-Shift-D>", lambda evento: self.switch_view(DiagnosticoView))
         self.current_view = None
+        # Telas já construídas, da menos para a mais recentemente usada
+        self.views = OrderedDict()
+        self.limite_views = LIMITE_VIEWS_EM_CACHE
         self.switch_view(DashboardView)
+        # Roda depois que o Tk desenha a janela (as tarefas de desenho são agendadas antes)
+        self.ao_exibir_primeira_tela = ao_exibir_primeira_tela
+        self.root.after_idle(self._medir_inicializacao)
+
+    def _medir_inicializacao(self):
+        decorrido = time.perf_counter() - INICIO_PROCESSO
+        diagnostico.registrar_tela("Inicialização: primeira tela", decorrido)
+        if decorrido * 1000 > ORCAMENTO_INICIALIZACAO_MS:
+            registro.warning("Primeira tela em %.0f ms (orçamento: %d ms)", decorrido * 1000, ORCAMENTO_INICIALIZACAO_MS)
+        if self.ao_exibir_primeira_tela is not None:
+            self.ao_exibir_primeira_tela(decorrido)
+
+    def fechar(self):
+        if self.agendador_backup is not None:
+            self.agendador_backup.parar()
+        self.executor.encerrar()
+        if self.model is not None:
+            self.model.fechar_conexao()
+        self.root.destroy()
 
     def switch_view(self, view_class):
-        # Remove a view atual e cria a nova view
+        # Esconde a view atual e reaproveita a nova view, se ela já tiver sido construída
         if self.current_view is not None:
             self.current_view.pack_forget()
-        self.current_view = view_class(self.root, self.controller, self.switch_view)
+        inicio = time.perf_counter()
+        if view_class in self.views:
+            self.views.move_to_end(view_class)
+            self.current_view = self.views[view_class]
+            # Atualiza apenas o que a tela precisa, sem reconstruí-la
+            if hasattr(self.current_view, "ao_exibir"):
+                self.current_view.ao_exibir()
+            diagnostico.registrar_tela(f"{view_class.__name__}: exibir", time.perf_counter() - inicio)
+        else:
+            self.current_view = view_class(self.root, self.controller, self.switch_view, self.executor)
+            self.views[view_class] = self.current_view
+            diagnostico.registrar_tela(f"{view_class.__name__}: construir", time.perf_counter() - inicio)
+            # Destrói as telas usadas há mais tempo quando o limite é ultrapassado
+            while len(self.views) > self.limite_views:
+                _, view_antiga = self.views.popitem(last=False)
+                self._descartar_view(view_antiga)
         self.current_view.pack(fill="both", expand=True)
 
+    def _descartar_view(self, view):
+        # Cancela as consultas que a tela ainda aguardava antes de destruí-la
+        self.executor.cancelar_de(view)
+        if hasattr(view, "carregador"):
+            self.executor.cancelar_de(view.carregador)
+        if hasattr(view, "ao_descartar"):
+            view.ao_descartar()
+        view.destroy()
+
 # Inicialização da Aplicação
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sistema de Atendimento ao Gabinete")
+    parser.add_argument("--banco", default=CAMINHO_BANCO, help="arquivo do banco de dados local")
+    parser.add_argument("--servidor", help="URL do servidor de atendimento (ex.: http://127.0.0.1:8765)")
+    parser.add_argument("--backup-automatico", action="store_true",
+                        help="faz o backup diário do banco local em segundo plano (ligue em uma única estação)")
+    parser.add_argument("--medir-inicializacao", action="store_true",
+                        help="mostra o tempo até a primeira tela e fecha (conferência do orçamento de inicialização)")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = MainApplication(root)
+    ao_exibir_primeira_tela = None
+    if args.medir_inicializacao:
+        def ao_exibir_primeira_tela(decorrido):
+            situacao = "dentro do" if decorrido * 1000 <= ORCAMENTO_INICIALIZACAO_MS else "ACIMA do"
+            print(f"Primeira tela em {decorrido * 1000:.0f} ms ({situacao} orçamento de {ORCAMENTO_INICIALIZACAO_MS} ms)")
+            root.after(INTERVALO_RESULTADOS_MS * 2, app.fechar)
+    app = MainApplication(root, args.banco, args.servidor, ao_exibir_primeira_tela, args.backup_automatico)
     root.mainloop()
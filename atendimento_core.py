@@ -0,0 +1,2734 @@
+# Núcleo do Sistema de Atendimento - banco de dados e regras da aplicação, sem interface gráfica
+# Usado pela interface Tk (Sistema de Atendimento.py) e pelo servidor (servidor_atendimento.py)
+import sqlite3
+import datetime
+import csv
+import functools
+import hashlib
+import io
+import json
+import logging
+import operator
+import re
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Contagens completas usadas para preencher (e conferir) a tabela resumo_atendimentos
+CONSULTAS_RESUMO = [
+    "INSERT INTO resumo_atendimentos (dimensao, valor, total) SELECT 'total', '', COUNT(*) FROM atendimentos",
+    "INSERT INTO resumo_atendimentos (dimensao, valor, total) SELECT 'status', status, COUNT(*) FROM atendimentos GROUP BY status",
+    "INSERT INTO resumo_atendimentos (dimensao, valor, total) SELECT 'prioridade', prioridade, COUNT(*) FROM atendimentos GROUP BY prioridade",
+    "INSERT INTO resumo_atendimentos (dimensao, valor, total) SELECT 'tipo_pedido', tipo_pedido, COUNT(*) FROM atendimentos GROUP BY tipo_pedido",
+    '''
+    INSERT INTO resumo_atendimentos (dimensao, valor, total)
+    SELECT 'bairro', m.bairro, COUNT(*) FROM atendimentos a JOIN municipes m ON a.cpf = m.cpf GROUP BY m.bairro
+    ''',
+]
+
+# Status que encerra um atendimento; os demais contam como abertos no Dashboard
+STATUS_CONCLUIDO = "Concluído"
+
+# Tabela agregado_atendimentos: contagens por mês x bairro x tipo de pedido x status x prioridade,
+# com a soma dos dias até a conclusão; os relatórios estatísticos agrupam essa tabela em vez dos atendimentos
+_SOMAR_AGREGADO = '''
+ON CONFLICT (mes, bairro, tipo_pedido, status, prioridade) DO UPDATE SET
+    total = total + excluded.total,
+    resolvidos = resolvidos + excluded.resolvidos,
+    dias_resolucao = dias_resolucao + excluded.dias_resolucao
+'''
+
+
+def _agregar_linha(linha, sinal):
+    # Soma (sinal "") ou subtrai (sinal "-") um atendimento (new/old) do agregado; sem munícipe ele fica de fora, como no JOIN
+    return f'''
+            INSERT INTO agregado_atendimentos (mes, bairro, tipo_pedido, status, prioridade, total, resolvidos, dias_resolucao)
+            SELECT substr({linha}.data_horario, 1, 7), bairro, {linha}.tipo_pedido, {linha}.status, {linha}.prioridade,
+                   {sinal}1, {sinal}({linha}.data_conclusao IS NOT NULL),
+                   {sinal}COALESCE(julianday({linha}.data_conclusao) - julianday({linha}.data_horario), 0)
+            FROM municipes WHERE cpf = {linha}.cpf
+            {_SOMAR_AGREGADO};'''
+
+
+def _agregar_municipe(linha, sinal):
+    # Soma ou subtrai do agregado todos os atendimentos de um munícipe (cadastro, mudança de bairro ou exclusão)
+    return f'''
+            INSERT INTO agregado_atendimentos (mes, bairro, tipo_pedido, status, prioridade, total, resolvidos, dias_resolucao)
+            SELECT substr(data_horario, 1, 7), {linha}.bairro, tipo_pedido, status, prioridade,
+                   {sinal}COUNT(*), {sinal}COUNT(data_conclusao), {sinal}TOTAL(julianday(data_conclusao) - julianday(data_horario))
+            FROM atendimentos WHERE cpf = {linha}.cpf
+            GROUP BY 1, 3, 4, 5
+            {_SOMAR_AGREGADO};'''
+
+
+# Data limite do atendimento a partir do prazo digitado: "10" ou "10 dias" contam a partir do registro;
+# uma data ("2025-03-15" ou "15/03/2025") vale até o fim do dia. Qualquer outro texto fica sem data limite
+_EXPRESSAO_DATA_LIMITE = '''
+CASE
+    WHEN trim(prazo_resolucao) GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+        THEN datetime(substr(trim(prazo_resolucao), 1, 10), '+1 day', '-1 second')
+    WHEN trim(prazo_resolucao) GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+        THEN datetime(substr(trim(prazo_resolucao), 7, 4) || '-' || substr(trim(prazo_resolucao), 4, 2) || '-'
+                      || substr(trim(prazo_resolucao), 1, 2), '+1 day', '-1 second')
+    WHEN CAST(trim(prazo_resolucao) AS INTEGER) > 0
+        THEN datetime(data_horario, '+' || CAST(trim(prazo_resolucao) AS INTEGER) || ' days')
+END
+'''
+
+
+
+def _conferir_chave_cpf(numero):
+    # Dígitos verificadores conferidos com aritmética inteira (bem mais barata que substr em cada dígito);
+    # 11111111111 divide os CPFs de um só dígito repetido, que são inválidos
+    digito = [f"({numero} / {10 ** (10 - posicao)} % 10)" for posicao in range(11)]
+    verificadores = [
+        f"({' + '.join(f'{digito[i]} * {posicao + 1 - i}' for i in range(posicao))}) * 10 % 11 % 10"
+        for posicao in (9, 10)
+    ]
+    return (f"CASE WHEN {numero} % 11111111111 <> 0 AND {digito[9]} = {verificadores[0]} "
+            f"AND {digito[10]} = {verificadores[1]} THEN {numero} END")
+
+
+def _expressao_chave_cpf(coluna):
+    # Chave numérica do CPF em SQL, com a mesma regra de normalizar_cpf: sem pontos, traços, barras e espaços,
+    # 11 dígitos e dígitos verificadores conferidos; NULL para um CPF inválido. O CPF gravado só com os
+    # dígitos (o caso comum) não passa pelos replace
+    onze_digitos = "[0-9]" * 11
+    digitos = f"replace(replace(replace(replace(trim({coluna}), '.', ''), '-', ''), '/', ''), ' ', '')"
+    return f'''
+CASE
+    WHEN {coluna} GLOB '{onze_digitos}' THEN {_conferir_chave_cpf(f"CAST({coluna} AS INTEGER)")}
+    WHEN {digitos} GLOB '{onze_digitos}' THEN {_conferir_chave_cpf(f"CAST({digitos} AS INTEGER)")}
+END
+'''
+
+
+CONSULTA_AGREGADO = '''
+INSERT INTO agregado_atendimentos (mes, bairro, tipo_pedido, status, prioridade, total, resolvidos, dias_resolucao)
+SELECT substr(a.data_horario, 1, 7), m.bairro, a.tipo_pedido, a.status, a.prioridade,
+       COUNT(*), COUNT(a.data_conclusao), TOTAL(julianday(a.data_conclusao) - julianday(a.data_horario))
+FROM atendimentos a JOIN municipes m ON a.cpf = m.cpf
+GROUP BY 1, 2, 3, 4, 5
+'''
+
+# Migrações do esquema - cada entrada leva o banco para a versão indicada (PRAGMA user_version)
+# Bancos antigos (user_version = 0) já possuem as tabelas, por isso a versão 1 usa IF NOT EXISTS
+MIGRACOES = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS municipes (
+            cpf TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            endereco TEXT,
+            bairro TEXT NOT NULL DEFAULT 'Bairro Não Informado',
+            telefone TEXT NOT NULL,
+            rg TEXT,
+            titulo_eleitor TEXT,
+            zona TEXT,
+            secao TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS atendimentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cpf TEXT NOT NULL,
+            tipo_pedido TEXT NOT NULL,
+            descricao TEXT,
+            anexos TEXT,
+            data_horario TEXT NOT NULL,
+            prazo_resolucao TEXT,
+            assessor TEXT,
+            prioridade TEXT NOT NULL DEFAULT 'Normal',
+            status TEXT NOT NULL DEFAULT 'Pendente',
+            FOREIGN KEY (cpf) REFERENCES municipes (cpf)
+        )
+        ''',
+    ]),
+    (2, [
+        # consultar_atendimentos sem filtro: ORDER BY a.data_horario DESC
+        "CREATE INDEX IF NOT EXISTS idx_atendimentos_data_horario ON atendimentos (data_horario)",
+        # consultar_atendimentos(filtro_cpf) e o JOIN por cpf: busca pelo cpf já ordenada pela data
+        "CREATE INDEX IF NOT EXISTS idx_atendimentos_cpf_data ON atendimentos (cpf, data_horario)",
+        # gerar_relatorio_tipo_pedido: índice de cobertura (id é o rowid)
+        "CREATE INDEX IF NOT EXISTS idx_atendimentos_tipo_cobertura ON atendimentos (tipo_pedido, cpf, status, prioridade)",
+        # gerar_relatorio_bairro: índice de cobertura para nome e cpf do munícipe
+        "CREATE INDEX IF NOT EXISTS idx_municipes_bairro_cobertura ON municipes (bairro, nome, cpf)",
+        "ANALYZE",
+    ]),
+    (3, [
+        # Busca textual (FTS5) sem acentos: "Joao" encontra "João"
+        # As tabelas usam o conteúdo externo das tabelas originais e são mantidas por triggers
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS municipes_fts USING fts5(
+            nome, endereco, bairro,
+            content='municipes', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS atendimentos_fts USING fts5(
+            descricao, tipo_pedido,
+            content='atendimentos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS municipes_fts_ai AFTER INSERT ON municipes BEGIN
+            INSERT INTO municipes_fts (rowid, nome, endereco, bairro)
+            VALUES (new.rowid, new.nome, new.endereco, new.bairro);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS municipes_fts_ad AFTER DELETE ON municipes BEGIN
+            INSERT INTO municipes_fts (municipes_fts, rowid, nome, endereco, bairro)
+            VALUES ('delete', old.rowid, old.nome, old.endereco, old.bairro);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS municipes_fts_au AFTER UPDATE ON municipes BEGIN
+            INSERT INTO municipes_fts (municipes_fts, rowid, nome, endereco, bairro)
+            VALUES ('delete', old.rowid, old.nome, old.endereco, old.bairro);
+            INSERT INTO municipes_fts (rowid, nome, endereco, bairro)
+            VALUES (new.rowid, new.nome, new.endereco, new.bairro);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS atendimentos_fts_ai AFTER INSERT ON atendimentos BEGIN
+            INSERT INTO atendimentos_fts (rowid, descricao, tipo_pedido)
+            VALUES (new.id, new.descricao, new.tipo_pedido);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS atendimentos_fts_ad AFTER DELETE ON atendimentos BEGIN
+            INSERT INTO atendimentos_fts (atendimentos_fts, rowid, descricao, tipo_pedido)
+            VALUES ('delete', old.id, old.descricao, old.tipo_pedido);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS atendimentos_fts_au AFTER UPDATE ON atendimentos BEGIN
+            INSERT INTO atendimentos_fts (atendimentos_fts, rowid, descricao, tipo_pedido)
+            VALUES ('delete', old.id, old.descricao, old.tipo_pedido);
+            INSERT INTO atendimentos_fts (rowid, descricao, tipo_pedido)
+            VALUES (new.id, new.descricao, new.tipo_pedido);
+        END
+        ''',
+        # Indexa os registros que já existiam antes da migração
+        "INSERT INTO municipes_fts (municipes_fts) VALUES ('rebuild')",
+        "INSERT INTO atendimentos_fts (atendimentos_fts) VALUES ('rebuild')",
+    ]),
+    (4, [
+        # Contagens de atendimentos por status, prioridade, tipo de pedido e bairro (e o total geral)
+        # Mantidas exatas por triggers, para que o Dashboard não precise de COUNT(*) sobre a tabela inteira
+        '''
+        CREATE TABLE IF NOT EXISTS resumo_atendimentos (
+            dimensao TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimensao, valor)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS resumo_atendimentos_ai AFTER INSERT ON atendimentos BEGIN
+            INSERT INTO resumo_atendimentos (dimensao, valor, total) VALUES
+                ('total', '', 1), ('status', new.status, 1),
+                ('prioridade', new.prioridade, 1), ('tipo_pedido', new.tipo_pedido, 1)
+            ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+            INSERT INTO resumo_atendimentos (dimensao, valor, total)
+            SELECT 'bairro', bairro, 1 FROM municipes WHERE cpf = new.cpf
+            ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS resumo_atendimentos_ad AFTER DELETE ON atendimentos BEGIN
+            UPDATE resumo_atendimentos SET total = total - 1
+            WHERE (dimensao = 'total' AND valor = '')
+               OR (dimensao = 'status' AND valor = old.status)
+               OR (dimensao = 'prioridade' AND valor = old.prioridade)
+               OR (dimensao = 'tipo_pedido' AND valor = old.tipo_pedido)
+               OR (dimensao = 'bairro' AND valor = (SELECT bairro FROM municipes WHERE cpf = old.cpf));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS resumo_atendimentos_au AFTER UPDATE OF cpf, status, prioridade, tipo_pedido ON atendimentos BEGIN
+            UPDATE resumo_atendimentos SET total = total - 1
+            WHERE (dimensao = 'status' AND valor = old.status)
+               OR (dimensao = 'prioridade' AND valor = old.prioridade)
+               OR (dimensao = 'tipo_pedido' AND valor = old.tipo_pedido)
+               OR (dimensao = 'bairro' AND valor = (SELECT bairro FROM municipes WHERE cpf = old.cpf));
+            INSERT INTO resumo_atendimentos (dimensao, valor, total) VALUES
+                ('status', new.status, 1), ('prioridade', new.prioridade, 1), ('tipo_pedido', new.tipo_pedido, 1)
+            ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+            INSERT INTO resumo_atendimentos (dimensao, valor, total)
+            SELECT 'bairro', bairro, 1 FROM municipes WHERE cpf = new.cpf
+            ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        # O bairro vem do munícipe: um cadastro novo ou uma mudança de bairro move os atendimentos dele
+        '''
+        CREATE TRIGGER IF NOT EXISTS resumo_municipes_ai AFTER INSERT ON municipes BEGIN
+            INSERT INTO resumo_atendimentos (dimensao, valor, total)
+            SELECT 'bairro', new.bairro, COUNT(*) FROM atendimentos WHERE cpf = new.cpf
+            ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + excluded.total;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS resumo_municipes_au AFTER UPDATE OF cpf, bairro ON municipes
+        WHEN old.cpf IS NOT new.cpf OR old.bairro IS NOT new.bairro BEGIN
+            UPDATE resumo_atendimentos
+            SET total = total - (SELECT COUNT(*) FROM atendimentos WHERE cpf = old.cpf)
+            WHERE dimensao = 'bairro' AND valor = old.bairro;
+            INSERT INTO resumo_atendimentos (dimensao, valor, total)
+            SELECT 'bairro', new.bairro, COUNT(*) FROM atendimentos WHERE cpf = new.cpf
+            ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + excluded.total;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS resumo_municipes_ad AFTER DELETE ON municipes BEGIN
+            UPDATE resumo_atendimentos
+            SET total = total - (SELECT COUNT(*) FROM atendimentos WHERE cpf = old.cpf)
+            WHERE dimensao = 'bairro' AND valor = old.bairro;
+        END
+        ''',
+        # Preenche o resumo com os atendimentos que já existiam antes da migração
+        "DELETE FROM resumo_atendimentos",
+        *CONSULTAS_RESUMO,
+    ]),
+    (5, [
+        # Registro de alterações: cada gravação em um atendimento recebe uma versão crescente,
+        # e as telas abertas buscam apenas o que mudou desde a última versão que viram
+        # AUTOINCREMENT garante que uma versão nunca é reutilizada, mesmo após a limpeza do registro
+        '''
+        CREATE TABLE IF NOT EXISTS alteracoes_atendimentos (
+            versao INTEGER PRIMARY KEY AUTOINCREMENT,
+            atendimento_id INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS alteracoes_atendimentos_ai AFTER INSERT ON atendimentos BEGIN
+            INSERT INTO alteracoes_atendimentos (atendimento_id) VALUES (new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS alteracoes_atendimentos_au AFTER UPDATE ON atendimentos BEGIN
+            INSERT INTO alteracoes_atendimentos (atendimento_id) VALUES (new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS alteracoes_atendimentos_ad AFTER DELETE ON atendimentos BEGIN
+            INSERT INTO alteracoes_atendimentos (atendimento_id) VALUES (old.id);
+        END
+        ''',
+        # O nome exibido nas listas vem do munícipe
+        '''
+        CREATE TRIGGER IF NOT EXISTS alteracoes_municipes_au AFTER UPDATE OF nome ON municipes
+        WHEN old.nome IS NOT new.nome BEGIN
+            INSERT INTO alteracoes_atendimentos (atendimento_id)
+            SELECT id FROM atendimentos WHERE cpf = new.cpf;
+        END
+        ''',
+    ]),
+    (6, [
+        # Data em que o atendimento foi concluído, para o tempo médio de resolução
+        "ALTER TABLE atendimentos ADD COLUMN data_conclusao TEXT",
+        '''
+        CREATE TABLE IF NOT EXISTS agregado_atendimentos (
+            mes TEXT NOT NULL,
+            bairro TEXT NOT NULL,
+            tipo_pedido TEXT NOT NULL,
+            status TEXT NOT NULL,
+            prioridade TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            resolvidos INTEGER NOT NULL DEFAULT 0,
+            dias_resolucao REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, bairro, tipo_pedido, status, prioridade)
+        ) WITHOUT ROWID
+        ''',
+        f"CREATE TRIGGER IF NOT EXISTS agregado_atendimentos_ai AFTER INSERT ON atendimentos BEGIN {_agregar_linha('new', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS agregado_atendimentos_ad AFTER DELETE ON atendimentos BEGIN {_agregar_linha('old', '-')} END",
+        f'''
+        CREATE TRIGGER IF NOT EXISTS agregado_atendimentos_au
+        AFTER UPDATE OF cpf, data_horario, tipo_pedido, status, prioridade, data_conclusao ON atendimentos BEGIN
+            {_agregar_linha('old', '-')}
+            {_agregar_linha('new', '')}
+        END
+        ''',
+        f"CREATE TRIGGER IF NOT EXISTS agregado_municipes_ai AFTER INSERT ON municipes BEGIN {_agregar_municipe('new', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS agregado_municipes_ad AFTER DELETE ON municipes BEGIN {_agregar_municipe('old', '-')} END",
+        f'''
+        CREATE TRIGGER IF NOT EXISTS agregado_municipes_au AFTER UPDATE OF cpf, bairro ON municipes
+        WHEN old.cpf IS NOT new.cpf OR old.bairro IS NOT new.bairro BEGIN
+            {_agregar_municipe('old', '-')}
+            {_agregar_municipe('new', '')}
+        END
+        ''',
+        # Mudar o bairro de um munícipe altera as estatísticas: entra no registro de alterações (versão dos dados)
+        '''
+        CREATE TRIGGER IF NOT EXISTS alteracoes_municipes_bairro_au AFTER UPDATE OF bairro ON municipes
+        WHEN old.bairro IS NOT new.bairro BEGIN
+            INSERT INTO alteracoes_atendimentos (atendimento_id)
+            SELECT id FROM atendimentos WHERE cpf = new.cpf;
+        END
+        ''',
+        CONSULTA_AGREGADO,
+    ]),
+    (7, [
+        # Coluna calculada (não ocupa espaço na tabela) com a data limite; acompanha qualquer mudança no prazo
+        f"ALTER TABLE atendimentos ADD COLUMN data_limite TEXT GENERATED ALWAYS AS ({_EXPRESSAO_DATA_LIMITE}) VIRTUAL",
+        # Fila de prazos: só os atendimentos em aberto, por prioridade e data limite
+        # As consultas repetem a condição do índice parcial literalmente, senão o SQLite não o usa
+        f'''
+        CREATE INDEX IF NOT EXISTS idx_atendimentos_abertos_prazo ON atendimentos (prioridade, data_limite)
+        WHERE status <> '{STATUS_CONCLUIDO}'
+        ''',
+        "ANALYZE",
+    ]),
+    (8, [
+        # Quadro de tarefas: cada coluna (status) é lida por prioridade e data, página a página
+        "CREATE INDEX IF NOT EXISTS idx_atendimentos_status_prioridade_data ON atendimentos (status, prioridade, data_horario)",
+        "ANALYZE",
+    ]),
+    (9, [
+        # Anexos: o conteúdo fica no armazém em disco (ArmazemAnexos); o banco guarda só o hash e os metadados
+        '''
+        CREATE TABLE IF NOT EXISTS anexos (
+            hash TEXT PRIMARY KEY,
+            tamanho INTEGER NOT NULL,
+            tipo TEXT,
+            criado_em TEXT NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS anexos_atendimentos (
+            atendimento_id INTEGER NOT NULL,
+            hash TEXT NOT NULL REFERENCES anexos (hash),
+            nome_arquivo TEXT NOT NULL,
+            adicionado_em TEXT NOT NULL,
+            PRIMARY KEY (atendimento_id, hash)
+        ) WITHOUT ROWID
+        ''',
+        # Contagem de referências ao remover um anexo
+        "CREATE INDEX IF NOT EXISTS idx_anexos_atendimentos_hash ON anexos_atendimentos (hash)",
+    ]),
+    (10, [
+        # Sincronização entre estações: versão por linha (a maior vence), com data e estação da última alteração
+        # para desempatar; ADD COLUMN com valor constante não reescreve a tabela
+        "ALTER TABLE municipes ADD COLUMN versao INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE municipes ADD COLUMN alterado_em TEXT",
+        "ALTER TABLE municipes ADD COLUMN alterado_por TEXT",
+        "ALTER TABLE atendimentos ADD COLUMN versao INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE atendimentos ADD COLUMN alterado_em TEXT",
+        "ALTER TABLE atendimentos ADD COLUMN alterado_por TEXT",
+        # Atendimento criado em outra estação: (estação de origem, id lá); NULL = criado nesta estação
+        "ALTER TABLE atendimentos ADD COLUMN origem TEXT",
+        "ALTER TABLE atendimentos ADD COLUMN origem_id INTEGER",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_atendimentos_origem ON atendimentos (origem, origem_id) WHERE origem IS NOT NULL",
+        # Esta estação (local = 1) e as estações com que já trocou pacotes, com até onde cada lado recebeu
+        '''
+        CREATE TABLE IF NOT EXISTS estacoes_sincronizacao (
+            estacao TEXT PRIMARY KEY,
+            local INTEGER NOT NULL DEFAULT 0,
+            enviado_ate INTEGER NOT NULL DEFAULT 0,
+            recebido_ate INTEGER NOT NULL DEFAULT 0,
+            sincronizado_em TEXT
+        )
+        ''',
+        "INSERT INTO estacoes_sincronizacao (estacao, local) VALUES (lower(hex(randomblob(16))), 1)",
+        # Registro de sincronização: munícipes e atendimentos gravados, em ordem; um pacote leva só o que
+        # foi gravado depois da última confirmação do destino. chave sem tipo: guarda o CPF e o id como vieram
+        '''
+        CREATE TABLE IF NOT EXISTS registro_sincronizacao (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            chave NOT NULL
+        )
+        ''',
+        # A sequência começa em 1: o que foi gravado antes da migração conta como seq 1, e 0 significa
+        # "nada confirmado" (o destino recebe o pacote completo)
+        "INSERT INTO registro_sincronizacao (tabela, chave) VALUES ('inicio', '')",
+        "DELETE FROM registro_sincronizacao",
+        '''
+        CREATE TRIGGER IF NOT EXISTS sincronizacao_municipes_ai AFTER INSERT ON municipes BEGIN
+            INSERT INTO registro_sincronizacao (tabela, chave) VALUES ('municipes', new.cpf);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS sincronizacao_municipes_au AFTER UPDATE ON municipes BEGIN
+            INSERT INTO registro_sincronizacao (tabela, chave) VALUES ('municipes', new.cpf);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS sincronizacao_atendimentos_ai AFTER INSERT ON atendimentos BEGIN
+            INSERT INTO registro_sincronizacao (tabela, chave) VALUES ('atendimentos', new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS sincronizacao_atendimentos_au AFTER UPDATE ON atendimentos BEGIN
+            INSERT INTO registro_sincronizacao (tabela, chave) VALUES ('atendimentos', new.id);
+        END
+        ''',
+        # O índice textual só é refeito quando muda o texto indexado (não a cada mudança de status ou versão)
+        "DROP TRIGGER IF EXISTS municipes_fts_au",
+        '''
+        CREATE TRIGGER IF NOT EXISTS municipes_fts_au AFTER UPDATE OF nome, endereco, bairro ON municipes BEGIN
+            INSERT INTO municipes_fts (municipes_fts, rowid, nome, endereco, bairro)
+            VALUES ('delete', old.rowid, old.nome, old.endereco, old.bairro);
+            INSERT INTO municipes_fts (rowid, nome, endereco, bairro)
+            VALUES (new.rowid, new.nome, new.endereco, new.bairro);
+        END
+        ''',
+        "DROP TRIGGER IF EXISTS atendimentos_fts_au",
+        '''
+        CREATE TRIGGER IF NOT EXISTS atendimentos_fts_au AFTER UPDATE OF descricao, tipo_pedido ON atendimentos BEGIN
+            INSERT INTO atendimentos_fts (atendimentos_fts, rowid, descricao, tipo_pedido)
+            VALUES ('delete', old.id, old.descricao, old.tipo_pedido);
+            INSERT INTO atendimentos_fts (rowid, descricao, tipo_pedido)
+            VALUES (new.id, new.descricao, new.tipo_pedido);
+        END
+        ''',
+    ]),
+    (11, [
+        # Arquivo morto: ids do lote que está sendo movido para o banco de arquivo; a exclusão desses
+        # atendimentos não sai do agregado, que continua cobrindo todo o histórico
+        "CREATE TABLE IF NOT EXISTS arquivamento_lote (id INTEGER PRIMARY KEY)",
+        "DROP TRIGGER IF EXISTS agregado_atendimentos_ad",
+        f'''
+        CREATE TRIGGER IF NOT EXISTS agregado_atendimentos_ad AFTER DELETE ON atendimentos
+        WHEN NOT EXISTS (SELECT 1 FROM arquivamento_lote WHERE id = old.id) BEGIN {_agregar_linha('old', '-')} END
+        ''',
+        # Candidatos ao arquivamento (concluídos, pela data de conclusão; sem ela, pela data do atendimento)
+        f'''
+        CREATE INDEX IF NOT EXISTS idx_atendimentos_arquivamento ON atendimentos (COALESCE(data_conclusao, data_horario))
+        WHERE status = '{STATUS_CONCLUIDO}'
+        ''',
+    ]),
+    (12, [
+        # Chave numérica do CPF (coluna calculada): "123.456.789-09", "12345678909" e " 123 456 789 09" dão a mesma
+        # chave, e toda busca por CPF é uma busca exata no índice dela
+        f"ALTER TABLE municipes ADD COLUMN cpf_chave INTEGER GENERATED ALWAYS AS ({_expressao_chave_cpf('cpf')}) VIRTUAL",
+        # CPFs válidos gravados com pontuação ou espaços: só eles podem repetir um cadastro
+        '''
+        CREATE TEMP TABLE cpf_formatados AS
+        SELECT cpf, printf('%011d', cpf_chave) AS cpf_digitos FROM municipes
+        WHERE cpf GLOB '*[^0-9]*' AND cpf_chave IS NOT NULL
+        ''',
+        # Cadastros repetidos (o mesmo CPF digitado com formatações diferentes): fica o que já está só com os
+        # dígitos, ou o mais antigo; os outros são guardados aqui, para conferência, e unidos a ele
+        '''
+        CREATE TABLE IF NOT EXISTS cpf_duplicados (
+            cpf TEXT NOT NULL,
+            cpf_mantido TEXT NOT NULL,
+            nome TEXT,
+            endereco TEXT,
+            bairro TEXT,
+            telefone TEXT,
+            rg TEXT,
+            titulo_eleitor TEXT,
+            zona TEXT,
+            secao TEXT,
+            atendimentos INTEGER NOT NULL,
+            unido_em TEXT NOT NULL
+        )
+        ''',
+        '''
+        INSERT INTO cpf_duplicados (cpf, cpf_mantido, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao,
+                                    atendimentos, unido_em)
+        SELECT cpf, printf('%011d', cpf_chave), nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao,
+               (SELECT COUNT(*) FROM atendimentos WHERE atendimentos.cpf = repetidos.cpf), datetime('now', 'localtime')
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY cpf_chave ORDER BY cpf GLOB '*[^0-9]*', rowid) AS ordem
+            FROM municipes
+            WHERE cpf IN (SELECT cpf FROM temp.cpf_formatados UNION SELECT cpf_digitos FROM temp.cpf_formatados)
+        ) AS repetidos
+        WHERE ordem > 1
+        ''',
+        # Os atendimentos (também os do arquivo morto, que passa por esta migração) passam para o CPF só com
+        # os dígitos antes dos munícipes, para que os triggers movam as contagens por bairro para o cadastro mantido
+        f'''
+        UPDATE atendimentos SET cpf = printf('%011d', {_expressao_chave_cpf('cpf')})
+        WHERE cpf GLOB '*[^0-9]*' AND {_expressao_chave_cpf('cpf')} IS NOT NULL
+        ''',
+        "DELETE FROM municipes WHERE cpf IN (SELECT cpf FROM cpf_duplicados)",
+        '''
+        UPDATE municipes SET cpf = (SELECT cpf_digitos FROM temp.cpf_formatados f WHERE f.cpf = municipes.cpf)
+        WHERE cpf IN (SELECT cpf FROM temp.cpf_formatados)
+        ''',
+        "DROP TABLE temp.cpf_formatados",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_municipes_cpf_chave ON municipes (cpf_chave)",
+        "ANALYZE municipes",
+    ]),
+]
+
+
+# Consulta base dos atendimentos com os dados do munícipe
+CONSULTA_ATENDIMENTOS = '''
+SELECT
+    a.id,               -- 0: ID do atendimento
+    m.cpf,              -- 1: CPF do munícipe
+    m.nome,             -- 2: Nome do munícipe
+    a.tipo_pedido,      -- 3: Tipo de pedido
+    a.descricao,        -- 4: Descrição do atendimento
+    a.data_horario,     -- 5: Data e horário do atendimento
+    a.prazo_resolucao,  -- 6: Prazo para resolução
+    a.assessor,         -- 7: Assessor responsável
+    a.status,           -- 8: Status do atendimento
+    a.prioridade        -- 9: Prioridade do atendimento
+FROM atendimentos a
+JOIN municipes m ON a.cpf = m.cpf
+'''
+
+# Fila de prazos - ordem das prioridades (as que não estão na lista vêm por último) e tamanho da lista
+ORDEM_PRIORIDADES = ("Urgente", "Alta", "Normal", "Baixa")
+LIMITE_FILA_PRAZOS = 50
+
+CONSULTA_FILA_PRAZOS = f'''
+SELECT a.id, m.cpf, m.nome, a.tipo_pedido, a.prioridade, a.status, a.data_limite, a.assessor
+FROM atendimentos a
+JOIN municipes m ON a.cpf = m.cpf
+WHERE a.status <> '{STATUS_CONCLUIDO}'
+'''
+
+# Quadro de tarefas (Kanban) - uma coluna por status, na ordem do fluxo de um atendimento
+STATUS_ATENDIMENTO = ("Pendente", "Em Andamento", STATUS_CONCLUIDO)
+
+# Colunas de um cartão do quadro; data_horario na posição 5, como em CONSULTA_ATENDIMENTOS
+CONSULTA_QUADRO = '''
+SELECT a.id, m.cpf, m.nome, a.tipo_pedido, a.prioridade, a.data_horario, a.status, a.data_limite
+FROM atendimentos a
+JOIN municipes m ON a.cpf = m.cpf
+WHERE a.status = ?
+'''
+
+# Caminho padrão do banco de dados
+CAMINHO_BANCO = 'atendimentos.db'
+
+# Arquivo morto - atendimentos concluídos antes de uma data de corte saem do banco principal para um banco
+# com o mesmo esquema, em lotes curtos com uma pausa entre eles para não bloquear as gravações das estações
+TAMANHO_LOTE_ARQUIVAMENTO = 250
+PAUSA_ARQUIVAMENTO_S = 0.05
+
+CONSULTA_CANDIDATOS_ARQUIVAMENTO = f'''
+SELECT id FROM atendimentos
+WHERE status = '{STATUS_CONCLUIDO}' AND COALESCE(data_conclusao, data_horario) < ?
+'''
+
+
+def caminho_arquivo_morto(caminho_banco):
+    # O arquivo morto fica ao lado do banco (atendimentos.db -> atendimentos_arquivo.db)
+    return os.path.splitext(os.path.abspath(caminho_banco))[0] + "_arquivo.db"
+
+
+def _no_esquema(consulta, esquema):
+    # A mesma consulta lendo os atendimentos de um banco anexado; os munícipes ficam sempre no principal
+    if esquema == "main":
+        return consulta
+    return consulta.replace("FROM atendimentos a", f"FROM {esquema}.atendimentos a")
+
+
+# Configuração aplicada a cada conexão com o banco
+# WAL deixa as leituras seguirem durante as gravações e, com synchronous = NORMAL,
+# o fsync acontece nos checkpoints em vez de em todo commit
+PRAGMAS_CONEXAO = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,       # ~20 MB de cache de páginas (valor negativo = KiB)
+    "mmap_size": 268435456,     # 256 MB de leitura por memória mapeada
+    "busy_timeout": 5000,       # espera até 5 s quando outra conexão está gravando
+    "temp_store": "MEMORY",
+}
+
+# Quantidade de linhas buscadas por vez nas tabelas paginadas
+TAMANHO_PAGINA = 100
+
+
+def _expressao_fts(termo):
+    # Cada palavra vira um prefixo entre aspas, assim o texto digitado nunca é lido como sintaxe do FTS5
+    palavras = [palavra.replace('"', '""') for palavra in termo.split()]
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+# Relatórios em PDF - cada página comporta 5 atendimentos; relatórios grandes são divididos
+# em partes com um número inteiro de páginas, geradas em paralelo e depois unidas
+ATENDIMENTOS_POR_PAGINA = 5
+ATENDIMENTOS_POR_PARTE = ATENDIMENTOS_POR_PAGINA * 200
+
+
+def _desenhar_atendimentos(c, atendimentos, com_titulo):
+    # Desenha os atendimentos a partir do topo de uma página nova
+    c.setFont("Helvetica", 10)
+    y = 750
+    if com_titulo:
+        c.drawString(100, 750, "Relatório Completo de Atendimentos")
+        c.drawString(100, 735, "-" * 80)
+        y = 720
+
+    for indice, atendimento in enumerate(atendimentos):
+        try:
+            # Atualize os índices de acordo com a consulta SQL
+            c.drawString(100, y, f"ID: {atendimento[0]}")                 # ID
+            c.drawString(100, y - 15, f"CPF: {atendimento[1]}")           # CPF
+            c.drawString(100, y - 30, f"Nome: {atendimento[2]}")          # Nome
+            c.drawString(100, y - 45, f"Tipo de Pedido: {atendimento[3]}")# Tipo de Pedido
+            c.drawString(100, y - 60, f"Descrição: {atendimento[4]}")     # Descrição
+            c.drawString(100, y - 75, f"Data/Horário: {atendimento[5]}")  # Data e Horário
+            c.drawString(100, y - 90, f"Prazo: {atendimento[6]}")         # Prazo
+            c.drawString(100, y - 105, f"Assessor: {atendimento[7]}")     # Assessor
+            c.drawString(100, y - 120, f"Status: {atendimento[8]}")       # Status
+            c.drawString(100, y - 135, f"Prioridade: {atendimento[9]}")   # Prioridade
+            y -= 160
+
+            # Verifique se a página precisa ser mudada (sem deixar uma página em branco no final)
+            if y < 50 and indice < len(atendimentos) - 1:
+                c.showPage()
+                c.setFont("Helvetica", 10)
+                y = 750
+        except IndexError:
+            print(f"Erro ao acessar os dados do atendimento: {atendimento}")
+
+
+def _renderizar_parte_pdf(atendimentos, caminho_pdf, com_titulo):
+    # Executada nos processos do pool: gera o PDF de uma parte do relatório
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(caminho_pdf, pagesize=letter)
+    _desenhar_atendimentos(c, atendimentos, com_titulo)
+    c.save()
+    return len(atendimentos)
+
+
+# Relatório estatístico - métricas usadas nas tabelas por tipo de pedido e por bairro
+METRICAS_RELATORIO_ESTATISTICO = ("total", "percentual_pendentes", "dias_resolucao")
+
+
+def _formatar_valor(valor):
+    if valor is None:
+        return "-"
+    if isinstance(valor, float):
+        return f"{valor:.1f}".replace(".", ",")
+    return str(valor)
+
+
+def _desenhar_tabela(c, y, cabecalho, linhas, larguras, topo, x=50):
+    # Tabela simples a partir de y; ao mudar de página repete o cabeçalho. Retorna o y seguinte
+    def desenhar_cabecalho(y):
+        c.setFont("Helvetica-Bold", 8)
+        posicao = x
+        for texto, largura in zip(cabecalho, larguras):
+            c.drawString(posicao, y, str(texto)[:int(largura / 4.5)])
+            posicao += largura
+        c.line(x, y - 3, x + sum(larguras), y - 3)
+        c.setFont("Helvetica", 8)
+        return y - 13
+
+    y = desenhar_cabecalho(y)
+    for linha in linhas:
+        if y < 50:
+            c.showPage()
+            y = desenhar_cabecalho(topo)
+        posicao = x
+        for valor, largura in zip(linha, larguras):
+            c.drawString(posicao, y, _formatar_valor(valor)[:int(largura / 4.5)])
+            posicao += largura
+        y -= 11
+    return y - 15
+
+
+def _desenhar_grafico_mensal(c, y, por_mes, largura=500, altura=120, x=50):
+    # Barras do total de atendimentos por mês, com a parte ainda pendente destacada. Retorna o y seguinte
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(x, y, "Atendimentos por mês (em laranja, os ainda pendentes)")
+    base = y - 20 - altura
+    maximo = max((linha[1] for linha in por_mes), default=0) or 1
+    passo = largura / max(len(por_mes), 1)
+    intervalo_rotulos = max(1, int(30 // passo) + 1)  # evita rótulos sobrepostos
+    c.setFont("Helvetica", 6)
+    c.drawString(x, y - 15, f"máx.: {maximo}")
+    for indice, (mes, total, pendentes, _concluidos) in enumerate(por_mes):
+        esquerda = x + indice * passo
+        c.setFillColorRGB(0.6, 0.6, 0.6)
+        c.rect(esquerda, base, passo * 0.8, altura * total / maximo, fill=1, stroke=0)
+        c.setFillColorRGB(0.95, 0.55, 0.1)
+        c.rect(esquerda, base, passo * 0.8, altura * pendentes / maximo, fill=1, stroke=0)
+        if indice % intervalo_rotulos == 0:
+            c.setFillColorRGB(0, 0, 0)
+            c.drawString(esquerda, base - 9, mes)
+    c.setFillColorRGB(0, 0, 0)
+    c.line(x, base, x + largura, base)
+    return base - 30
+
+
+def _desenhar_resumo_estatistico(c, resumo, retrato, paisagem):
+    # Página 1 em diante (retrato): visão geral, gráfico mensal e tabelas por tipo de pedido e por bairro
+    # Última parte (paisagem): matriz bairro x tipo de pedido
+    topo = retrato[1] - 42
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, topo, "Relatório Estatístico de Atendimentos")
+    inicio, fim = resumo["periodo"] or (None, None)
+    c.setFont("Helvetica", 9)
+    c.drawString(50, topo - 15, f"Período: {inicio or 'início'} a {fim or 'hoje'}   "
+                                f"Gerado em {datetime.datetime.now():%d/%m/%Y %H:%M}")
+    geral = resumo["geral"]
+    if not geral["total"]:
+        c.drawString(50, topo - 40, "Nenhum atendimento no período.")
+        return
+
+    c.setFont("Helvetica", 10)
+    linhas_gerais = [
+        f"Total de atendimentos: {geral['total']}",
+        f"Pendentes: {geral['pendentes']} ({_formatar_valor(geral['percentual_pendentes'])}%)",
+        f"Concluídos: {geral['concluidos']}",
+        f"Tempo médio de resolução: {_formatar_valor(geral['dias_resolucao'])} dia(s)",
+    ]
+    y = topo - 40
+    for texto in linhas_gerais:
+        c.drawString(50, y, texto)
+        y -= 14
+    y = _desenhar_grafico_mensal(c, y - 15, resumo["por_mes"])
+
+    tabelas = (("Por tipo de pedido", "Tipo de pedido", "por_tipo_pedido"), ("Por bairro", "Bairro", "por_bairro"))
+    for titulo, coluna, chave in tabelas:
+        if y < 120:
+            c.showPage()
+            y = topo
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(50, y, titulo)
+        y = _desenhar_tabela(c, y - 16, [coluna, "Atendimentos", "% pendentes", "Dias p/ resolver"], resumo[chave],
+                             [200, 90, 90, 90], topo)
+
+    # Matriz em paisagem: uma linha por bairro, uma coluna por tipo de pedido
+    c.showPage()
+    c.setPageSize(paisagem)
+    topo = paisagem[1] - 42
+    tipos = sorted({tipo for _, tipo, _ in resumo["bairro_tipo"]})
+    matriz = {}
+    for bairro, tipo, total in resumo["bairro_tipo"]:
+        matriz.setdefault(bairro, {})[tipo] = total
+    linhas = [[bairro, *(valores.get(tipo, 0) for tipo in tipos), sum(valores.values())]
+              for bairro, valores in sorted(matriz.items())]
+    largura_tipo = max(30, min(60, (paisagem[0] - 100 - 130 - 50) / max(len(tipos), 1)))
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, topo, "Atendimentos por bairro e tipo de pedido")
+    _desenhar_tabela(c, topo - 16, ["Bairro", *tipos, "Total"], linhas,
+                     [130, *([largura_tipo] * len(tipos)), 50], topo)
+
+
+# Alterações mantidas no registro; uma tela que ficou mais atrás do que isso recarrega tudo
+LIMITE_REGISTRO_ALTERACOES = 10000
+
+# Acima dessa quantidade de atendimentos alterados, recarregar a tabela sai mais barato
+LIMITE_ALTERACOES_SINCRONIZACAO = 500
+
+# Quantidade de munícipes mantidos no cache do controller
+TAMANHO_CACHE_MUNICIPES = 256
+
+# Quantidade de agregações (combinações de dimensões, métricas e filtros) mantidas no cache do controller
+TAMANHO_CACHE_AGREGACOES = 64
+
+# Agregações - dimensões e métricas aceitas, sobre a tabela agregado_atendimentos
+# Só esses nomes chegam ao SQL; qualquer outro é recusado
+DIMENSOES_AGREGACAO = {
+    "mes": "mes",
+    "ano": "substr(mes, 1, 4)",
+    "bairro": "bairro",
+    "tipo_pedido": "tipo_pedido",
+    "status": "status",
+    "prioridade": "prioridade",
+}
+METRICAS_AGREGACAO = {
+    "total": "SUM(total)",
+    "pendentes": "SUM(CASE WHEN status = 'Pendente' THEN total ELSE 0 END)",
+    "concluidos": f"SUM(CASE WHEN status = '{STATUS_CONCLUIDO}' THEN total ELSE 0 END)",
+    "percentual_pendentes": "ROUND(100.0 * SUM(CASE WHEN status = 'Pendente' THEN total ELSE 0 END) / SUM(total), 1)",
+    "dias_resolucao": "ROUND(SUM(dias_resolucao) / NULLIF(SUM(resolvidos), 0), 1)",
+}
+
+
+# Cache LRU dos munícipes, compartilhado entre os controllers das threads de consulta
+class CacheMunicipes:
+    def __init__(self, capacidade=TAMANHO_CACHE_MUNICIPES):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self.geracao = 0  # muda a cada invalidação
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            valor = self._itens.get(chave)
+            if valor is None:
+                self.falhas += 1
+            else:
+                self.acertos += 1
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor, geracao):
+        # Uma leitura iniciada antes de uma invalidação pode trazer dados antigos: é descartada
+        with self._trava:
+            if geracao != self.geracao:
+                return
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave=None):
+        # Sem chave, esvazia o cache inteiro (ex.: após uma importação)
+        with self._trava:
+            self.geracao += 1
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+
+    def estatisticas(self):
+        with self._trava:
+            return {"acertos": self.acertos, "falhas": self.falhas, "itens": len(self._itens), "capacidade": self.capacidade}
+
+
+# Cache das agregações: cada resultado vale para a versão dos dados em que foi calculado
+# (versão do registro de alterações); qualquer gravação nos atendimentos o torna obsoleto
+class CacheAgregacoes:
+    def __init__(self, capacidade=TAMANHO_CACHE_AGREGACOES):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()  # chave -> (versao, resultado)
+        self._trava = threading.Lock()
+
+    def obter(self, chave, versao):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None or item[0] != versao:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            self._itens.move_to_end(chave)
+            return item[1]
+
+    def guardar(self, chave, versao, resultado):
+        with self._trava:
+            self._itens[chave] = (versao, resultado)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def estatisticas(self):
+        with self._trava:
+            return {"acertos": self.acertos, "falhas": self.falhas, "itens": len(self._itens), "capacidade": self.capacidade}
+
+
+# Armazém de anexos - arquivos copiados em blocos, sem carregar o arquivo inteiro na memória
+TAMANHO_BLOCO_ANEXO = 1024 * 1024
+LADO_MINIATURA = 160
+LIMITE_PREVIA_TEXTO = 2000
+
+_HASH_ANEXO = re.compile(r"[0-9a-f]{64}")
+
+
+def pasta_anexos(caminho_banco):
+    # Cada banco tem o seu armazém, ao lado do arquivo (atendimentos.db -> atendimentos_anexos)
+    return os.path.splitext(os.path.abspath(caminho_banco))[0] + "_anexos"
+
+
+# Armazém endereçado pelo conteúdo: cada arquivo fica em objetos/<2 primeiros>/<sha256>, uma única vez,
+# não importa quantos atendimentos o anexem; miniaturas e prévias são geradas no primeiro pedido e guardadas
+class ArmazemAnexos:
+    def __init__(self, pasta):
+        self.pasta = pasta
+
+    def caminho(self, hash_anexo):
+        # O hash vem do banco ou da rede: só aceita o formato do SHA-256, para não sair da pasta do armazém
+        if not _HASH_ANEXO.fullmatch(hash_anexo or ""):
+            raise ValueError(f"Referência de anexo inválida: {hash_anexo!r}")
+        return os.path.join(self.pasta, "objetos", hash_anexo[:2], hash_anexo)
+
+    def _subpasta(self, nome):
+        pasta = os.path.join(self.pasta, nome)
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    def guardar(self, caminho_origem, ao_progresso=None, cancelamento=None):
+        # Copia em blocos calculando o hash na mesma leitura; o arquivo só entra no armazém depois de completo.
+        # Retorna (hash, tamanho), ou None se cancelado
+        import tempfile
+        total = os.path.getsize(caminho_origem)
+        descritor, caminho_temporario = tempfile.mkstemp(suffix=".parcial", dir=self._subpasta("temporarios"))
+        resumo = hashlib.sha256()
+        copiados = 0
+        try:
+            with open(caminho_origem, "rb") as origem, os.fdopen(descritor, "wb") as destino:
+                while bloco := origem.read(TAMANHO_BLOCO_ANEXO):
+                    if cancelamento is not None and cancelamento.is_set():
+                        break
+                    resumo.update(bloco)
+                    destino.write(bloco)
+                    copiados += len(bloco)
+                    if ao_progresso is not None:
+                        ao_progresso(copiados, total)
+            if cancelamento is not None and cancelamento.is_set():
+                os.remove(caminho_temporario)
+                return None
+            hash_anexo = resumo.hexdigest()
+            caminho_final = self.caminho(hash_anexo)
+            if os.path.exists(caminho_final):
+                os.remove(caminho_temporario)  # o mesmo conteúdo já foi anexado antes
+            else:
+                os.makedirs(os.path.dirname(caminho_final), exist_ok=True)
+                os.replace(caminho_temporario, caminho_final)
+        except BaseException:
+            if os.path.exists(caminho_temporario):
+                os.remove(caminho_temporario)
+            raise
+        return hash_anexo, copiados
+
+    def remover(self, hash_anexo):
+        nomes = [self.caminho(hash_anexo), os.path.join(self.pasta, "previas", f"{hash_anexo}.txt")]
+        pasta_miniaturas = os.path.join(self.pasta, "miniaturas")
+        if os.path.isdir(pasta_miniaturas):
+            nomes += [os.path.join(pasta_miniaturas, nome) for nome in os.listdir(pasta_miniaturas) if nome.startswith(hash_anexo)]
+        for nome in nomes:
+            try:
+                os.remove(nome)
+            except FileNotFoundError:
+                pass
+
+    def copiar(self, hash_anexo, caminho_destino):
+        # Cópia com o nome e a extensão originais, para abrir ou salvar fora do armazém (o objeto não é alterado)
+        import shutil
+        shutil.copyfile(self.caminho(hash_anexo), caminho_destino)
+        return caminho_destino
+
+    def miniatura(self, hash_anexo, lado=LADO_MINIATURA):
+        # PNG reduzido de um anexo de imagem; None para outros arquivos ou sem o Pillow instalado
+        origem = self.caminho(hash_anexo)
+        caminho_miniatura = os.path.join(self._subpasta("miniaturas"), f"{hash_anexo}_{lado}.png")
+        if os.path.exists(caminho_miniatura):
+            return caminho_miniatura
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        try:
+            with Image.open(origem) as imagem:
+                imagem.draft("RGB", (lado, lado))  # JPEG: decodifica já reduzido, sem abrir o scan em tamanho real
+                imagem.thumbnail((lado, lado))
+                temporario = caminho_miniatura + ".parcial"
+                imagem.convert("RGBA" if imagem.mode in ("RGBA", "LA", "P") else "RGB").save(temporario, "PNG")
+        except (OSError, Image.DecompressionBombError):
+            return None  # não é uma imagem (ou não é suportada)
+        os.replace(temporario, caminho_miniatura)
+        return caminho_miniatura
+
+    def previa_texto(self, hash_anexo, limite=LIMITE_PREVIA_TEXTO):
+        # Texto da primeira página de um PDF; None para outros arquivos ou sem o pypdf instalado
+        origem = self.caminho(hash_anexo)
+        caminho_previa = os.path.join(self._subpasta("previas"), f"{hash_anexo}.txt")
+        if os.path.exists(caminho_previa):
+            with open(caminho_previa, encoding="utf-8") as arquivo:
+                return arquivo.read()
+        with open(origem, "rb") as arquivo:
+            if arquivo.read(5) != b"%PDF-":
+                return None
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return None
+        try:
+            texto = (PdfReader(origem).pages[0].extract_text() or "").strip()[:limite]
+        except Exception:
+            return None  # PDF danificado ou protegido
+        temporario = caminho_previa + ".parcial"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+        os.replace(temporario, caminho_previa)
+        return texto
+
+
+# Importação em lote - quantidade de linhas gravadas por transação
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+# Colunas esperadas nos arquivos CSV de importação
+COLUNAS_MUNICIPES = ["cpf", "nome", "endereco", "bairro", "telefone", "rg", "titulo_eleitor", "zona", "secao"]
+COLUNAS_ATENDIMENTOS = ["cpf", "tipo_pedido", "descricao", "data_horario", "prazo_resolucao", "assessor", "prioridade", "status"]
+
+# Pacotes de sincronização: JSON Lines compactado (gzip); a primeira linha é o cabeçalho, as demais
+# são [tabela, valores] na ordem das colunas abaixo (munícipes antes dos atendimentos)
+FORMATO_PACOTE_SINCRONIZACAO = 1
+COLUNAS_CONFLITO = ["versao", "alterado_em", "alterado_por"]
+COLUNAS_SINCRONIZACAO = {
+    "municipes": [*COLUNAS_MUNICIPES, *COLUNAS_CONFLITO],
+    "atendimentos": ["origem", "origem_id", "cpf", "tipo_pedido", "descricao", "anexos", "data_horario", "prazo_resolucao",
+                     "assessor", "prioridade", "status", "data_conclusao", *COLUNAS_CONFLITO],
+}
+
+# Exportação - linhas lidas do banco por vez (fetchmany); a memória não cresce com o total exportado
+TAMANHO_LOTE_EXPORTACAO = 2000
+
+# Cabeçalhos das exportações, na ordem das colunas de cada consulta
+CABECALHO_ATENDIMENTOS = ["id", "cpf", "nome", "tipo_pedido", "descricao", "data_horario",
+                          "prazo_resolucao", "assessor", "status", "prioridade"]
+CABECALHO_RELATORIO_RESUMIDO = ["id", "nome", "cpf", "tipo_pedido", "status", "prioridade", "bairro"]
+
+# Consulta dos relatórios por tipo de pedido e por bairro
+CONSULTA_RELATORIO_RESUMIDO = '''
+SELECT a.id, m.nome, m.cpf, a.tipo_pedido, a.status, a.prioridade, m.bairro
+FROM atendimentos a
+JOIN municipes m ON a.cpf = m.cpf
+'''
+
+# Limite de linhas de uma planilha do Excel; acima disso a exportação continua em outra planilha
+LINHAS_POR_PLANILHA_XLSX = 1048576
+
+_CARACTERES_INVALIDOS_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class EscritorCsv:
+    def __init__(self, caminho, cabecalho):
+        # ";" e utf-8-sig: abre direto no Excel em português e é aceito pela importação
+        self._arquivo = open(caminho, "w", newline="", encoding="utf-8-sig")
+        self._escritor = csv.writer(self._arquivo, delimiter=";")
+        self._escritor.writerow(cabecalho)
+
+    def escrever_lote(self, linhas):
+        self._escritor.writerows(linhas)
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class EscritorJsonLinhas:
+    def __init__(self, caminho, cabecalho):
+        self._arquivo = open(caminho, "w", encoding="utf-8")
+        self._cabecalho = cabecalho
+
+    def escrever_lote(self, linhas):
+        self._arquivo.writelines(
+            json.dumps(dict(zip(self._cabecalho, linha)), ensure_ascii=False) + "\n" for linha in linhas
+        )
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+# XLSX gravado diretamente no zip, linha a linha (sem montar a planilha na memória e sem dependências)
+class EscritorXlsx:
+    def __init__(self, caminho, cabecalho):
+        import zipfile
+        self._zip = zipfile.ZipFile(caminho, "w", zipfile.ZIP_DEFLATED)
+        self._cabecalho = cabecalho
+        self._planilhas = 0
+        self._planilha = None
+        self._abrir_planilha()
+
+    def _abrir_planilha(self):
+        import io
+        if self._planilha is not None:
+            self._fechar_planilha()
+        self._planilhas += 1
+        self._linha = 0
+        arquivo = self._zip.open(f"xl/worksheets/sheet{self._planilhas}.xml", "w", force_zip64=True)
+        self._planilha = io.TextIOWrapper(arquivo, encoding="utf-8")
+        self._planilha.write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._escrever_linhas([self._cabecalho])
+
+    def _fechar_planilha(self):
+        self._planilha.write("</sheetData></worksheet>")
+        self._planilha.close()
+
+    @staticmethod
+    def _celula(valor):
+        if valor is None:
+            return "<c/>"
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            return f"<c><v>{valor}</v></c>"
+        texto = _CARACTERES_INVALIDOS_XML.sub("", str(valor))
+        texto = texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+    def _escrever_linhas(self, linhas):
+        partes = []
+        for linha in linhas:
+            self._linha += 1
+            partes.append(f'<row r="{self._linha}">')
+            partes.extend(map(self._celula, linha))
+            partes.append("</row>")
+        self._planilha.write("".join(partes))
+
+    def escrever_lote(self, linhas):
+        while linhas:
+            espaco = LINHAS_POR_PLANILHA_XLSX - self._linha
+            if espaco <= 0:
+                self._abrir_planilha()
+                continue
+            self._escrever_linhas(linhas[:espaco])
+            linhas = linhas[espaco:]
+
+    def fechar(self):
+        # Os arquivos de índice do pacote são gravados no final, quando a quantidade de planilhas é conhecida
+        self._fechar_planilha()
+        numeros = range(1, self._planilhas + 1)
+        self._zip.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                      'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>' for n in numeros)
+            + '</Types>'
+        ))
+        self._zip.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        self._zip.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name="Atendimentos {n}" sheetId="{n}" r:id="rId{n}"/>' for n in numeros)
+            + '</sheets></workbook>'
+        ))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                      f'Target="worksheets/sheet{n}.xml"/>' for n in numeros)
+            + '</Relationships>'
+        ))
+        self._zip.close()
+
+
+# Formatos de exportação, escolhidos pela extensão do arquivo
+ESCRITORES_EXPORTACAO = {"csv": EscritorCsv, "jsonl": EscritorJsonLinhas, "xlsx": EscritorXlsx}
+
+
+def formato_exportacao(caminho, formato=None):
+    formato = (formato or os.path.splitext(caminho)[1].lstrip(".")).lower()
+    if formato == "json":
+        formato = "jsonl"
+    if formato not in ESCRITORES_EXPORTACAO:
+        raise ValueError(f"Formato de exportação não suportado: {formato or caminho}")
+    return formato
+
+
+_NAO_DIGITOS = re.compile(r"\D")
+
+
+def normalizar_cpf(cpf):
+    # Mantém apenas os dígitos e confere os dígitos verificadores; retorna None se o CPF for inválido
+    # Um CPF numérico (ex.: lido de volta de uma tabela Tk, que converte "01234567890") perdeu os zeros à esquerda
+    if isinstance(cpf, int):
+        cpf = f"{cpf:011d}"
+    digitos = _NAO_DIGITOS.sub("", str(cpf or ""))
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        return None
+    numeros = list(map(int, digitos))
+    for posicao in (9, 10):
+        soma = sum(map(operator.mul, numeros[:posicao], range(posicao + 1, 1, -1)))
+        if numeros[posicao] != soma * 10 % 11 % 10:
+            return None
+    return digitos
+
+
+def _condicao_cpf(cpf, tabela="municipes"):
+    # Busca exata por CPF: um CPF válido, em qualquer formatação, vai pela chave numérica; um inválido
+    # (cadastro antigo, gravado como foi digitado) só encontra o cadastro gravado igual, pela chave primária
+    cpf_normalizado = normalizar_cpf(cpf)
+    if cpf_normalizado is None:
+        return f"{tabela}.cpf = ?", cpf
+    return f"{tabela}.cpf_chave = ?", int(cpf_normalizado)
+
+
+def formatar_cpf(cpf):
+    # 12345678909 -> 123.456.789-09 (um CPF gravado de outro jeito é exibido como está)
+    if len(cpf) == 11 and cpf.isdigit():
+        return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+    return cpf
+
+
+def _cpf_para_cadastro(cpf):
+    # Um munícipe novo é gravado com o CPF só com os dígitos; dígitos verificadores errados recusam o cadastro
+    cpf_normalizado = normalizar_cpf(cpf)
+    if cpf_normalizado is None:
+        raise ValueError(f"CPF inválido: {cpf}")
+    return cpf_normalizado
+
+
+def _chave_cpf(cpf):
+    # Chave do cache: só os dígitos do CPF (sem validar, para não pesar em cada consulta)
+    if isinstance(cpf, int):
+        cpf = f"{cpf:011d}"
+    return _NAO_DIGITOS.sub("", str(cpf)) or str(cpf).strip()
+
+
+def normalizar_telefone(telefone):
+    # Mantém apenas os dígitos, sem o código do país (55) e sem o zero do DDD; exige DDD + número
+    digitos = _NAO_DIGITOS.sub("", str(telefone or "")).lstrip("0")
+    if len(digitos) in (12, 13) and digitos.startswith("55"):
+        digitos = digitos[2:]
+    if len(digitos) not in (10, 11):
+        return None
+    return digitos
+
+
+# Formatos de data aceitos na importação; a data é gravada sempre como AAAA-MM-DD HH:MM:SS,
+# que é o que a ordenação do histórico e a coluna data_limite esperam
+FORMATOS_DATA_IMPORTACAO = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+
+def normalizar_data_horario(texto):
+    # Retorna a data no formato gravado no banco, ou None se o texto não for uma data reconhecida
+    for formato in FORMATOS_DATA_IMPORTACAO:
+        try:
+            return datetime.datetime.strptime(texto.strip(), formato).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return None
+
+
+def _ler_csv_em_lotes(origem, tamanho_lote, encoding):
+    # Lê o arquivo aos poucos, entregando listas de (número da linha, registro)
+    # origem é o caminho do arquivo ou um texto já aberto (ex.: io.StringIO com a planilha enviada por uma estação)
+    if hasattr(origem, "read"):
+        yield from _ler_registros_csv(origem, tamanho_lote)
+        return
+    with open(origem, newline="", encoding=encoding) as arquivo:
+        yield from _ler_registros_csv(arquivo, tamanho_lote)
+
+
+def _ler_registros_csv(arquivo, tamanho_lote):
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(arquivo, dialect=dialeto)
+    lote = []
+    for registro in leitor:
+        # Normaliza os nomes das colunas (ex.: "CPF " -> "cpf")
+        registro = {(chave or "").strip().lower(): (valor or "").strip() for chave, valor in registro.items()}
+        lote.append((leitor.line_num, registro))
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# Consultas acima deste tempo (ms) entram no registro de consultas lentas
+LIMITE_CONSULTA_LENTA_MS = 100
+
+# Quantidade de consultas lentas mantidas no registro
+TAMANHO_REGISTRO_LENTAS = 200
+
+registro = logging.getLogger("atendimento")
+
+_COMENTARIO_SQL = re.compile(r"--[^\n]*")
+
+
+@functools.lru_cache(maxsize=512)
+def _normalizar_sql(sql):
+    # Agrupa as execuções da mesma consulta, independentemente da indentação e dos comentários
+    return " ".join(_COMENTARIO_SQL.sub("", sql).split())
+
+
+# Diagnóstico - tempos das consultas, das operações do controller e das telas
+# Um único objeto por processo, usado por todas as conexões e threads
+class Diagnostico:
+    def __init__(self, limite_lenta_ms=LIMITE_CONSULTA_LENTA_MS):
+        self.ativo = True
+        self.limite_lenta = limite_lenta_ms / 1000
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.consultas = {}  # sql -> [execuções, tempo total, tempo máximo]
+            self.metodos = {}    # operação do controller -> [chamadas, tempo total, tempo máximo, erros]
+            self.telas = {}      # evento de tela -> [ocorrências, tempo total, tempo máximo]
+            self.lentas = deque(maxlen=TAMANHO_REGISTRO_LENTAS)
+
+    @staticmethod
+    def _acumular(tabela, chave, segundos, execucoes=1):
+        dados = tabela.get(chave)
+        if dados is None:
+            dados = tabela[chave] = [0, 0.0, 0.0]
+        dados[0] += execucoes
+        dados[1] += segundos
+        dados[2] = max(dados[2], segundos)
+        return dados
+
+    def registrar_consulta(self, sql, segundos, execucoes=1, parametros=None, anterior=0.0):
+        # anterior: tempo já registrado para a mesma execução (o execute, quando agora chega a leitura das linhas)
+        sql = _normalizar_sql(sql)
+        with self._trava:
+            self._acumular(self.consultas, sql, segundos, execucoes)
+            # Em um executemany o limite vale para o tempo médio de cada linha
+            total = (anterior + segundos) / max(execucoes, 1)
+            lenta = total >= self.limite_lenta and anterior < self.limite_lenta
+            if lenta:
+                self.lentas.append({
+                    "sql": sql,
+                    "ms": round(total * 1000, 3),
+                    "parametros": repr(parametros)[:200] if parametros is not None else None,
+                    "quando": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "thread": threading.current_thread().name,
+                })
+        if lenta:
+            registro.warning("Consulta lenta (%.1f ms): %s", total * 1000, sql[:200])
+
+    def registrar_metodo(self, nome, segundos, erro=False):
+        with self._trava:
+            dados = self.metodos.get(nome)
+            if dados is None:
+                dados = self.metodos[nome] = [0, 0.0, 0.0, 0]
+            dados[0] += 1
+            dados[1] += segundos
+            dados[2] = max(dados[2], segundos)
+            dados[3] += erro
+
+    def registrar_tela(self, evento, segundos):
+        with self._trava:
+            self._acumular(self.telas, evento, segundos)
+
+    @staticmethod
+    def _resumir(tabela, *extras):
+        # Lista ordenada pelo tempo total, com os tempos em milissegundos
+        linhas = []
+        for nome, dados in tabela.items():
+            linha = {"nome": nome, "quantidade": dados[0], "total_ms": round(dados[1] * 1000, 3),
+                     "media_ms": round(dados[1] * 1000 / dados[0], 3) if dados[0] else 0.0,
+                     "maximo_ms": round(dados[2] * 1000, 3)}
+            linha.update(zip(extras, dados[3:]))
+            linhas.append(linha)
+        return sorted(linhas, key=lambda linha: linha["total_ms"], reverse=True)
+
+    def instantaneo(self):
+        with self._trava:
+            return {
+                "gerado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+                "limite_lenta_ms": self.limite_lenta * 1000,
+                "consultas": self._resumir(self.consultas),
+                "consultas_lentas": list(self.lentas),
+                "metodos": self._resumir(self.metodos, "erros"),
+                "telas": self._resumir(self.telas),
+            }
+
+    def exportar_json(self, caminho, instantaneo=None):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(instantaneo or self.instantaneo(), arquivo, ensure_ascii=False, indent=2)
+
+
+diagnostico = Diagnostico()
+
+
+# Cursor que mede cada consulta; a leitura das linhas (fetch) conta como parte da mesma consulta
+class CursorInstrumentado(sqlite3.Cursor):
+    _sql = None
+    _parametros = None
+    _tempo = 0.0
+
+    def execute(self, sql, parametros=()):
+        if not diagnostico.ativo:
+            return super().execute(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._sql, self._parametros = sql, parametros
+            self._tempo = time.perf_counter() - inicio
+            diagnostico.registrar_consulta(sql, self._tempo, parametros=parametros)
+
+    def executemany(self, sql, sequencia):
+        if not diagnostico.ativo:
+            return super().executemany(sql, sequencia)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            self._sql = None
+            diagnostico.registrar_consulta(sql, time.perf_counter() - inicio, execucoes=max(self.rowcount, 1))
+
+    def _medir_leitura(self, ler, *args):
+        if self._sql is None or not diagnostico.ativo:
+            return ler(*args)
+        inicio = time.perf_counter()
+        try:
+            return ler(*args)
+        finally:
+            segundos = time.perf_counter() - inicio
+            diagnostico.registrar_consulta(self._sql, segundos, execucoes=0, parametros=self._parametros, anterior=self._tempo)
+            self._tempo += segundos
+
+    def fetchone(self):
+        return self._medir_leitura(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._medir_leitura(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._medir_leitura(super().fetchall)
+
+
+def instrumentar_metodos(classe):
+    # Conta chamadas, tempo e erros de cada operação pública da classe (decorador de classe)
+    for nome, metodo in list(vars(classe).items()):
+        if nome.startswith("_") or nome == "transacao" or not callable(metodo):
+            continue
+        setattr(classe, nome, _medir_metodo(f"{classe.__name__}.{nome}", metodo))
+    return classe
+
+
+def _medir_metodo(nome, metodo):
+    @functools.wraps(metodo)
+    def medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        erro = True
+        try:
+            resultado = metodo(*args, **kwargs)
+            erro = False
+            return resultado
+        finally:
+            diagnostico.registrar_metodo(nome, time.perf_counter() - inicio, erro)
+    return medido
+
+
+# Model - Responsável pela interação com o banco de dados
+class AtendimentoModel:
+    def __init__(self, caminho_banco=CAMINHO_BANCO, pragmas=None):
+        self.caminho_banco = caminho_banco
+        self.conexao = sqlite3.connect(caminho_banco)
+        self.cursor = self.conexao.cursor(CursorInstrumentado)
+        self._profundidade_transacao = 0
+        self._configurar_conexao({**PRAGMAS_CONEXAO, **(pragmas or {})})
+        self._aplicar_migracoes()
+        self.cursor.execute("SELECT estacao FROM estacoes_sincronizacao WHERE local = 1")
+        self.estacao = self.cursor.fetchone()[0]  # identifica as gravações desta estação na sincronização
+        # O arquivo morto, se existir, é anexado à conexão; só as consultas com histórico completo o leem
+        self.caminho_arquivo_morto = caminho_arquivo_morto(caminho_banco)
+        self.arquivo_anexado = False
+        if os.path.exists(self.caminho_arquivo_morto):
+            self._anexar_arquivo_morto()
+
+    def _anexar_arquivo_morto(self):
+        # Abrir o arquivo morto como banco aplica as mesmas migrações: o esquema acompanha o do principal
+        AtendimentoModel(self.caminho_arquivo_morto).fechar_conexao()
+        self.cursor.execute("ATTACH DATABASE ? AS arquivo", (self.caminho_arquivo_morto,))
+        # PRAGMA synchronous vale por banco: o anexado segue o principal (senão cada lote faz fsync)
+        synchronous = self.cursor.execute("PRAGMA main.synchronous").fetchone()[0]
+        self.cursor.execute(f"PRAGMA arquivo.synchronous = {int(synchronous)}")
+        self.arquivo_anexado = True
+
+    def _esquemas(self, incluir_arquivo):
+        # Bancos consultados: o principal e, no histórico completo, o arquivo morto
+        # (anexado aqui se foi criado depois da abertura, por exemplo pela linha de comando)
+        if incluir_arquivo and not self.arquivo_anexado and os.path.exists(self.caminho_arquivo_morto):
+            self._anexar_arquivo_morto()
+        return ("main", "arquivo") if incluir_arquivo and self.arquivo_anexado else ("main",)
+
+    def _configurar_conexao(self, pragmas):
+        for nome, valor in pragmas.items():
+            if not nome.isidentifier():
+                raise ValueError(f"Pragma inválido: {nome}")
+            # PRAGMA não aceita parâmetros; os valores vêm da configuração do sistema
+            self.cursor.execute(f"PRAGMA {nome} = {valor}")
+
+    @contextmanager
+    def transacao(self):
+        # Agrupa várias gravações em uma única transação, com um único commit no final
+        # Transações aninhadas viram SAVEPOINTs, desfeitos sozinhos se algo falhar lá dentro
+        if self._profundidade_transacao == 0:
+            self.cursor.execute("BEGIN IMMEDIATE")
+        else:
+            self.cursor.execute(f"SAVEPOINT nivel_{self._profundidade_transacao}")
+        self._profundidade_transacao += 1
+        try:
+            yield self
+        except BaseException:
+            self._profundidade_transacao -= 1
+            if self._profundidade_transacao == 0:
+                self.conexao.rollback()
+            else:
+                self.cursor.execute(f"ROLLBACK TO nivel_{self._profundidade_transacao}")
+                self.cursor.execute(f"RELEASE nivel_{self._profundidade_transacao}")
+            raise
+        self._profundidade_transacao -= 1
+        if self._profundidade_transacao == 0:
+            self.conexao.commit()
+        else:
+            self.cursor.execute(f"RELEASE nivel_{self._profundidade_transacao}")
+
+    def _confirmar(self):
+        # Fora de uma transação explícita cada gravação é confirmada na hora
+        if self._profundidade_transacao == 0:
+            self.conexao.commit()
+
+    def _aplicar_migracoes(self):
+        # Atualiza o banco existente, aplicando apenas as migrações ainda não executadas
+        versao_atual = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        for versao, comandos in MIGRACOES:
+            if versao <= versao_atual:
+                continue
+            try:
+                self.cursor.execute("BEGIN")
+                for comando in comandos:
+                    self.cursor.execute(comando)
+                # PRAGMA não aceita parâmetros, mas a versão vem da lista de migrações
+                self.cursor.execute(f"PRAGMA user_version = {int(versao)}")
+                self.conexao.commit()
+            except sqlite3.Error:
+                self.conexao.rollback()
+                raise
+            print(f"Migração {versao} aplicada ao banco de dados.")
+
+    def _carimbo(self):
+        # Data e estação da gravação, usadas para desempatar conflitos na sincronização
+        return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.estacao
+
+    def registrar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
+        self.cursor.execute('''
+        INSERT OR IGNORE INTO municipes (cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao, alterado_em, alterado_por)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao, *self._carimbo()))
+        self._confirmar()
+
+    def buscar_municipes(self, termo, limite=50):
+        termo = termo.strip()
+        # Termos numéricos são tratados como CPF: completo e válido, é a busca exata pela chave; senão, o início
+        # dos dígitos (os CPFs são gravados só com os dígitos, e o GLOB usa o índice da chave primária)
+        if termo and all(caractere.isdigit() or caractere in ".-/ " for caractere in termo):
+            digitos = _NAO_DIGITOS.sub("", termo)
+            if normalizar_cpf(digitos):
+                municipe = self.buscar_municipe_por_cpf(digitos)
+                return [municipe] if municipe else []
+            self.cursor.execute('''
+            SELECT cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao
+            FROM municipes WHERE cpf GLOB ?
+            ORDER BY cpf
+            LIMIT ?
+            ''', (digitos + "*", limite))
+            return self.cursor.fetchall()
+
+        expressao = _expressao_fts(termo)
+        if not expressao:
+            return []
+        # Busca por nome, endereço ou bairro ordenada pela relevância (bm25)
+        self.cursor.execute('''
+        SELECT m.cpf, m.nome, m.endereco, m.bairro, m.telefone, m.rg, m.titulo_eleitor, m.zona, m.secao
+        FROM municipes_fts
+        JOIN municipes m ON m.rowid = municipes_fts.rowid
+        WHERE municipes_fts MATCH ?
+        ORDER BY municipes_fts.rank
+        LIMIT ?
+        ''', (expressao, limite))
+        return self.cursor.fetchall()
+
+    def reconstruir_indices_busca(self):
+        # Refaz os índices de busca textual (necessário, por exemplo, após um VACUUM)
+        self.cursor.execute("INSERT INTO municipes_fts (municipes_fts) VALUES ('rebuild')")
+        self.cursor.execute("INSERT INTO atendimentos_fts (atendimentos_fts) VALUES ('rebuild')")
+        self._confirmar()
+    
+    def buscar_municipe_por_cpf(self, cpf):
+        condicao, valor = _condicao_cpf(cpf)
+        self.cursor.execute(f'''
+            SELECT cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao 
+            FROM municipes 
+            WHERE {condicao}
+        ''', (valor,))
+        return self.cursor.fetchone()
+
+    def consultar_cpfs_duplicados(self):
+        # Cadastros repetidos unidos pela migração da chave do CPF, para conferência
+        self.cursor.execute('''
+        SELECT cpf, cpf_mantido, nome, bairro, telefone, atendimentos, unido_em
+        FROM cpf_duplicados
+        ORDER BY cpf_mantido, cpf
+        ''')
+        return self.cursor.fetchall()
+
+    def consultar_cpfs_invalidos(self):
+        # Cadastros antigos com CPF inválido (sem chave), que só são encontrados pelo CPF exatamente como foi gravado
+        self.cursor.execute('''
+        SELECT cpf, nome, bairro, telefone
+        FROM municipes
+        WHERE cpf_chave IS NULL
+        ORDER BY nome
+        ''')
+        return self.cursor.fetchall()
+
+
+    def atualizar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
+        condicao, valor = _condicao_cpf(cpf)
+        self.cursor.execute(f'''
+        UPDATE municipes
+        SET nome = ?, endereco = ?, bairro = ?, telefone = ?, rg = ?, titulo_eleitor = ?, zona = ?, secao = ?,
+            versao = versao + 1, alterado_em = ?, alterado_por = ?
+        WHERE {condicao}
+        ''', (nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao, *self._carimbo(), valor))
+        atualizados = self.cursor.rowcount
+        self._confirmar()
+        if atualizados == 0:
+            raise ValueError(f"Munícipe não encontrado: {cpf}")
+
+    def registrar_atendimento(self, cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status):
+        # Um atendimento já registrado como concluído foi resolvido no próprio atendimento
+        data_conclusao = data_horario if status == STATUS_CONCLUIDO else None
+        self.cursor.execute('''
+        INSERT INTO atendimentos (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status,
+                                  data_conclusao, alterado_em, alterado_por)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status, data_conclusao,
+              *self._carimbo()))
+        self._confirmar()
+        return self.cursor.lastrowid
+
+    def registrar_anexo(self, atendimento_id, hash_anexo, tamanho, tipo, nome_arquivo):
+        # O mesmo conteúdo anexado de novo (neste ou em outro atendimento) reaproveita o registro do arquivo
+        agora = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transacao():
+            self.cursor.execute("INSERT OR IGNORE INTO anexos (hash, tamanho, tipo, criado_em) VALUES (?, ?, ?, ?)",
+                                (hash_anexo, tamanho, tipo, agora))
+            self.cursor.execute('''
+            INSERT OR IGNORE INTO anexos_atendimentos (atendimento_id, hash, nome_arquivo, adicionado_em)
+            VALUES (?, ?, ?, ?)
+            ''', (atendimento_id, hash_anexo, nome_arquivo, agora))
+
+    def consultar_anexos(self, atendimento_id):
+        self.cursor.execute('''
+        SELECT aa.hash, aa.nome_arquivo, an.tamanho, an.tipo, aa.adicionado_em
+        FROM anexos_atendimentos aa
+        JOIN anexos an ON an.hash = aa.hash
+        WHERE aa.atendimento_id = ?
+        ORDER BY aa.adicionado_em, aa.nome_arquivo
+        ''', (atendimento_id,))
+        return self.cursor.fetchall()
+
+    def remover_anexo(self, atendimento_id, hash_anexo):
+        # Retorna True quando nenhum atendimento usa mais o arquivo (o conteúdo pode sair do armazém)
+        with self.transacao():
+            self.cursor.execute("DELETE FROM anexos_atendimentos WHERE atendimento_id = ? AND hash = ?", (atendimento_id, hash_anexo))
+            self.cursor.execute('''
+            DELETE FROM anexos WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM anexos_atendimentos WHERE hash = ?)
+            ''', (hash_anexo, hash_anexo))
+            return self.cursor.rowcount == 1
+
+    def _filtros_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, esquema="main"):
+        parametros = []
+        condicoes = []
+
+        # Filtros opcionais
+        if filtro_cpf:
+            condicao, valor = _condicao_cpf(filtro_cpf, "m")
+            condicoes.append(condicao)
+            parametros.append(valor)
+        if filtro_nome and _expressao_fts(filtro_nome):
+            # Busca pelo nome no índice textual, sem diferenciar acentos
+            condicoes.append("m.rowid IN (SELECT rowid FROM municipes_fts WHERE municipes_fts MATCH ?)")
+            parametros.append(f"nome : ({_expressao_fts(filtro_nome)})")
+        if filtro_texto and _expressao_fts(filtro_texto):
+            # Busca na descrição e no tipo de pedido do atendimento
+            condicoes.append(f"a.id IN (SELECT rowid FROM {esquema}.atendimentos_fts WHERE atendimentos_fts MATCH ?)")
+            parametros.append(_expressao_fts(filtro_texto))
+        return condicoes, parametros
+
+    def _consulta_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, incluir_arquivo=False,
+                               extras=(), valores_extras=()):
+        # Uma parte por banco, com os mesmos filtros (mais as condições extras); com o arquivo morto as partes
+        # são unidas por UNION ALL e o SQLite intercala os dois resultados já ordenados pelos índices
+        partes, parametros = [], []
+        for esquema in self._esquemas(incluir_arquivo):
+            query = _no_esquema(CONSULTA_ATENDIMENTOS, esquema)
+            condicoes, valores = self._filtros_atendimentos(filtro_nome, filtro_cpf, filtro_texto, esquema)
+            condicoes.extend(extras)
+            if condicoes:
+                query += " WHERE " + " AND ".join(condicoes)
+            partes.append(query)
+            parametros.extend(valores)
+            parametros.extend(valores_extras)
+
+        # Adicionando a cláusula ORDER BY
+        return " UNION ALL ".join(partes) + " ORDER BY a.data_horario DESC, a.id DESC", parametros
+
+    def consultar_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, incluir_arquivo=False):
+        self.cursor.execute(*self._consulta_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo))
+        return self.cursor.fetchall()
+
+    def iterar_consulta(self, query, parametros=(), tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+        # Entrega o resultado em lotes (fetchmany) com um cursor próprio, para não disputar o self.cursor
+        cursor = self.conexao.cursor(CursorInstrumentado)
+        try:
+            cursor.execute(query, parametros)
+            while True:
+                lote = cursor.fetchmany(tamanho_lote)
+                if not lote:
+                    break
+                yield lote
+        finally:
+            cursor.close()
+
+    def iterar_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, tamanho_lote=TAMANHO_LOTE_EXPORTACAO,
+                            incluir_arquivo=False):
+        return self.iterar_consulta(*self._consulta_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo),
+                                    tamanho_lote)
+
+    def iterar_relatorio_tipo_pedido(self, tipo_pedido, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+        return self.iterar_consulta(CONSULTA_RELATORIO_RESUMIDO + " WHERE a.tipo_pedido = ?", (tipo_pedido,), tamanho_lote)
+
+    def iterar_relatorio_bairro(self, bairro, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+        return self.iterar_consulta(CONSULTA_RELATORIO_RESUMIDO + " WHERE m.bairro = ?", (bairro,), tamanho_lote)
+
+    def contar_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, incluir_arquivo=False):
+        # Sem filtros o total vem da tabela de resumo de cada banco, sem percorrer os atendimentos
+        total = 0
+        for esquema in self._esquemas(incluir_arquivo):
+            condicoes, parametros = self._filtros_atendimentos(filtro_nome, filtro_cpf, filtro_texto, esquema)
+            if condicoes:
+                self.cursor.execute(_no_esquema(
+                    "SELECT COUNT(*) FROM atendimentos a JOIN municipes m ON a.cpf = m.cpf WHERE " + " AND ".join(condicoes),
+                    esquema
+                ), parametros)
+            else:
+                self.cursor.execute(f"SELECT COALESCE(SUM(total), 0) FROM {esquema}.resumo_atendimentos WHERE dimensao = 'total'")
+            total += self.cursor.fetchone()[0]
+        return total
+
+    def consultar_atendimentos_pagina(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, cursor=None, tamanho=TAMANHO_PAGINA,
+                                      incluir_arquivo=False):
+        # Paginação por chave (data_horario, id): cada página é uma busca no índice,
+        # sem OFFSET, então o custo não cresce com o tamanho da tabela
+        extras = ["(a.data_horario, a.id) < (?, ?)"] if cursor else []
+        query, parametros = self._consulta_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo,
+                                                        extras, cursor or ())
+        parametros.append(tamanho + 1)
+
+        self.cursor.execute(query + " LIMIT ?", parametros)
+        linhas = self.cursor.fetchall()
+
+        # A linha extra indica se existe uma próxima página; o cursor é a chave da última linha entregue
+        if len(linhas) > tamanho:
+            linhas = linhas[:tamanho]
+            return linhas, (linhas[-1][5], linhas[-1][0])
+        return linhas, None
+
+    def versao_alteracoes(self):
+        # Última versão entregue pelo AUTOINCREMENT, válida mesmo depois da limpeza do registro
+        self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'alteracoes_atendimentos'")
+        linha = self.cursor.fetchone()
+        return linha[0] if linha else 0
+
+    def consultar_alteracoes(self, desde, filtro_nome=None, filtro_cpf=None, filtro_texto=None,
+                             limite=LIMITE_ALTERACOES_SINCRONIZACAO, incluir_arquivo=False):
+        # Retorna (versão, ids alterados desde a versão informada, linhas alteradas que atendem aos filtros)
+        # Os ids sem linha correspondente foram excluídos ou deixaram de atender aos filtros
+        # Retorna None quando é preciso recarregar tudo (registro já limpo ou alterações demais)
+        versao = self.versao_alteracoes()
+        if versao <= desde:
+            return versao, [], []
+        self.cursor.execute("SELECT MIN(versao) FROM alteracoes_atendimentos")
+        minima = self.cursor.fetchone()[0]
+        if minima is None or desde + 1 < minima:
+            return None
+        self.cursor.execute('''
+        SELECT DISTINCT atendimento_id FROM alteracoes_atendimentos
+        WHERE versao > ? AND versao <= ?
+        LIMIT ?
+        ''', (desde, versao, limite + 1))
+        ids = [linha[0] for linha in self.cursor.fetchall()]
+        if len(ids) > limite:
+            return None
+
+        # Um atendimento que foi para o arquivo morto continua na tabela do histórico completo
+        self.cursor.execute(*self._consulta_atendimentos(
+            filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo,
+            ["a.id IN (SELECT atendimento_id FROM main.alteracoes_atendimentos WHERE versao > ? AND versao <= ?)"],
+            (desde, versao)
+        ))
+        return versao, ids, self.cursor.fetchall()
+
+    def limpar_alteracoes(self, manter=LIMITE_REGISTRO_ALTERACOES):
+        # Descarta as alterações mais antigas do registro
+        self.cursor.execute('''
+        DELETE FROM alteracoes_atendimentos
+        WHERE versao <= (SELECT MAX(versao) FROM alteracoes_atendimentos) - ?
+        ''', (manter,))
+        self._confirmar()
+        return self.cursor.rowcount
+
+    def buscar_atendimento_por_id(self, atendimento_id):
+        # Leitura direta pela chave primária
+        self.cursor.execute(CONSULTA_ATENDIMENTOS + " WHERE a.id = ?", (atendimento_id,))
+        return self.cursor.fetchone()
+
+    def buscar_atendimentos_por_ids(self, atendimento_ids):
+        atendimento_ids = list(atendimento_ids)
+        if not atendimento_ids:
+            return []
+        # Busca em lotes para respeitar o limite de parâmetros do SQLite
+        atendimentos = []
+        for inicio in range(0, len(atendimento_ids), 500):
+            lote = atendimento_ids[inicio:inicio + 500]
+            marcadores = ", ".join("?" for _ in lote)
+            self.cursor.execute(CONSULTA_ATENDIMENTOS + f" WHERE a.id IN ({marcadores})", lote)
+            atendimentos.extend(self.cursor.fetchall())
+        return atendimentos
+
+
+    def atualizar_atendimento(self, atendimento_id, cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade):
+        # A data de conclusão é gravada na primeira vez que o status vira Concluído e apagada se o atendimento for reaberto
+        agora, estacao = self._carimbo()
+        self.cursor.execute('''
+        UPDATE atendimentos
+        SET cpf = ?, tipo_pedido = ?, descricao = ?, status = ?, prazo_resolucao = ?, assessor = ?, prioridade = ?,
+            data_conclusao = CASE WHEN ? THEN COALESCE(data_conclusao, ?) END,
+            versao = versao + 1, alterado_em = ?, alterado_por = ?
+        WHERE id = ?
+        ''', (cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade,
+              status == STATUS_CONCLUIDO, agora, agora, estacao, atendimento_id))
+        self._confirmar()
+
+    def consultar_municipes(self):
+        self.cursor.execute('''
+        SELECT cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao FROM municipes
+        ''')
+        return self.cursor.fetchall()
+
+    def importar_municipes_csv(self, caminho_csv, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, encoding="utf-8-sig"):
+        # Retorna um dicionário com inseridos, duplicados (CPF já cadastrado) e rejeitados [(linha, motivo)]
+        resultado = {"inseridos": 0, "duplicados": 0, "rejeitados": []}
+        for lote in _ler_csv_em_lotes(caminho_csv, tamanho_lote, encoding):
+            validos = []
+            for numero_linha, registro in lote:
+                cpf = normalizar_cpf(registro.get("cpf"))
+                telefone = normalizar_telefone(registro.get("telefone"))
+                if cpf is None:
+                    resultado["rejeitados"].append((numero_linha, "CPF inválido"))
+                elif not registro.get("nome"):
+                    resultado["rejeitados"].append((numero_linha, "Nome não informado"))
+                elif telefone is None:
+                    resultado["rejeitados"].append((numero_linha, "Telefone inválido"))
+                else:
+                    validos.append((
+                        cpf, registro["nome"], registro.get("endereco", ""),
+                        registro.get("bairro") or "Bairro Não Informado", telefone,
+                        registro.get("rg", ""), registro.get("titulo_eleitor", ""),
+                        registro.get("zona", ""), registro.get("secao", "")
+                    ))
+            # Cada lote é uma transação; CPFs já cadastrados são ignorados, como em registrar_municipe
+            # O rowcount é lido dentro do bloco: o RELEASE de uma transação externa, no mesmo cursor, o zera
+            with self.transacao():
+                self.cursor.executemany('''
+                INSERT OR IGNORE INTO municipes (cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', validos)
+                inseridos = self.cursor.rowcount
+            resultado["inseridos"] += inseridos
+            resultado["duplicados"] += len(validos) - inseridos
+        return resultado
+
+    def importar_atendimentos_csv(self, caminho_csv, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, encoding="utf-8-sig"):
+        # Retorna um dicionário com inseridos e rejeitados [(linha, motivo)]
+        resultado = {"inseridos": 0, "rejeitados": []}
+        # Prioridade e status como escritos na planilha, sem diferenciar maiúsculas
+        prioridades = {prioridade.lower(): prioridade for prioridade in ORDEM_PRIORIDADES}
+        situacoes = {status.lower(): status for status in STATUS_ATENDIMENTO}
+        agora = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for lote in _ler_csv_em_lotes(caminho_csv, tamanho_lote, encoding):
+            # Confere de uma vez quais CPFs do lote estão cadastrados
+            cpfs = {normalizar_cpf(registro.get("cpf")) for _, registro in lote} - {None}
+            cadastrados = set()
+            cpfs = list(cpfs)
+            for inicio in range(0, len(cpfs), 500):
+                parte = cpfs[inicio:inicio + 500]
+                marcadores = ", ".join("?" for _ in parte)
+                self.cursor.execute(f"SELECT cpf FROM municipes WHERE cpf_chave IN ({marcadores})", list(map(int, parte)))
+                cadastrados.update(linha[0] for linha in self.cursor.fetchall())
+
+            validos = []
+            for numero_linha, registro in lote:
+                cpf = normalizar_cpf(registro.get("cpf"))
+                # Campos vazios recebem o padrão do cadastro pela tela; preenchidos, precisam ser reconhecidos
+                data_horario = normalizar_data_horario(registro["data_horario"]) if registro.get("data_horario") else agora
+                data_conclusao = normalizar_data_horario(registro["data_conclusao"]) if registro.get("data_conclusao") else ""
+                prioridade = prioridades.get((registro.get("prioridade") or "Normal").lower())
+                status = situacoes.get((registro.get("status") or "Pendente").lower())
+                if cpf is None:
+                    resultado["rejeitados"].append((numero_linha, "CPF inválido"))
+                elif cpf not in cadastrados:
+                    resultado["rejeitados"].append((numero_linha, "Munícipe não cadastrado"))
+                elif not registro.get("tipo_pedido"):
+                    resultado["rejeitados"].append((numero_linha, "Tipo de pedido não informado"))
+                elif data_horario is None:
+                    resultado["rejeitados"].append((numero_linha, "Data do atendimento inválida"))
+                elif data_conclusao is None:
+                    resultado["rejeitados"].append((numero_linha, "Data de conclusão inválida"))
+                elif prioridade is None:
+                    resultado["rejeitados"].append((numero_linha, "Prioridade desconhecida"))
+                elif status is None:
+                    resultado["rejeitados"].append((numero_linha, "Status desconhecido"))
+                else:
+                    # data_conclusao é opcional no arquivo; sem ela um atendimento concluído conta como resolvido na hora
+                    data_conclusao = data_conclusao or (data_horario if status == STATUS_CONCLUIDO else None)
+                    validos.append((
+                        cpf, registro["tipo_pedido"], registro.get("descricao", ""), "", data_horario,
+                        registro.get("prazo_resolucao", ""), registro.get("assessor", ""),
+                        prioridade, status, data_conclusao
+                    ))
+            with self.transacao():
+                self.cursor.executemany('''
+                INSERT INTO atendimentos (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status, data_conclusao)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', validos)
+            resultado["inseridos"] += len(validos)
+        return resultado
+
+    # Sincronização entre estações - pacotes de alterações trocados por arquivo (ex.: notebooks usados sem rede)
+    def _sequencia_sincronizacao(self):
+        self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'registro_sincronizacao'")
+        linha = self.cursor.fetchone()
+        return linha[0] if linha else 0
+
+    def consultar_estacoes_sincronizacao(self):
+        self.cursor.execute('''
+        SELECT estacao, local, enviado_ate, recebido_ate, sincronizado_em FROM estacoes_sincronizacao ORDER BY local DESC, estacao
+        ''')
+        return self.cursor.fetchall()
+
+    def _consultas_sincronizacao(self, desde, ate):
+        # (tabela, query, parâmetros) das linhas a enviar; desde=None envia todas
+        filtro = "WHERE {chave} IN (SELECT chave FROM registro_sincronizacao WHERE tabela = '{tabela}' AND seq > ? AND seq <= ?)"
+        # Linhas gravadas antes da sincronização existir não têm carimbo: contam como desta estação
+        municipes = f'''
+        SELECT {', '.join(COLUNAS_MUNICIPES)}, versao, COALESCE(alterado_em, ''), COALESCE(alterado_por, ?)
+        FROM municipes {filtro.format(chave="cpf", tabela="municipes") if desde is not None else ""}
+        '''
+        atendimentos = f'''
+        SELECT COALESCE(origem, ?), COALESCE(origem_id, id), cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao,
+               assessor, prioridade, status, data_conclusao, versao, COALESCE(alterado_em, data_horario), COALESCE(alterado_por, ?)
+        FROM atendimentos {filtro.format(chave="id", tabela="atendimentos") if desde is not None else ""}
+        '''
+        intervalo = (desde, ate) if desde is not None else ()
+        return [("municipes", municipes, (self.estacao, *intervalo)),
+                ("atendimentos", atendimentos, (self.estacao, self.estacao, *intervalo))]
+
+    def exportar_pacote_sincronizacao(self, caminho, destino=None):
+        # Leva o que foi gravado aqui desde a última confirmação do destino. Uma estação nova (ou um registro
+        # já limpo além desse ponto) recebe todas as linhas. Retorna o cabeçalho do pacote com as contagens
+        import gzip
+        enviado_ate = recebido_ate = 0
+        if destino is not None:
+            self.cursor.execute("SELECT enviado_ate, recebido_ate FROM estacoes_sincronizacao WHERE estacao = ?", (destino,))
+            enviado_ate, recebido_ate = self.cursor.fetchone() or (0, 0)
+        ate = self._sequencia_sincronizacao()
+        self.cursor.execute("SELECT MIN(seq) FROM registro_sincronizacao")
+        minima = self.cursor.fetchone()[0]
+        completo = enviado_ate < ate and (enviado_ate == 0 or minima is None or minima > enviado_ate + 1)
+        cabecalho = {
+            "formato": FORMATO_PACOTE_SINCRONIZACAO, "origem": self.estacao, "destino": destino,
+            "desde": 0 if completo else enviado_ate, "ate": ate, "completo": completo,
+            "confirmado": recebido_ate,  # até onde esta estação já recebeu as gravações do destino
+            "gerado_em": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "colunas": COLUNAS_SINCRONIZACAO,
+        }
+        contagens = {"municipes": 0, "atendimentos": 0}
+        try:
+            with gzip.open(caminho, "wt", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(cabecalho, ensure_ascii=False) + "\n")
+                if enviado_ate < ate:
+                    for tabela, query, parametros in self._consultas_sincronizacao(None if completo else enviado_ate, ate):
+                        for lote in self.iterar_consulta(query, parametros):
+                            arquivo.writelines(json.dumps([tabela, linha], ensure_ascii=False) + "\n" for linha in lote)
+                            contagens[tabela] += len(lote)
+        except BaseException:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            raise
+        return {**cabecalho, "linhas": contagens}
+
+    def _aplicar_municipe_sincronizado(self, valores):
+        # O munícipe é encontrado pela chave do CPF, mesmo que a outra estação o tenha gravado com outra formatação
+        condicao, chave = _condicao_cpf(valores[0])
+        self.cursor.execute(f"SELECT versao, COALESCE(alterado_em, ''), COALESCE(alterado_por, ?) FROM municipes WHERE {condicao}",
+                            (self.estacao, chave))
+        atual = self.cursor.fetchone()
+        if atual is None:
+            colunas = COLUNAS_SINCRONIZACAO["municipes"]
+            valores = (normalizar_cpf(valores[0]) or valores[0], *valores[1:])
+            self.cursor.execute(f"INSERT INTO municipes ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})", valores)
+            return "inseridos"
+        # Conflito: vence a maior (versão, data da alteração, estação); todas as estações chegam ao mesmo resultado
+        if tuple(valores[-3:]) <= tuple(atual):
+            return "ignorados"
+        self.cursor.execute(f'''
+        UPDATE municipes SET {', '.join(f"{coluna} = ?" for coluna in COLUNAS_SINCRONIZACAO["municipes"][1:])} WHERE {condicao}
+        ''', (*valores[1:], chave))
+        return "atualizados"
+
+    def _aplicar_atendimento_sincronizado(self, valores):
+        origem, origem_id = valores[0], valores[1]
+        if origem == self.estacao:
+            # Atendimento criado aqui, de volta pela outra estação
+            condicao, chave = " WHERE id = ?", (origem_id,)
+        else:
+            condicao, chave = " WHERE origem = ? AND origem_id = ?", (origem, origem_id)
+        self.cursor.execute(
+            "SELECT id, versao, COALESCE(alterado_em, data_horario), COALESCE(alterado_por, ?) FROM atendimentos" + condicao,
+            (self.estacao, *chave)
+        )
+        atual = self.cursor.fetchone()
+        colunas = COLUNAS_SINCRONIZACAO["atendimentos"][2:]
+        # O CPF vem como a outra estação o gravou; aqui o munícipe está só com os dígitos
+        valores = (*valores[:2], normalizar_cpf(valores[2]) or valores[2], *valores[3:])
+        if atual is None and self.arquivo_anexado:
+            # Já movido para o arquivo morto, que não recebe alterações (nem é recriado no banco principal)
+            self.cursor.execute("SELECT 1 FROM arquivo.atendimentos" + condicao, chave)
+            if self.cursor.fetchone():
+                return "ignorados"
+        if atual is None:
+            if origem == self.estacao:
+                return "ignorados"
+            self.cursor.execute(f'''
+            INSERT INTO atendimentos (origem, origem_id, {', '.join(colunas)}) VALUES (?, ?, {', '.join('?' for _ in colunas)})
+            ''', valores)
+            return "inseridos"
+        if tuple(valores[-3:]) <= tuple(atual[1:]):
+            return "ignorados"
+        self.cursor.execute(f"UPDATE atendimentos SET {', '.join(f'{coluna} = ?' for coluna in colunas)} WHERE id = ?",
+                            (*valores[2:], atual[0]))
+        return "atualizados"
+
+    def importar_pacote_sincronizacao(self, caminho):
+        # Aplica um pacote de outra estação em uma única transação. Retorna as contagens por tabela
+        # (inseridos, atualizados, ignorados) e a estação de origem
+        import gzip
+        with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+            try:
+                cabecalho = json.loads(arquivo.readline())
+            except (OSError, ValueError):
+                raise ValueError("O arquivo não é um pacote de sincronização.") from None
+            if cabecalho.get("formato") != FORMATO_PACOTE_SINCRONIZACAO or cabecalho.get("colunas") != COLUNAS_SINCRONIZACAO:
+                raise ValueError("Pacote de sincronização em formato desconhecido.")
+            origem = cabecalho["origem"]
+            if origem == self.estacao:
+                raise ValueError("O pacote foi gerado por esta mesma estação. Se este banco é uma cópia de outro, "
+                                 "gere uma nova identificação da estação antes de sincronizar.")
+            if cabecalho["destino"] not in (None, self.estacao):
+                raise ValueError(f"O pacote foi gerado para outra estação ({cabecalho['destino']}).")
+            resultado = {tabela: {"inseridos": 0, "atualizados": 0, "ignorados": 0} for tabela in COLUNAS_SINCRONIZACAO}
+            aplicar = {"municipes": self._aplicar_municipe_sincronizado, "atendimentos": self._aplicar_atendimento_sincronizado}
+            with self.transacao():
+                for linha in arquivo:
+                    tabela, valores = json.loads(linha)
+                    resultado[tabela][aplicar[tabela](valores)] += 1
+                # A confirmação do pacote diz até onde a origem já tem as gravações desta estação
+                self.cursor.execute('''
+                INSERT INTO estacoes_sincronizacao (estacao, recebido_ate, enviado_ate, sincronizado_em) VALUES (?, ?, ?, ?)
+                ON CONFLICT (estacao) DO UPDATE SET
+                    recebido_ate = MAX(recebido_ate, excluded.recebido_ate),
+                    enviado_ate = excluded.enviado_ate,
+                    sincronizado_em = excluded.sincronizado_em
+                ''', (origem, cabecalho["ate"], cabecalho["confirmado"], datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        self.limpar_registro_sincronizacao()
+        return {"origem": origem, **resultado}
+
+    def limpar_registro_sincronizacao(self):
+        # Descarta o que todas as estações conhecidas já confirmaram; uma estação nova recebe o pacote completo
+        self.cursor.execute('''
+        DELETE FROM registro_sincronizacao
+        WHERE seq <= (SELECT MIN(enviado_ate) FROM estacoes_sincronizacao WHERE local = 0)
+        ''')
+        self._confirmar()
+        return self.cursor.rowcount
+
+    def redefinir_estacao(self):
+        # Para um banco copiado de outra estação: esta passa a ter identificação própria, as linhas copiadas
+        # continuam identificadas como da estação original, e a original fica registrada como já sincronizada
+        with self.transacao():
+            anterior, base = self.estacao, self._sequencia_sincronizacao()
+            self.cursor.execute('''
+            UPDATE atendimentos
+            SET origem = COALESCE(origem, ?), origem_id = CASE WHEN origem IS NULL THEN id ELSE origem_id END,
+                alterado_por = COALESCE(alterado_por, ?)
+            WHERE origem IS NULL OR alterado_por IS NULL
+            ''', (anterior, anterior))
+            self.cursor.execute("UPDATE municipes SET alterado_por = ? WHERE alterado_por IS NULL", (anterior,))
+            # A troca de identificação não é alteração a enviar: a estação original já tem essas linhas
+            self.cursor.execute("DELETE FROM registro_sincronizacao WHERE seq > ?", (base,))
+            self.cursor.execute('''
+            UPDATE estacoes_sincronizacao SET local = 0, enviado_ate = ?, recebido_ate = ?, sincronizado_em = ? WHERE estacao = ?
+            ''', (self._sequencia_sincronizacao(), base, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), anterior))
+            self.cursor.execute("INSERT INTO estacoes_sincronizacao (estacao, local) VALUES (lower(hex(randomblob(16))), 1)")
+            self.cursor.execute("SELECT estacao FROM estacoes_sincronizacao WHERE local = 1")
+            self.estacao = self.cursor.fetchone()[0]
+        return self.estacao
+
+    def arquivar_atendimentos(self, data_corte, tamanho_lote=TAMANHO_LOTE_ARQUIVAMENTO, pausa=PAUSA_ARQUIVAMENTO_S,
+                              ao_progresso=None, cancelamento=None):
+        # Move para o arquivo morto os atendimentos concluídos antes da data de corte (AAAA-MM-DD), com os mesmos
+        # ids e colunas. Cada lote é uma transação curta; na pausa entre lotes as outras conexões gravam
+        # ao_progresso(movidos, total) a cada lote. Retorna a quantidade movida (até o cancelamento, se houver)
+        datetime.datetime.strptime(data_corte, "%Y-%m-%d")
+        if not self.arquivo_anexado:
+            self._anexar_arquivo_morto()
+        # Todas as colunas gravadas (as geradas, como data_limite, são recalculadas no arquivo morto)
+        self.cursor.execute("SELECT name FROM pragma_table_xinfo('atendimentos') WHERE hidden = 0")
+        colunas = ", ".join(linha[0] for linha in self.cursor.fetchall())
+        self.cursor.execute(f"SELECT COUNT(*) FROM ({CONSULTA_CANDIDATOS_ARQUIVAMENTO})", (data_corte,))
+        total = self.cursor.fetchone()[0]
+        movidos = 0
+        while cancelamento is None or not cancelamento.is_set():
+            with self.transacao():
+                self.cursor.execute(f"INSERT INTO arquivamento_lote (id) {CONSULTA_CANDIDATOS_ARQUIVAMENTO} LIMIT ?",
+                                    (data_corte, tamanho_lote))
+                lote = self.cursor.rowcount
+                # OR IGNORE: com WAL o commit nos dois bancos não é atômico; se uma queda deixou o lote
+                # nos dois, a próxima execução só o apaga do principal
+                self.cursor.execute(f'''
+                INSERT OR IGNORE INTO arquivo.atendimentos ({colunas})
+                SELECT {colunas} FROM atendimentos WHERE id IN (SELECT id FROM arquivamento_lote)
+                ''')
+                self.cursor.execute("DELETE FROM atendimentos WHERE id IN (SELECT id FROM arquivamento_lote)")
+                self.cursor.execute("DELETE FROM arquivamento_lote")
+            if not lote:
+                break
+            movidos += lote
+            if ao_progresso is not None:
+                ao_progresso(movidos, max(total, movidos))
+            time.sleep(pausa)
+        # Os registros de alterações e de sincronização só valem no banco principal
+        with self.transacao():
+            self.cursor.execute("DELETE FROM arquivo.alteracoes_atendimentos")
+            self.cursor.execute("DELETE FROM arquivo.registro_sincronizacao")
+        return movidos
+
+    def agregar_atendimentos(self, dimensoes=(), metricas=("total",), filtros=None, periodo=None):
+        # Agrupa a tabela agregado_atendimentos (no máximo algumas dezenas de milhares de linhas, mantida
+        # pelos triggers) em vez dos atendimentos; filtros = {dimensao: valor}, periodo = (mes_inicio, mes_fim)
+        # Retorna [(valores das dimensões..., valores das métricas...)], ordenado pelas dimensões
+        filtros = filtros or {}
+        desconhecidos = [nome for nome in (*dimensoes, *filtros) if nome not in DIMENSOES_AGREGACAO]
+        desconhecidos += [nome for nome in metricas if nome not in METRICAS_AGREGACAO]
+        if desconhecidos:
+            raise ValueError(f"Dimensão ou métrica desconhecida: {', '.join(desconhecidos)}")
+
+        colunas = [DIMENSOES_AGREGACAO[nome] for nome in dimensoes] + [METRICAS_AGREGACAO[nome] for nome in metricas]
+        query = f"SELECT {', '.join(colunas)} FROM agregado_atendimentos"
+        condicoes = [f"{DIMENSOES_AGREGACAO[nome]} = ?" for nome in filtros]
+        parametros = list(filtros.values())
+        inicio, fim = periodo or (None, None)
+        if inicio:
+            condicoes.append("mes >= ?")
+            parametros.append(inicio)
+        if fim:
+            condicoes.append("mes <= ?")
+            parametros.append(fim)
+        if condicoes:
+            query += " WHERE " + " AND ".join(condicoes)
+        if dimensoes:
+            posicoes = ", ".join(str(posicao) for posicao in range(1, len(dimensoes) + 1))
+            query += f" GROUP BY {posicoes} HAVING SUM(total) > 0 ORDER BY {posicoes}"
+
+        self.cursor.execute(query, parametros)
+        return self.cursor.fetchall()
+
+    def consultar_fila_prazos(self, ate, desde=None, limite=LIMITE_FILA_PRAZOS):
+        # Atendimentos em aberto com data limite antes de "ate" (e a partir de "desde"), ordenados pela
+        # prioridade e depois pelo prazo mais antigo. Cada prioridade é uma busca no índice parcial
+        # (prioridade, data_limite) com LIMIT: o custo não cresce com a quantidade de atrasados
+        condicao = " AND a.data_limite < ?" + (" AND a.data_limite >= ?" if desde else "")
+        prazos = [ate, desde] if desde else [ate]
+        linhas = []
+        for prioridade in ORDEM_PRIORIDADES:
+            if len(linhas) >= limite:
+                break
+            self.cursor.execute(
+                CONSULTA_FILA_PRAZOS + " AND a.prioridade = ?" + condicao + " ORDER BY a.data_limite LIMIT ?",
+                [prioridade, *prazos, limite - len(linhas)]
+            )
+            linhas.extend(self.cursor.fetchall())
+        if len(linhas) < limite:
+            marcadores = ", ".join("?" for _ in ORDEM_PRIORIDADES)
+            self.cursor.execute(
+                CONSULTA_FILA_PRAZOS + f" AND a.prioridade NOT IN ({marcadores})" + condicao
+                + " ORDER BY a.data_limite LIMIT ?",
+                [*ORDEM_PRIORIDADES, *prazos, limite - len(linhas)]
+            )
+            linhas.extend(self.cursor.fetchall())
+        return linhas
+
+    def consultar_coluna_quadro(self, status, cursor=None, tamanho=TAMANHO_PAGINA):
+        # Cartões de uma coluna do quadro: por prioridade (ORDEM_PRIORIDADES, as demais por último) e,
+        # dentro dela, os mais antigos primeiro. Paginação por chave (posição da prioridade, data_horario, id):
+        # cada página são buscas no índice (status, prioridade, data_horario), sem OFFSET
+        grupos = [*ORDEM_PRIORIDADES, None]
+        posicao_inicial, data_horario, atendimento_id = cursor or (0, None, None)
+        cartoes = []
+        for posicao in range(posicao_inicial, len(grupos)):
+            restante = tamanho + 1 - len(cartoes)  # a linha extra indica se existe uma próxima página
+            if restante <= 0:
+                break
+            if grupos[posicao] is None:
+                condicao = f" AND a.prioridade NOT IN ({', '.join('?' for _ in ORDEM_PRIORIDADES)})"
+                parametros = [status, *ORDEM_PRIORIDADES]
+                # O "+" tira data_horario do índice: percorrer o índice de data_horario atrás de prioridades
+                # fora da lista lê a tabela inteira quando elas não existem (ex.: coluna Concluído quase vazia
+                # depois do arquivamento); pelo índice de status, o grupo (pequeno) é ordenado à parte
+                data = "+a.data_horario"
+            else:
+                condicao = " AND a.prioridade = ?"
+                parametros = [status, grupos[posicao]]
+                data = "a.data_horario"
+            if posicao == posicao_inicial and data_horario is not None:
+                condicao += f" AND ({data}, a.id) > (?, ?)"
+                parametros += [data_horario, atendimento_id]
+            self.cursor.execute(CONSULTA_QUADRO + condicao + f" ORDER BY {data}, a.id LIMIT ?", [*parametros, restante])
+            cartoes.extend((posicao, linha) for linha in self.cursor.fetchall())
+
+        if len(cartoes) > tamanho:
+            cartoes = cartoes[:tamanho]
+            posicao, ultima = cartoes[-1]
+            return [linha for _, linha in cartoes], (posicao, ultima[5], ultima[0])
+        return [linha for _, linha in cartoes], None
+
+    def mover_atendimento(self, atendimento_id, status, status_atual=None):
+        # Muda só o status (uma linha). Com status_atual, não altera o atendimento que outra estação
+        # já mudou de coluna. Retorna True se o atendimento foi movido
+        query = '''
+        UPDATE atendimentos SET status = ?, data_conclusao = CASE WHEN ? THEN COALESCE(data_conclusao, ?) END,
+            versao = versao + 1, alterado_em = ?, alterado_por = ?
+        WHERE id = ?
+        '''
+        agora, estacao = self._carimbo()
+        parametros = [status, status == STATUS_CONCLUIDO, agora, agora, estacao, atendimento_id]
+        if status_atual is not None:
+            query += " AND status = ?"
+            parametros.append(status_atual)
+        self.cursor.execute(query, parametros)
+        movido = self.cursor.rowcount == 1
+        self._confirmar()
+        return movido
+
+    def contar_atrasados(self, agora):
+        # {prioridade: quantidade de atendimentos em aberto com a data limite vencida}, lida só do índice
+        self.cursor.execute(f'''
+        SELECT prioridade, COUNT(*) FROM atendimentos
+        WHERE status <> '{STATUS_CONCLUIDO}' AND data_limite < ?
+        GROUP BY prioridade
+        ''', (agora,))
+        return dict(self.cursor.fetchall())
+
+    def consultar_resumo(self):
+        # Leitura direta da tabela mantida pelos triggers: {dimensao: {valor: total}}
+        resumo = {}
+        self.cursor.execute("SELECT dimensao, valor, total FROM resumo_atendimentos WHERE total <> 0")
+        for dimensao, valor, total in self.cursor.fetchall():
+            resumo.setdefault(dimensao, {})[valor] = total
+        return resumo
+
+    def verificar_resumo(self, corrigir=True):
+        # Confere o resumo com uma contagem completa e o reconstrói se houver diferença
+        # Retorna as divergências encontradas: [(dimensao, valor, no_resumo, contado)]
+        with self.transacao():
+            atual = self.consultar_resumo()
+            self.cursor.execute("SAVEPOINT conferencia_resumo")
+            self.cursor.execute("DELETE FROM resumo_atendimentos")
+            for consulta in CONSULTAS_RESUMO:
+                self.cursor.execute(consulta)
+            contado = self.consultar_resumo()
+            if not corrigir:
+                self.cursor.execute("ROLLBACK TO conferencia_resumo")
+            self.cursor.execute("RELEASE conferencia_resumo")
+        divergencias = []
+        for dimensao in sorted(set(atual) | set(contado)):
+            valores = set(atual.get(dimensao, {})) | set(contado.get(dimensao, {}))
+            for valor in sorted(valores):
+                no_resumo = atual.get(dimensao, {}).get(valor, 0)
+                correto = contado.get(dimensao, {}).get(valor, 0)
+                if no_resumo != correto:
+                    divergencias.append((dimensao, valor, no_resumo, correto))
+        return divergencias
+
+    def fechar_conexao(self):
+        self.conexao.close()
+
+# Controller - Responsável pela lógica da aplicação
+@instrumentar_metodos
+class AtendimentoController:
+    def __init__(self, model, cache_municipes=None, cache_agregacoes=None, armazem_anexos=None):
+        self.model = model
+        # Controllers de threads diferentes podem receber o mesmo cache, para que uma gravação invalide todos
+        self.cache_municipes = cache_municipes if cache_municipes is not None else CacheMunicipes()
+        self.cache_agregacoes = cache_agregacoes if cache_agregacoes is not None else CacheAgregacoes()
+        if armazem_anexos is None and model is not None:
+            armazem_anexos = ArmazemAnexos(pasta_anexos(model.caminho_banco))
+        self.armazem_anexos = armazem_anexos
+
+    def registrar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
+        cpf = _cpf_para_cadastro(cpf)
+        self.model.registrar_municipe(cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+        self.cache_municipes.invalidar(_chave_cpf(cpf))
+
+    def buscar_municipes(self, termo):
+        return self.model.buscar_municipes(termo)
+    
+    def buscar_municipe_por_cpf(self, cpf):
+        # Consultas repetidas ao mesmo munícipe durante o atendimento são respondidas pelo cache
+        chave = _chave_cpf(cpf)
+        municipe = self.cache_municipes.obter(chave)
+        if municipe is None:
+            geracao = self.cache_municipes.geracao
+            municipe = self.model.buscar_municipe_por_cpf(cpf)
+            if municipe is not None:
+                self.cache_municipes.guardar(chave, municipe, geracao)
+        return municipe
+
+    def estatisticas_cache_municipes(self):
+        return self.cache_municipes.estatisticas()
+
+    def estatisticas_cache_agregacoes(self):
+        return self.cache_agregacoes.estatisticas()
+
+    def obter_diagnostico(self):
+        return diagnostico.instantaneo()
+
+    def zerar_diagnostico(self):
+        diagnostico.zerar()
+
+    def atualizar_municipe(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao):
+        self.model.atualizar_municipe(cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+        self.cache_municipes.invalidar(_chave_cpf(cpf))
+
+    def registrar_atendimento(self, cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status="Pendente"):
+        # O atendimento aponta para o CPF como o munícipe está gravado (só os dígitos; um cadastro antigo inválido, como está)
+        cpf = normalizar_cpf(cpf) or cpf
+        return self.model.registrar_atendimento(cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status)
+
+    def anexar_arquivo(self, atendimento_id, caminho_arquivo, ao_progresso=None, cancelamento=None):
+        # O arquivo vai para o armazém em disco; o banco recebe só a referência. Retorna o hash, ou None se cancelado
+        import mimetypes
+        guardado = self.armazem_anexos.guardar(caminho_arquivo, ao_progresso, cancelamento)
+        if guardado is None:
+            return None
+        hash_anexo, tamanho = guardado
+        nome_arquivo = os.path.basename(caminho_arquivo)
+        self.model.registrar_anexo(atendimento_id, hash_anexo, tamanho, mimetypes.guess_type(nome_arquivo)[0], nome_arquivo)
+        return hash_anexo
+
+    def consultar_anexos(self, atendimento_id):
+        return self.model.consultar_anexos(atendimento_id)
+
+    def remover_anexo(self, atendimento_id, hash_anexo):
+        if self.model.remover_anexo(atendimento_id, hash_anexo):
+            self.armazem_anexos.remover(hash_anexo)
+
+    def copiar_anexo(self, hash_anexo, caminho_destino):
+        return self.armazem_anexos.copiar(hash_anexo, caminho_destino)
+
+    def miniatura_anexo(self, hash_anexo, lado=LADO_MINIATURA):
+        return self.armazem_anexos.miniatura(hash_anexo, lado)
+
+    def previa_anexo(self, hash_anexo):
+        return self.armazem_anexos.previa_texto(hash_anexo)
+
+    def registrar_municipe_com_atendimento(self, cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao,
+                                           tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status="Pendente"):
+        # Grava o munícipe e o primeiro atendimento juntos: ou os dois são salvos, ou nenhum
+        cpf = _cpf_para_cadastro(cpf)
+        with self.model.transacao():
+            self.model.registrar_municipe(cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+            self.model.registrar_atendimento(cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status)
+        self.cache_municipes.invalidar(_chave_cpf(cpf))
+
+    def transacao(self):
+        return self.model.transacao()
+
+    def consultar_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, incluir_arquivo=False):
+        return self.model.consultar_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo)
+
+    def consultar_atendimentos_pagina(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, cursor=None, tamanho=TAMANHO_PAGINA,
+                                      incluir_arquivo=False):
+        return self.model.consultar_atendimentos_pagina(filtro_nome, filtro_cpf, filtro_texto, cursor, tamanho,
+                                                        incluir_arquivo=incluir_arquivo)
+
+    def buscar_atendimento_por_id(self, atendimento_id):
+        return self.model.buscar_atendimento_por_id(atendimento_id)
+
+    def buscar_atendimentos_por_ids(self, atendimento_ids):
+        return self.model.buscar_atendimentos_por_ids(atendimento_ids)
+
+    def versao_alteracoes(self):
+        return self.model.versao_alteracoes()
+
+    def consultar_alteracoes(self, desde, filtro_nome=None, filtro_cpf=None, filtro_texto=None, incluir_arquivo=False):
+        return self.model.consultar_alteracoes(desde, filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo=incluir_arquivo)
+
+    def limpar_alteracoes(self):
+        return self.model.limpar_alteracoes()
+
+    def consultar_todos_atendimentos(self):
+        return self.model.consultar_atendimentos()  # Sem filtros retorna todos os atendimentos
+
+    def atualizar_atendimento(self, atendimento_id, cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade):
+        self.model.atualizar_atendimento(atendimento_id, normalizar_cpf(cpf) or cpf, tipo_pedido, descricao, status, prazo_resolucao, assessor, prioridade)
+
+    def consultar_municipes(self):
+        return self.model.consultar_municipes()
+
+    def consultar_cpfs_duplicados(self):
+        return self.model.consultar_cpfs_duplicados()
+
+    def consultar_cpfs_invalidos(self):
+        return self.model.consultar_cpfs_invalidos()
+
+    def importar_municipes_csv(self, caminho_csv):
+        try:
+            return self.model.importar_municipes_csv(caminho_csv)
+        finally:
+            self.cache_municipes.invalidar()
+
+    def consultar_resumo(self):
+        return self.model.consultar_resumo()
+
+    def consultar_atrasados(self, limite=LIMITE_FILA_PRAZOS):
+        # Atendimentos em aberto com o prazo vencido, os mais urgentes primeiro
+        agora = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return self.model.consultar_fila_prazos(agora, limite=limite)
+
+    def consultar_proximos_prazos(self, dias=7, limite=LIMITE_FILA_PRAZOS):
+        # Atendimentos em aberto que vencem nos próximos dias
+        agora = datetime.datetime.now()
+        ate = agora + datetime.timedelta(days=dias)
+        return self.model.consultar_fila_prazos(
+            ate.strftime("%Y-%m-%d %H:%M:%S"), desde=agora.strftime("%Y-%m-%d %H:%M:%S"), limite=limite
+        )
+
+    def contar_atrasados(self):
+        return self.model.contar_atrasados(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def consultar_coluna_quadro(self, status, cursor=None, tamanho=TAMANHO_PAGINA):
+        return self.model.consultar_coluna_quadro(status, cursor, tamanho)
+
+    def mover_atendimento(self, atendimento_id, status, status_atual=None):
+        return self.model.mover_atendimento(atendimento_id, status, status_atual)
+
+    def verificar_resumo(self, corrigir=True):
+        divergencias = self.model.verificar_resumo(corrigir)
+        if divergencias and corrigir:
+            print(f"Resumo dos atendimentos divergente em {len(divergencias)} valor(es); reconstruído.")
+        return divergencias
+
+    def indicadores_dashboard(self):
+        # Indicadores do Dashboard lidos da tabela de resumo, sem percorrer os atendimentos
+        resumo = self.model.consultar_resumo()
+        por_status = resumo.get("status", {})
+        total = resumo.get("total", {}).get("", 0)
+        return {
+            "abertos": total - por_status.get(STATUS_CONCLUIDO, 0),
+            "pendentes": por_status.get("Pendente", 0),
+            "por_prioridade": resumo.get("prioridade", {}),
+        }
+
+    def exportar_pacote_sincronizacao(self, caminho, destino=None):
+        return self.model.exportar_pacote_sincronizacao(caminho, destino)
+
+    def importar_pacote_sincronizacao(self, caminho):
+        try:
+            return self.model.importar_pacote_sincronizacao(caminho)
+        finally:
+            self.cache_municipes.invalidar()
+
+    def consultar_estacoes_sincronizacao(self):
+        return self.model.consultar_estacoes_sincronizacao()
+
+    def redefinir_estacao(self):
+        return self.model.redefinir_estacao()
+
+    def arquivar_atendimentos(self, data_corte, ao_progresso=None, cancelamento=None):
+        return self.model.arquivar_atendimentos(data_corte, ao_progresso=ao_progresso, cancelamento=cancelamento)
+
+    def importar_atendimentos_csv(self, caminho_csv):
+        return self.model.importar_atendimentos_csv(caminho_csv)
+
+    # Importação do conteúdo já lido da planilha: é o que o servidor recebe de uma estação,
+    # já que o arquivo está no computador de quem importa
+    def importar_municipes_csv_texto(self, conteudo):
+        return self.importar_municipes_csv(io.StringIO(conteudo, newline=""))
+
+    def importar_atendimentos_csv_texto(self, conteudo):
+        return self.importar_atendimentos_csv(io.StringIO(conteudo, newline=""))
+
+    def agregar_atendimentos(self, dimensoes=(), metricas=("total",), filtros=None, periodo=None):
+        # Mesmo resultado do model, guardado em cache até a próxima gravação nos atendimentos
+        chave = (tuple(dimensoes), tuple(metricas), tuple(sorted((filtros or {}).items())), tuple(periodo or ()))
+        versao = self.model.versao_alteracoes()
+        resultado = self.cache_agregacoes.obter(chave, versao)
+        if resultado is None:
+            resultado = self.model.agregar_atendimentos(dimensoes, metricas, filtros, periodo)
+            self.cache_agregacoes.guardar(chave, versao, resultado)
+        return resultado
+
+    def resumo_estatistico(self, periodo=None):
+        # Números do relatório estatístico; periodo = (mes_inicio, mes_fim) no formato AAAA-MM
+        metricas_gerais = ("total", "pendentes", "concluidos", "percentual_pendentes", "dias_resolucao")
+        geral = self.agregar_atendimentos((), metricas_gerais, periodo=periodo)[0]
+        return {
+            "periodo": list(periodo) if periodo else None,
+            "geral": dict(zip(metricas_gerais, geral)),
+            "por_mes": self.agregar_atendimentos(("mes",), ("total", "pendentes", "concluidos"), periodo=periodo),
+            "por_tipo_pedido": self.agregar_atendimentos(("tipo_pedido",), METRICAS_RELATORIO_ESTATISTICO, periodo=periodo),
+            "por_bairro": self.agregar_atendimentos(("bairro",), METRICAS_RELATORIO_ESTATISTICO, periodo=periodo),
+            "bairro_tipo": self.agregar_atendimentos(("bairro", "tipo_pedido"), ("total",), periodo=periodo),
+        }
+
+    def gerar_relatorio_estatistico_pdf(self, caminho_pdf="relatorio_estatistico.pdf", periodo=None):
+        from reportlab.lib.pagesizes import landscape, letter
+        from reportlab.pdfgen import canvas
+
+        resumo = self.resumo_estatistico(periodo)
+        c = canvas.Canvas(caminho_pdf, pagesize=letter)
+        _desenhar_resumo_estatistico(c, resumo, letter, landscape(letter))
+        c.save()
+        print(f"Relatório salvo em {caminho_pdf}")
+        return True
+
+    def gerar_relatorio_pdf(self, atendimentos, caminho_pdf="relatorio_atendimentos.pdf", ao_progresso=None, cancelamento=None):
+        # Retorna False se o relatório foi cancelado (cancelamento é um threading.Event)
+        # ao_progresso(feitos, total) é chamado a cada parte concluída
+        partes = [atendimentos[i:i + ATENDIMENTOS_POR_PARTE] for i in range(0, len(atendimentos), ATENDIMENTOS_POR_PARTE)]
+        try:
+            from pypdf import PdfWriter
+        except ImportError:
+            PdfWriter = None  # Sem o pypdf não é possível unir as partes; gera tudo em sequência
+
+        # Com um único núcleo os processos extras só adicionariam o custo de iniciar e unir as partes
+        if len(partes) > 1 and PdfWriter is not None and (os.cpu_count() or 1) > 1:
+            concluido = self._gerar_pdf_paralelo(partes, caminho_pdf, PdfWriter, ao_progresso, cancelamento)
+        else:
+            concluido = self._gerar_pdf_sequencial(partes, caminho_pdf, ao_progresso, cancelamento)
+
+        if concluido:
+            print(f"Relatório salvo em {caminho_pdf}")
+        return concluido
+
+    def _gerar_pdf_sequencial(self, partes, caminho_pdf, ao_progresso, cancelamento):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        total = sum(len(parte) for parte in partes)
+        feitos = 0
+        c = canvas.Canvas(caminho_pdf, pagesize=letter)
+        for indice, parte in enumerate(partes):
+            if cancelamento is not None and cancelamento.is_set():
+                return False
+            if indice > 0:
+                c.showPage()
+            _desenhar_atendimentos(c, parte, com_titulo=indice == 0)
+            feitos += len(parte)
+            if ao_progresso is not None:
+                ao_progresso(feitos, total)
+        if not partes:
+            _desenhar_atendimentos(c, [], com_titulo=True)
+        c.save()
+        return True
+
+    def _gerar_pdf_paralelo(self, partes, caminho_pdf, PdfWriter, ao_progresso, cancelamento):
+        # Importados só aqui: a interface e a linha de comando não pagam por eles ao iniciar
+        import multiprocessing
+        import shutil
+        import tempfile
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        total = sum(len(parte) for parte in partes)
+        pasta = tempfile.mkdtemp(prefix="relatorio_")
+        caminhos = [os.path.join(pasta, f"parte_{indice:05d}.pdf") for indice in range(len(partes))]
+        try:
+            # "spawn" evita copiar as threads da interface para os processos filhos
+            contexto = multiprocessing.get_context("spawn")
+            num_processos = min(len(partes), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=num_processos, mp_context=contexto) as pool:
+                futuros = [
+                    pool.submit(_renderizar_parte_pdf, parte, caminho, indice == 0)
+                    for indice, (parte, caminho) in enumerate(zip(partes, caminhos))
+                ]
+                feitos = 0
+                for futuro in as_completed(futuros):
+                    feitos += futuro.result()
+                    if ao_progresso is not None:
+                        ao_progresso(feitos, total)
+                    if cancelamento is not None and cancelamento.is_set():
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        return False
+
+            # Une as partes na ordem original
+            escritor = PdfWriter()
+            for caminho in caminhos:
+                escritor.append(caminho)
+            escritor.write(caminho_pdf)
+            return True
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    
+    def gerar_relatorio_municipe(self, cpf, incluir_arquivo=False):
+        return self.model.consultar_atendimentos(filtro_cpf=cpf, incluir_arquivo=incluir_arquivo)
+
+    def gerar_relatorio_tipo_pedido(self, tipo_pedido):
+        self.model.cursor.execute(CONSULTA_RELATORIO_RESUMIDO + " WHERE a.tipo_pedido = ?", (tipo_pedido,))
+        return self.model.cursor.fetchall()
+
+    def gerar_relatorio_bairro(self, bairro):
+        self.model.cursor.execute(CONSULTA_RELATORIO_RESUMIDO + " WHERE m.bairro = ?", (bairro,))
+        return self.model.cursor.fetchall()
+
+    def contar_atendimentos(self, filtro_nome=None, filtro_cpf=None, filtro_texto=None, incluir_arquivo=False):
+        return self.model.contar_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo)
+
+    def exportar_atendimentos(self, caminho, formato=None, filtro_nome=None, filtro_cpf=None, filtro_texto=None,
+                              ao_progresso=None, cancelamento=None, incluir_arquivo=False):
+        # Exporta os atendimentos com os mesmos filtros do histórico (CSV, JSON Lines ou XLSX)
+        total = self.contar_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo)
+        lotes = self.model.iterar_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo=incluir_arquivo)
+        return self._exportar(lotes, total, CABECALHO_ATENDIMENTOS, caminho, formato, ao_progresso, cancelamento)
+
+    def exportar_relatorio_tipo_pedido(self, tipo_pedido, caminho, formato=None, ao_progresso=None, cancelamento=None):
+        total = self.consultar_resumo().get("tipo_pedido", {}).get(tipo_pedido, 0)
+        lotes = self.model.iterar_relatorio_tipo_pedido(tipo_pedido)
+        return self._exportar(lotes, total, CABECALHO_RELATORIO_RESUMIDO, caminho, formato, ao_progresso, cancelamento)
+
+    def exportar_relatorio_bairro(self, bairro, caminho, formato=None, ao_progresso=None, cancelamento=None):
+        total = self.consultar_resumo().get("bairro", {}).get(bairro, 0)
+        lotes = self.model.iterar_relatorio_bairro(bairro)
+        return self._exportar(lotes, total, CABECALHO_RELATORIO_RESUMIDO, caminho, formato, ao_progresso, cancelamento)
+
+    def _exportar(self, lotes, total, cabecalho, caminho, formato, ao_progresso, cancelamento):
+        # Grava os lotes conforme chegam do banco; retorna a quantidade exportada ou False se cancelado
+        # ao_progresso(feitos, total) é chamado a cada lote; um arquivo incompleto é apagado
+        escritor = ESCRITORES_EXPORTACAO[formato_exportacao(caminho, formato)](caminho, cabecalho)
+        feitos = 0
+        concluido = False
+        try:
+            for lote in lotes:
+                if cancelamento is not None and cancelamento.is_set():
+                    return False
+                escritor.escrever_lote(lote)
+                feitos += len(lote)
+                if ao_progresso is not None:
+                    ao_progresso(feitos, max(total, feitos))
+            concluido = True
+        finally:
+            if hasattr(lotes, "close"):
+                lotes.close()
+            escritor.fechar()
+            if not concluido:
+                os.remove(caminho)
+        print(f"{feitos} registro(s) exportado(s) para {caminho}")
+        return feitos
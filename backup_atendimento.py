@@ -0,0 +1,452 @@
+# Backups do banco de atendimentos com a API de backup online do SQLite - a cópia é feita com o sistema
+# em uso, poucas páginas por passo, sem travar as estações; as cópias antigas são compactadas e descartadas
+# em rodízio, e a restauração confere a cópia antes de gravá-la sobre o banco. O arquivo morto
+# (atendimentos_arquivo.db) entra no mesmo backup, com o mesmo horário no nome, e é restaurado junto
+#
+# Uso:  python cli_atendimento.py backup fazer --medir-latencia
+#       python cli_atendimento.py backup listar
+#       python cli_atendimento.py backup restaurar atendimentos_backups/atendimentos_20261017_020000.db.gz
+# O servidor faz um backup por dia em segundo plano (AgendadorBackup); a interface com o banco local só
+# com --backup-automatico, em uma única estação. Uma trava na pasta impede dois backups ao mesmo tempo
+import datetime
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+
+from atendimento_core import AtendimentoModel, CAMINHO_BANCO, MIGRACOES, caminho_arquivo_morto, registro
+
+# Páginas copiadas por passo (~1 MB com páginas de 4 KiB) e pausa entre os passos, para as consultas
+# das estações passarem na frente
+PAGINAS_POR_PASSO_BACKUP = 256
+PAUSA_ENTRE_PASSOS_S = 0.005
+
+# Rodízio: quantas cópias ficam na pasta; só a mais recente fica sem compactar, pronta para restaurar
+MANTER_BACKUPS = 14
+MANTER_SEM_COMPACTAR = 1
+
+# Agendamento: um backup por intervalo; o primeiro espera a inicialização do sistema
+INTERVALO_BACKUP_S = 24 * 3600
+ATRASO_INICIAL_BACKUP_S = 60
+
+TAMANHO_BLOCO_COMPACTACAO = 1024 * 1024
+
+# Medição do efeito do backup nas consultas: uma página do histórico a cada intervalo
+INTERVALO_SONDA_S = 0.05
+
+# Trava da pasta de backups: uma trava mais velha que isso é de um processo que morreu no meio do backup
+NOME_TRAVA = "backup.trava"
+VALIDADE_TRAVA_S = 6 * 3600
+
+_NOME_BACKUP = re.compile(r"_(\d{8}_\d{6})\.db(\.gz)?")
+
+
+class BackupCancelado(Exception):
+    pass
+
+
+class BackupEmAndamento(Exception):
+    pass
+
+
+def pasta_backups(caminho_banco):
+    # As cópias ficam ao lado do banco (atendimentos.db -> atendimentos_backups)
+    return os.path.splitext(os.path.abspath(caminho_banco))[0] + "_backups"
+
+
+def listar_backups(caminho_banco=CAMINHO_BANCO, pasta=None):
+    # [(caminho, data, tamanho)], da cópia mais recente para a mais antiga
+    pasta = pasta or pasta_backups(caminho_banco)
+    prefixo = os.path.splitext(os.path.basename(caminho_banco))[0]
+    if not os.path.isdir(pasta):
+        return []
+    backups = []
+    for nome in os.listdir(pasta):
+        encontrado = _NOME_BACKUP.fullmatch(nome[len(prefixo):]) if nome.startswith(prefixo) else None
+        if encontrado:
+            caminho = os.path.join(pasta, nome)
+            data = datetime.datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S")
+            backups.append((caminho, data, os.path.getsize(caminho)))
+    backups.sort(key=lambda backup: backup[1], reverse=True)
+    return backups
+
+
+@contextmanager
+def _trava_pasta(pasta):
+    # Só um backup (ou restauração) por vez na pasta, mesmo vindo de estações diferentes: a trava é um arquivo
+    # criado com O_EXCL, que funciona também em pasta compartilhada na rede
+    caminho = os.path.join(pasta, NOME_TRAVA)
+    for _ in range(2):
+        try:
+            descritor = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                idade = time.time() - os.path.getmtime(caminho)
+            except FileNotFoundError:
+                continue  # liberada entre as duas chamadas
+            if idade < VALIDADE_TRAVA_S:
+                raise BackupEmAndamento(f"Outro backup está em andamento na pasta {pasta}.") from None
+            registro.warning("Trava de backup abandonada removida (%.0f s): %s", idade, caminho)
+            os.remove(caminho)
+    else:
+        raise BackupEmAndamento(f"Outro backup está em andamento na pasta {pasta}.")
+    try:
+        os.write(descritor, f"{os.getpid()} {datetime.datetime.now():%Y-%m-%d %H:%M:%S}\n".encode())
+        os.close(descritor)
+        yield
+    finally:
+        os.remove(caminho)
+
+
+def fazer_backup(caminho_banco=CAMINHO_BANCO, pasta=None, paginas_por_passo=PAGINAS_POR_PASSO_BACKUP,
+                 pausa=PAUSA_ENTRE_PASSOS_S, manter=MANTER_BACKUPS, ao_progresso=None, cancelamento=None):
+    # Copia o banco em uso (e o arquivo morto, se existir) para <pasta>/<nome>_AAAAMMDD_HHMMSS.db, confere as
+    # cópias e faz o rodízio. ao_progresso(paginas copiadas, total) a cada passo. Retorna um resumo com a
+    # duração da cópia. BackupEmAndamento se outro processo estiver fazendo backup na mesma pasta
+    pasta = pasta or pasta_backups(caminho_banco)
+    os.makedirs(pasta, exist_ok=True)
+    with _trava_pasta(pasta):
+        return _fazer_backup(caminho_banco, pasta, paginas_por_passo, pausa, manter, ao_progresso, cancelamento)
+
+
+def _fazer_backup(caminho_banco, pasta, paginas_por_passo, pausa, manter, ao_progresso, cancelamento):
+    copias = [("main", caminho_banco)]
+    if os.path.exists(caminho_arquivo_morto(caminho_banco)):
+        copias.append(("arquivo", caminho_arquivo_morto(caminho_banco)))
+    # (esquema, temporário, caminho final) de cada banco copiado; dois backups no mesmo segundo (ex.: a cópia
+    # de segurança da restauração logo depois de um backup) ficam com horários seguidos, sem sobrescrever
+    momento = datetime.datetime.now().replace(microsecond=0)
+    while True:
+        destinos = [
+            (esquema, caminho + ".parcial", caminho)
+            for esquema, caminho in (
+                (esquema, os.path.join(pasta, f"{os.path.splitext(os.path.basename(banco))[0]}_{momento:%Y%m%d_%H%M%S}.db"))
+                for esquema, banco in copias
+            )
+        ]
+        if not any(os.path.exists(caminho) or os.path.exists(caminho + ".gz") for _, _, caminho in destinos):
+            break
+        momento += datetime.timedelta(seconds=1)
+    inicio = time.perf_counter()
+    passos = 0
+
+    def progresso(status, restantes, total):
+        nonlocal passos
+        passos += 1
+        if ao_progresso is not None:
+            ao_progresso(total - restantes, total)
+        if cancelamento is not None and cancelamento.is_set():
+            raise BackupCancelado()  # interrompe o backup (as cópias parciais são apagadas)
+        if restantes:
+            time.sleep(pausa)
+
+    origem = sqlite3.connect(caminho_banco)
+    paginas = 0
+    try:
+        origem.execute("PRAGMA busy_timeout = 5000")
+        if len(copias) > 1:
+            origem.execute("ATTACH DATABASE ? AS arquivo", (copias[1][1],))
+        # Uma transação de leitura aberta durante toda a cópia: com WAL a cópia sai de um único instante do banco
+        # e as gravações das estações seguem normalmente. Sem ela, cada gravação de outra conexão faria o
+        # SQLite recomeçar a cópia do zero (o WAL só cresce um pouco até o fim do backup). A mesma transação
+        # lê os dois bancos, então o arquivo morto sai do mesmo momento que o banco principal
+        origem.execute("BEGIN")
+        for esquema, _, _ in destinos:
+            origem.execute(f"SELECT COUNT(*) FROM {esquema}.sqlite_master").fetchone()
+        for esquema, temporario, _ in destinos:
+            destino = sqlite3.connect(temporario)
+            try:
+                origem.backup(destino, pages=paginas_por_passo, progress=progresso, name=esquema)
+                # Arquivo único, sem -wal, para compactar e copiar para fora
+                destino.execute("PRAGMA journal_mode = DELETE")
+                paginas += destino.execute("PRAGMA page_count").fetchone()[0]
+                conferencia = destino.execute("PRAGMA quick_check").fetchone()[0]
+            finally:
+                destino.close()
+            if conferencia != "ok":
+                raise sqlite3.DatabaseError(f"A cópia de {esquema} não passou na conferência: {conferencia}")
+        origem.rollback()
+        duracao = time.perf_counter() - inicio
+        # O arquivo morto entra primeiro: o rodízio descarta uma cópia dele que ficar sem o banco principal
+        for _, temporario, caminho in reversed(destinos):
+            os.replace(temporario, caminho)
+    except BaseException:
+        for _, temporario, _ in destinos:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        raise
+    finally:
+        origem.close()
+    compactados, removidos = rodiziar_backups(caminho_banco, pasta, manter)
+    caminho = destinos[0][2]
+    resumo = {
+        "caminho": caminho,
+        "arquivo_morto": destinos[1][2] if len(destinos) > 1 else None,
+        "paginas": paginas,
+        "passos": passos,
+        "tamanho": sum(os.path.getsize(final) for _, _, final in destinos),
+        "duracao_s": duracao,
+        "total_s": time.perf_counter() - inicio,
+        "compactados": compactados,
+        "removidos": removidos,
+    }
+    registro.info("Backup %s: %d páginas em %.1f s (%d passos)", caminho, paginas, duracao, passos)
+    return resumo
+
+
+def _compactar(caminho):
+    # Compacta em blocos (a memória não cresce com o banco); o original só sai depois do .gz completo
+    temporario = caminho + ".gz.parcial"
+    with open(caminho, "rb") as entrada, gzip.open(temporario, "wb", compresslevel=6) as saida:
+        shutil.copyfileobj(entrada, saida, TAMANHO_BLOCO_COMPACTACAO)
+    os.replace(temporario, caminho + ".gz")
+    os.remove(caminho)
+    return caminho + ".gz"
+
+
+def _backup_arquivo_morto(caminho_banco, pasta, data):
+    # Cópia do arquivo morto feita junto com o backup do banco principal daquele horário, se houver
+    for caminho, data_copia, _ in listar_backups(caminho_arquivo_morto(caminho_banco), pasta or pasta_backups(caminho_banco)):
+        if data_copia == data:
+            return caminho
+    return None
+
+
+def rodiziar_backups(caminho_banco=CAMINHO_BANCO, pasta=None, manter=MANTER_BACKUPS):
+    # Compacta as cópias mais antigas que a(s) MANTER_SEM_COMPACTAR mais recentes e descarta as que passam de "manter"
+    # A cópia do arquivo morto acompanha a do banco principal de mesmo horário; uma que ficou sem par sai
+    pasta = pasta or pasta_backups(caminho_banco)
+    arquivo_morto = {data: caminho for caminho, data, _ in listar_backups(caminho_arquivo_morto(caminho_banco), pasta)}
+    compactados, removidos = [], []
+    for posicao, (caminho, data, _) in enumerate(listar_backups(caminho_banco, pasta)):
+        par = [caminho] + ([arquivo_morto.pop(data)] if data in arquivo_morto else [])
+        for copia in par:
+            if manter is not None and posicao >= manter:
+                os.remove(copia)
+                removidos.append(copia)
+            elif posicao >= MANTER_SEM_COMPACTAR and not copia.endswith(".gz"):
+                compactados.append(_compactar(copia))
+    for copia in arquivo_morto.values():
+        os.remove(copia)
+        removidos.append(copia)
+    return compactados, removidos
+
+
+def _conferir_copia(caminho):
+    # Conferência completa (integrity_check) e versão do esquema; retorna a versão
+    conexao = sqlite3.connect(caminho)
+    try:
+        conferencia = [linha[0] for linha in conexao.execute("PRAGMA integrity_check").fetchall()]
+        if conferencia != ["ok"]:
+            raise ValueError(f"O backup está corrompido: {'; '.join(conferencia[:5])}")
+        tabelas = {linha[0] for linha in conexao.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {"municipes", "atendimentos"} <= tabelas:
+            raise ValueError("O arquivo não é um backup do banco de atendimentos.")
+        versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.DatabaseError as erro:
+        raise ValueError(f"O arquivo não é um banco de dados válido: {erro}") from None
+    finally:
+        conexao.close()
+    if versao > MIGRACOES[-1][0]:
+        raise ValueError(f"O backup é de uma versão mais nova do sistema (esquema {versao}).")
+    return versao
+
+
+def _preparar_copia(caminho_backup, temporario):
+    # Descompacta (ou copia) o backup para o temporário e o confere; retorna a versão do esquema
+    if caminho_backup.endswith(".gz"):
+        try:
+            with gzip.open(caminho_backup, "rb") as entrada, open(temporario, "wb") as saida:
+                shutil.copyfileobj(entrada, saida, TAMANHO_BLOCO_COMPACTACAO)
+        except (OSError, EOFError) as erro:
+            raise ValueError(f"O backup compactado está danificado: {erro}") from None
+    else:
+        shutil.copyfile(caminho_backup, temporario)
+    return _conferir_copia(temporario)
+
+
+def _copiar_danificado(caminho_banco, pasta):
+    # Guarda os arquivos do banco (e do arquivo morto) como estão, com o -wal, quando o SQLite não consegue
+    # copiá-los. O nome fica fora do padrão dos backups: a cópia não entra no rodízio nem na lista
+    horario = f"{datetime.datetime.now():%Y%m%d_%H%M%S}"
+    copias = []
+    for banco in (caminho_banco, caminho_arquivo_morto(caminho_banco)):
+        if not os.path.exists(banco):
+            continue
+        destino = os.path.join(pasta, f"{os.path.splitext(os.path.basename(banco))[0]}_{horario}_danificado.db")
+        for sufixo in ("", "-wal"):
+            if os.path.exists(banco + sufixo):
+                shutil.copyfile(banco + sufixo, destino + sufixo)
+        copias.append(destino)
+    return copias
+
+
+def _gravar_sobre(temporario, caminho_banco, danificado=False):
+    # A troca também usa a API de backup, em um único passo: o SQLite grava com o banco travado e as
+    # conexões abertas passam a enxergar o conteúdo restaurado. Um banco danificado a ponto de o SQLite
+    # não aceitá-lo como destino é trocado pelo arquivo restaurado (o -wal dele iria junto com o dano)
+    fonte = sqlite3.connect(temporario)
+    alvo = sqlite3.connect(caminho_banco)
+    try:
+        alvo.execute("PRAGMA busy_timeout = 30000")
+        fonte.backup(alvo)
+        return
+    except sqlite3.OperationalError:
+        raise  # travado ou sem espaço: não é dano no arquivo
+    except sqlite3.DatabaseError:
+        if not danificado:
+            raise
+    finally:
+        alvo.close()
+        fonte.close()
+    for sufixo in ("-wal", "-shm"):
+        if os.path.exists(caminho_banco + sufixo):
+            os.remove(caminho_banco + sufixo)
+    shutil.copyfile(temporario, caminho_banco)
+
+
+def restaurar_backup(caminho_backup, caminho_banco=CAMINHO_BANCO, pasta=None):
+    # Confere as cópias antes de tocar no banco: o gzip confere o CRC ao descompactar e o SQLite roda o
+    # integrity_check. O banco atual (com o arquivo morto) vira um backup antes da troca, para poder desfazer
+    # a restauração. O arquivo morto volta com a cópia do mesmo horário; um backup de antes do arquivamento
+    # deixa o arquivo morto vazio, senão os atendimentos arquivados depois apareceriam duas vezes no histórico
+    pasta = pasta or pasta_backups(caminho_banco)
+    os.makedirs(pasta, exist_ok=True)
+    encontrado = _NOME_BACKUP.search(os.path.basename(caminho_backup))
+    backup_arquivo_morto = None
+    if encontrado:
+        data = datetime.datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S")
+        backup_arquivo_morto = _backup_arquivo_morto(caminho_banco, os.path.dirname(os.path.abspath(caminho_backup)), data)
+    existe_arquivo_morto = os.path.exists(caminho_arquivo_morto(caminho_banco))
+    temporario = os.path.join(pasta, "restauracao.db.parcial")
+    temporario_arquivo = os.path.join(pasta, "restauracao_arquivo.db.parcial")
+    inicio = time.perf_counter()
+    with _trava_pasta(pasta):
+        try:
+            versao = _preparar_copia(caminho_backup, temporario)
+            if backup_arquivo_morto is not None:
+                _preparar_copia(backup_arquivo_morto, temporario_arquivo)
+            elif existe_arquivo_morto:
+                AtendimentoModel(temporario_arquivo).fechar_conexao()  # arquivo morto vazio
+            # Restaurar sobre um banco danificado é o caso mais comum: se o SQLite não consegue copiá-lo
+            # (página corrompida, conferência falhou), os arquivos são guardados como estão
+            try:
+                anterior = _fazer_backup(caminho_banco, pasta, PAGINAS_POR_PASSO_BACKUP, PAUSA_ENTRE_PASSOS_S,
+                                         manter=None, ao_progresso=None, cancelamento=None)["caminho"]
+                danificado = False
+            except sqlite3.OperationalError:
+                raise
+            except sqlite3.DatabaseError as erro:
+                registro.warning("Banco %s danificado (%s): guardado sem conferência antes da restauração", caminho_banco, erro)
+                anterior = _copiar_danificado(caminho_banco, pasta)[0]
+                danificado = True
+            _gravar_sobre(temporario, caminho_banco, danificado)
+            if os.path.exists(temporario_arquivo):
+                _gravar_sobre(temporario_arquivo, caminho_arquivo_morto(caminho_banco), danificado)
+        finally:
+            for caminho in (temporario, temporario_arquivo):
+                for sufixo in ("", "-wal", "-shm"):
+                    if os.path.exists(caminho + sufixo):
+                        os.remove(caminho + sufixo)
+    # Um backup de versão anterior recebe as migrações que faltam (o arquivo morto, ao ser anexado)
+    AtendimentoModel(caminho_banco).fechar_conexao()
+    return {"restaurado": caminho_backup, "arquivo_morto": backup_arquivo_morto, "versao_esquema": versao,
+            "anterior": anterior, "anterior_danificado": danificado, "duracao_s": time.perf_counter() - inicio}
+
+
+def _percentis(tempos):
+    import statistics
+    tempos = sorted(tempos)
+    if not tempos:
+        return {"consultas": 0}
+    return {
+        "consultas": len(tempos),
+        "mediana_ms": statistics.median(tempos) * 1000,
+        "p95_ms": tempos[int(len(tempos) * 0.95)] * 1000,
+        "maximo_ms": tempos[-1] * 1000,
+    }
+
+
+def medir_impacto_backup(caminho_banco=CAMINHO_BANCO, pasta=None, referencia_s=5.0, **opcoes):
+    # Faz um backup enquanto uma conexão à parte consulta a primeira página do histórico a cada INTERVALO_SONDA_S,
+    # e compara os tempos com os de antes do backup (referência). Retorna (resumo do backup, {fase: percentis})
+    tempos = {"sem_backup": [], "durante_backup": []}
+    fase = "sem_backup"
+    pronta, parar = threading.Event(), threading.Event()
+
+    def sondar():
+        model = AtendimentoModel(caminho_banco)
+        pronta.set()
+        try:
+            while not parar.wait(INTERVALO_SONDA_S):
+                inicio = time.perf_counter()
+                model.consultar_atendimentos_pagina()
+                tempos[fase].append(time.perf_counter() - inicio)
+        finally:
+            model.fechar_conexao()
+
+    sonda = threading.Thread(target=sondar, daemon=True)
+    sonda.start()
+    try:
+        pronta.wait()
+        time.sleep(referencia_s)
+        fase = "durante_backup"
+        resumo = fazer_backup(caminho_banco, pasta, **opcoes)
+    finally:
+        parar.set()
+        sonda.join()
+    return resumo, {nome: _percentis(medidos) for nome, medidos in tempos.items()}
+
+
+# Agendador - um backup por intervalo em uma thread em segundo plano. O intervalo conta a partir do último
+# backup da pasta, então reiniciar o sistema não antecipa nem pula backups
+class AgendadorBackup:
+    def __init__(self, caminho_banco=CAMINHO_BANCO, intervalo_s=INTERVALO_BACKUP_S, pasta=None, ao_concluir=None):
+        self.caminho_banco = caminho_banco
+        self.intervalo_s = intervalo_s
+        self.pasta = pasta
+        self.ao_concluir = ao_concluir  # chamado na thread do agendador com o resumo de cada backup
+        self.ultimo = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name="backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, esperar=True):
+        # Um backup em andamento é interrompido no próximo passo
+        self._parar.set()
+        if esperar and self._thread is not None:
+            self._thread.join()
+
+    def _espera(self):
+        backups = listar_backups(self.caminho_banco, self.pasta)
+        if not backups:
+            return ATRASO_INICIAL_BACKUP_S
+        decorrido = (datetime.datetime.now() - backups[0][1]).total_seconds()
+        return max(self.intervalo_s - decorrido, ATRASO_INICIAL_BACKUP_S)
+
+    def _executar(self):
+        while not self._parar.wait(self._espera()):
+            try:
+                self.ultimo = fazer_backup(self.caminho_banco, self.pasta, cancelamento=self._parar)
+            except BackupCancelado:
+                break
+            except BackupEmAndamento:
+                # Outra estação (ou o servidor) está fazendo o backup na mesma pasta; a espera seguinte já conta a partir dele
+                registro.info("Backup agendado de %s adiado: outro backup em andamento", self.caminho_banco)
+                continue
+            except Exception:
+                # Sem backup novo na pasta, a próxima tentativa sai depois do atraso inicial
+                registro.exception("Falha no backup agendado de %s", self.caminho_banco)
+                continue
+            if self.ao_concluir is not None:
+                self.ao_concluir(self.ultimo)
@@ -0,0 +1,296 @@
+# Benchmark do Sistema de Atendimento - gera dados sintéticos e mede as operações do model e do controller
+# Os resultados são gravados em JSON para comparar execuções (antes e depois de uma mudança)
+#
+# Uso:  python benchmark_atendimento.py --atendimentos 100000 --saida resultado.json
+#       python benchmark_atendimento.py --atendimentos 100000 --comparar resultado_anterior.json
+import argparse
+import datetime
+import json
+import operator
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from atendimento_core import AtendimentoController, AtendimentoModel, STATUS_CONCLUIDO, TAMANHO_PAGINA
+
+# Distribuições aproximadas dos cadastros do gabinete
+NOMES = [
+    "Maria", "José", "Ana", "João", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro", "Lucas",
+    "Luiz", "Marcos", "Luís", "Gabriel", "Rafael", "Francisca", "Daniel", "Marcelo", "Bruno", "Eduardo",
+    "Adriana", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline", "Sandra", "Camila", "Amanda", "Bruna",
+    "Jéssica", "Letícia", "Júlia", "Luciana", "Vanessa", "Mariana", "Gabriela", "Vera", "Vitória", "Larissa",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+    "Cardoso", "Ramos", "Gonçalves", "Santana", "Teixeira", "Araújo", "Conceição", "Mello", "Castro", "Pinto",
+]
+BAIRROS = [
+    "Centro", "Jardim América", "Vila Nova", "São José", "Santa Luzia", "Boa Vista", "Planalto", "Industrial",
+    "Jardim Primavera", "Vila Operária", "Nossa Senhora Aparecida", "São Cristóvão", "Bela Vista", "Santa Rita",
+    "Jardim das Flores", "Vila Esperança", "Parque dos Ipês", "Morada do Sol", "Cidade Nova", "Alto da Serra",
+]
+LOGRADOUROS = ["Rua", "Avenida", "Travessa", "Alameda"]
+TIPOS_PEDIDO = [
+    ("Saúde", 25), ("Infraestrutura", 20), ("Educação", 12), ("Segurança", 10), ("Transporte", 9),
+    ("Assistência Social", 8), ("Meio Ambiente", 5), ("Habitação", 4), ("Cultura", 3), ("Esporte e Lazer", 2),
+    ("Emprego e Renda", 1), ("Outros", 1),
+]
+DESCRICOES = [
+    "Solicita vaga em creche próxima à residência", "Buraco na rua em frente ao número informado",
+    "Pede agendamento de consulta com especialista", "Iluminação pública queimada há semanas",
+    "Reclama da frequência do ônibus no bairro", "Pede poda de árvore com risco de queda",
+    "Solicita cesta básica para a família", "Pede ronda policial no período noturno",
+    "Entulho acumulado em terreno baldio", "Solicita medicamento em falta na unidade de saúde",
+]
+STATUS = [("Pendente", 45), ("Em Andamento", 25), ("Concluído", 30)]
+PRIORIDADES = [("Normal", 60), ("Alta", 25), ("Baixa", 10), ("Urgente", 5)]
+ASSESSORES = ["Cláudia", "Roberto", "Simone", "Fábio", "Renata", "Tiago"]
+
+TAMANHO_LOTE = 10000
+
+
+def gerar_cpf(aleatorio):
+    # Nove dígitos aleatórios mais os dois dígitos verificadores
+    numeros = [aleatorio.randrange(10) for _ in range(9)]
+    for posicao in (9, 10):
+        soma = sum(map(operator.mul, numeros, range(posicao + 1, 1, -1)))
+        numeros.append(soma * 10 % 11 % 10)
+    return "".join(map(str, numeros))
+
+
+def _escolher(aleatorio, pesos):
+    valores, frequencias = zip(*pesos)
+    return aleatorio.choices(valores, frequencias)[0]
+
+
+def gerar_municipes(aleatorio, quantidade):
+    cpfs = set()
+    while len(cpfs) < quantidade:
+        cpfs.add(gerar_cpf(aleatorio))
+    # Ordena antes de embaralhar: a ordem de um set muda entre execuções do Python
+    cpfs = sorted(cpfs)
+    aleatorio.shuffle(cpfs)
+    for cpf in cpfs:
+        nome = f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}"
+        endereco = f"{aleatorio.choice(LOGRADOUROS)} {aleatorio.choice(SOBRENOMES)}, {aleatorio.randint(1, 3000)}"
+        telefone = f"({aleatorio.randint(11, 99)}) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}"
+        # Poucos bairros concentram boa parte dos munícipes
+        bairro = BAIRROS[min(int(aleatorio.expovariate(0.25)), len(BAIRROS) - 1)]
+        yield (cpf, nome, endereco, bairro, telefone, str(aleatorio.randint(1000000, 99999999)),
+               str(aleatorio.randint(10 ** 11, 10 ** 12 - 1)), str(aleatorio.randint(1, 400)), str(aleatorio.randint(1, 900)))
+
+
+def gerar_atendimentos(aleatorio, cpfs, quantidade, inicio, dias):
+    for _ in range(quantidade):
+        data_horario = inicio + datetime.timedelta(seconds=aleatorio.randrange(dias * 86400))
+        status = _escolher(aleatorio, STATUS)
+        data_conclusao = None
+        if status == STATUS_CONCLUIDO:
+            data_conclusao = (data_horario + datetime.timedelta(seconds=aleatorio.randrange(60 * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+        yield (
+            aleatorio.choice(cpfs), _escolher(aleatorio, TIPOS_PEDIDO), aleatorio.choice(DESCRICOES), "",
+            data_horario.strftime("%Y-%m-%d %H:%M:%S"), str(aleatorio.choice([5, 10, 15, 30, 60])),
+            aleatorio.choice(ASSESSORES), _escolher(aleatorio, PRIORIDADES), status, data_conclusao,
+        )
+
+
+def _em_lotes(linhas, tamanho):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def popular_banco(model, num_municipes, num_atendimentos, semente=42, dias=730):
+    # Mesma semente, mesmos dados: as execuções do benchmark podem ser comparadas entre si
+    aleatorio = random.Random(semente)
+    cpfs = []
+    for lote in _em_lotes(gerar_municipes(aleatorio, num_municipes), TAMANHO_LOTE):
+        with model.transacao():
+            model.cursor.executemany('''
+            INSERT OR IGNORE INTO municipes (cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', lote)
+        cpfs.extend(linha[0] for linha in lote)
+
+    inicio = datetime.datetime(2023, 1, 1)
+    for lote in _em_lotes(gerar_atendimentos(aleatorio, cpfs, num_atendimentos, inicio, dias), TAMANHO_LOTE):
+        with model.transacao():
+            model.cursor.executemany('''
+            INSERT INTO atendimentos (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor, prioridade, status, data_conclusao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', lote)
+    model.cursor.execute("ANALYZE")
+    return cpfs
+
+
+def _medir(funcao, repeticoes):
+    # Uma chamada de aquecimento (cache de páginas do SQLite) e depois as medições
+    resultado = funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    medicao = {
+        "minimo": min(tempos),
+        "mediana": statistics.median(tempos),
+        "media": statistics.fmean(tempos),
+        "repeticoes": repeticoes,
+    }
+    if isinstance(resultado, (list, tuple)):
+        medicao["linhas"] = len(resultado)
+    return medicao
+
+
+def operacoes(controller, amostra, pasta, limite_pdf):
+    # (nome, função) de cada operação medida; os parâmetros vêm de registros reais do banco gerado
+    model = controller.model
+    cpf, nome, bairro, atendimento_id, cursor_meio = amostra
+    primeiro_nome = nome.split()[0]
+    pagina_meio = lambda: model.consultar_atendimentos_pagina(cursor=cursor_meio, tamanho=TAMANHO_PAGINA)
+    para_pdf = model.consultar_atendimentos_pagina(tamanho=limite_pdf)[0]
+    return [
+        ("consultar_atendimentos", lambda: model.consultar_atendimentos()),
+        ("consultar_atendimentos[filtro_cpf]", lambda: model.consultar_atendimentos(filtro_cpf=cpf)),
+        ("consultar_atendimentos[filtro_nome]", lambda: model.consultar_atendimentos(filtro_nome=primeiro_nome)),
+        ("consultar_atendimentos[filtro_texto]", lambda: model.consultar_atendimentos(filtro_texto="creche")),
+        ("consultar_atendimentos_pagina[primeira]", lambda: model.consultar_atendimentos_pagina()),
+        ("consultar_atendimentos_pagina[meio]", pagina_meio),
+        ("consultar_atendimentos_pagina[historico_completo]", lambda: model.consultar_atendimentos_pagina(incluir_arquivo=True)),
+        ("buscar_atendimento_por_id", lambda: model.buscar_atendimento_por_id(atendimento_id)),
+        ("buscar_municipes[nome]", lambda: model.buscar_municipes(nome)),
+        ("buscar_municipes[cpf]", lambda: model.buscar_municipes(cpf[:6])),
+        ("buscar_municipe_por_cpf", lambda: model.buscar_municipe_por_cpf(cpf)),
+        ("controller.buscar_municipe_por_cpf[cache]", lambda: controller.buscar_municipe_por_cpf(cpf)),
+        ("consultar_municipes", lambda: model.consultar_municipes()),
+        ("gerar_relatorio_municipe", lambda: controller.gerar_relatorio_municipe(cpf)),
+        ("gerar_relatorio_tipo_pedido", lambda: controller.gerar_relatorio_tipo_pedido("Saúde")),
+        ("gerar_relatorio_bairro", lambda: controller.gerar_relatorio_bairro(bairro)),
+        ("indicadores_dashboard", lambda: controller.indicadores_dashboard()),
+        ("agregar_atendimentos[bairro x tipo_pedido]", lambda: model.agregar_atendimentos(("bairro", "tipo_pedido"))),
+        ("agregar_atendimentos[mes, filtro bairro]", lambda: model.agregar_atendimentos(
+            ("mes",), ("total", "percentual_pendentes", "dias_resolucao"), filtros={"bairro": bairro}
+        )),
+        ("resumo_estatistico[sem cache]", lambda: AtendimentoController(model).resumo_estatistico()),
+        ("resumo_estatistico[cache]", lambda: controller.resumo_estatistico()),
+        ("consultar_atrasados", lambda: controller.consultar_atrasados()),
+        ("contar_atrasados", lambda: controller.contar_atrasados()),
+        ("consultar_coluna_quadro[Pendente]", lambda: model.consultar_coluna_quadro("Pendente")),
+        ("mover_atendimento", lambda: model.mover_atendimento(atendimento_id, "Em Andamento")),
+        ("consultar_alteracoes", lambda: controller.consultar_alteracoes(max(controller.versao_alteracoes() - 50, 0))),
+        ("registrar_atendimento", lambda: model.registrar_atendimento(
+            cpf, "Saúde", "Benchmark", "", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "10", "Benchmark", "Normal", "Pendente"
+        )),
+        (f"gerar_relatorio_pdf[{len(para_pdf)}]", lambda: controller.gerar_relatorio_pdf(para_pdf, os.path.join(pasta, "benchmark.pdf"))),
+    ]
+
+
+def _amostra(model, semente):
+    # Escolhe um munícipe, um atendimento e um cursor no meio da tabela para as consultas
+    aleatorio = random.Random(semente)
+    total = model.cursor.execute("SELECT COUNT(*) FROM atendimentos").fetchone()[0]
+    if not total:
+        raise SystemExit("O banco não possui atendimentos para medir.")
+    linha = model.cursor.execute(
+        "SELECT a.id, a.data_horario, m.cpf, m.nome, m.bairro FROM atendimentos a JOIN municipes m ON a.cpf = m.cpf "
+        "ORDER BY a.data_horario DESC, a.id DESC LIMIT 1 OFFSET ?", (aleatorio.randrange(total),)
+    ).fetchone()
+    atendimento_id, data_horario, cpf, nome, bairro = linha
+    return cpf, nome, bairro, atendimento_id, (data_horario, atendimento_id)
+
+
+def executar_benchmark(caminho_banco, repeticoes=5, filtro=None, limite_pdf=2000, semente=42):
+    model = AtendimentoModel(caminho_banco)
+    controller = AtendimentoController(model)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, funcao in operacoes(controller, _amostra(model, semente), pasta, limite_pdf):
+            if filtro and filtro not in nome:
+                continue
+            resultados[nome] = _medir(funcao, repeticoes)
+            print(f"{nome:<45} mediana {resultados[nome]['mediana'] * 1000:10.2f} ms")
+    contagens = {
+        "municipes": model.cursor.execute("SELECT COUNT(*) FROM municipes").fetchone()[0],
+        "atendimentos": model.cursor.execute("SELECT COUNT(*) FROM atendimentos").fetchone()[0],
+    }
+    model.fechar_conexao()
+    return contagens, resultados
+
+
+def comparar(anterior, atual):
+    # Razão entre as medianas: abaixo de 1 a operação ficou mais rápida
+    print(f"\n{'operação':<45} {'anterior':>12} {'atual':>12} {'razão':>8}")
+    for nome, medicao in atual["resultados"].items():
+        if nome not in anterior["resultados"]:
+            continue
+        antes = anterior["resultados"][nome]["mediana"]
+        depois = medicao["mediana"]
+        razao = depois / antes if antes else float("inf")
+        print(f"{nome:<45} {antes * 1000:10.2f}ms {depois * 1000:10.2f}ms {razao:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do Sistema de Atendimento ao Gabinete")
+    parser.add_argument("--banco", help="banco já existente a medir (por padrão gera um banco sintético temporário)")
+    parser.add_argument("--atendimentos", type=int, default=10000, help="atendimentos gerados (1 mil a 5 milhões)")
+    parser.add_argument("--municipes", type=int, help="munícipes gerados (padrão: 1 para cada 5 atendimentos)")
+    parser.add_argument("--semente", type=int, default=42, help="semente dos dados gerados")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--filtro", help="mede apenas as operações cujo nome contém este texto")
+    parser.add_argument("--limite-pdf", type=int, default=2000, help="atendimentos incluídos no relatório PDF medido")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_banco = args.banco
+        geracao = None
+        if caminho_banco is None:
+            caminho_banco = os.path.join(pasta, "benchmark.db")
+            num_municipes = args.municipes or max(args.atendimentos // 5, 1)
+            inicio = time.perf_counter()
+            model = AtendimentoModel(caminho_banco)
+            popular_banco(model, num_municipes, args.atendimentos, args.semente)
+            model.fechar_conexao()
+            geracao = time.perf_counter() - inicio
+            print(f"Banco sintético gerado em {geracao:.1f} s: {num_municipes} munícipes, {args.atendimentos} atendimentos")
+
+        contagens, resultados = executar_benchmark(caminho_banco, args.repeticoes, args.filtro, args.limite_pdf, args.semente)
+
+    relatorio = {
+        "metadados": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "processadores": os.cpu_count(),
+            "semente": args.semente,
+            "banco": args.banco or "sintético",
+            "geracao_segundos": geracao,
+            **contagens,
+        },
+        "resultados": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultados salvos em {args.saida}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            comparar(json.load(arquivo), relatorio)
+
+
+if __name__ == "__main__":
+    main()
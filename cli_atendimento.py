@@ -0,0 +1,372 @@
+import time
+INICIO_PROCESSO = time.perf_counter()  # referência do orçamento de inicialização, antes dos demais imports
+
+# Linha de comando do Sistema de Atendimento - relatórios, exportações, importações e estatísticas
+# sem a interface gráfica (não importa o tkinter; o reportlab só é carregado ao gerar um PDF)
+#
+# Uso:  python cli_atendimento.py relatorio bairro Centro --saida relatorio_centro.pdf
+#       python cli_atendimento.py relatorio estatistico --de 2024-01 --ate 2024-12
+#       python cli_atendimento.py exportar --saida atendimentos.csv --filtro-cpf 12345678909
+#       python cli_atendimento.py exportar bairro --valor Centro --saida centro.xlsx
+#       python cli_atendimento.py importar municipes municipes.csv
+#       python cli_atendimento.py estatisticas
+#       python cli_atendimento.py prazos --proximos 7
+#       python cli_atendimento.py estatisticas --agrupar bairro,tipo_pedido --metricas total,percentual_pendentes
+#       python cli_atendimento.py sincronizar exportar pacote.jsonl.gz --para <estação>
+#       python cli_atendimento.py sincronizar importar pacote.jsonl.gz
+#       python cli_atendimento.py arquivar --antes-de 2024-01-01
+#       python cli_atendimento.py exportar --saida historico.csv --historico-completo
+#       python cli_atendimento.py backup fazer --medir-latencia
+#       python cli_atendimento.py backup restaurar atendimentos_backups/atendimentos_20261017_020000.db.gz
+import argparse
+import json
+import sys
+
+from atendimento_core import (AtendimentoController, AtendimentoModel, CAMINHO_BANCO, DIMENSOES_AGREGACAO,
+                              ESCRITORES_EXPORTACAO, METRICAS_AGREGACAO, ORDEM_PRIORIDADES, registro)
+
+# Orçamento de inicialização: tempo (ms) até o comando começar a executar
+ORCAMENTO_INICIALIZACAO_MS = 150
+
+def _abrir_controller(args):
+    if args.servidor:
+        from servidor_atendimento import ControllerRemoto
+        return ControllerRemoto(args.servidor)
+    return AtendimentoController(AtendimentoModel(args.banco))
+
+
+def _erros_servidor(args):
+    # Erros vindos do servidor (ex.: operação que só roda na máquina do banco) viram mensagem, sem o traceback
+    if not args.servidor:
+        return ()
+    from servidor_atendimento import ErroServidor
+    return (ErroServidor,)
+
+
+def comando_relatorio(controller, args):
+    if args.tipo == "estatistico":
+        periodo = (args.de, args.ate) if args.de or args.ate else None
+        controller.gerar_relatorio_estatistico_pdf(args.saida or "relatorio_estatistico.pdf", periodo)
+        return 0
+    consultas = {
+        "cpf": lambda: controller.gerar_relatorio_municipe(args.valor, incluir_arquivo=args.historico_completo),
+        "tipo": lambda: controller.gerar_relatorio_tipo_pedido(args.valor),
+        "bairro": lambda: controller.gerar_relatorio_bairro(args.valor),
+        "todos": controller.consultar_todos_atendimentos,
+    }
+    if args.tipo != "todos" and not args.valor:
+        raise SystemExit(f"Informe o valor para o relatório por {args.tipo}.")
+    atendimentos = consultas[args.tipo]()
+    if not atendimentos:
+        print("Nenhum atendimento encontrado.")
+        return 1
+    caminho_pdf = args.saida or f"relatorio_{args.tipo}{'_' + args.valor if args.valor else ''}.pdf"
+    controller.gerar_relatorio_pdf(atendimentos, caminho_pdf)
+    return 0
+
+
+def _mostrar_progresso(feitos, total):
+    print(f"\rExportando... {feitos}/{total}", end="", file=sys.stderr, flush=True)
+
+
+def comando_exportar(controller, args):
+    progresso = None if args.silencioso else _mostrar_progresso
+    if args.relatorio == "atendimentos":
+        exportados = controller.exportar_atendimentos(args.saida, args.formato, args.filtro_nome, args.filtro_cpf,
+                                                      args.filtro_texto, ao_progresso=progresso,
+                                                      incluir_arquivo=args.historico_completo)
+    else:
+        if not args.valor:
+            raise SystemExit(f"Informe --valor para a exportação por {args.relatorio}.")
+        exportar = controller.exportar_relatorio_bairro if args.relatorio == "bairro" else controller.exportar_relatorio_tipo_pedido
+        exportados = exportar(args.valor, args.saida, args.formato, ao_progresso=progresso)
+    if progresso is not None:
+        print(file=sys.stderr)
+    return 0 if exportados else 1
+
+
+def comando_importar(controller, args):
+    importar = controller.importar_municipes_csv if args.tipo == "municipes" else controller.importar_atendimentos_csv
+    resultado = importar(args.arquivo)
+    # Só a importação de munícipes tem duplicados (CPF já cadastrado)
+    duplicados = f"  Duplicados: {resultado['duplicados']}" if "duplicados" in resultado else ""
+    print(f"Inseridos: {resultado['inseridos']}{duplicados}  Rejeitados: {len(resultado['rejeitados'])}")
+    for linha, motivo in resultado["rejeitados"][:args.max_rejeitados]:
+        print(f"  linha {linha}: {motivo}")
+    return 1 if resultado["rejeitados"] else 0
+
+
+def comando_agregacao(controller, args):
+    dimensoes = [nome.strip() for nome in args.agrupar.split(",") if nome.strip()]
+    metricas = [nome.strip() for nome in args.metricas.split(",") if nome.strip()]
+    periodo = (args.de, args.ate) if args.de or args.ate else None
+    try:
+        linhas = controller.agregar_atendimentos(dimensoes, metricas, periodo=periodo)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+    if args.json:
+        print(json.dumps([dict(zip(dimensoes + metricas, linha)) for linha in linhas], ensure_ascii=False, indent=2))
+        return 0
+    print("  ".join(f"{nome:<25}" for nome in dimensoes) + "".join(f"{nome:>22}" for nome in metricas))
+    for linha in linhas:
+        print("  ".join(f"{str(valor):<25}" for valor in linha[:len(dimensoes)])
+              + "".join(f"{'-' if valor is None else valor:>22}" for valor in linha[len(dimensoes):]))
+    return 0
+
+
+def comando_estatisticas(controller, args):
+    if args.agrupar:
+        return comando_agregacao(controller, args)
+    estatisticas = {
+        "indicadores": controller.indicadores_dashboard(),
+        "resumo": controller.consultar_resumo(),
+    }
+    if args.verificar:
+        estatisticas["divergencias"] = controller.verificar_resumo()
+    if args.json:
+        print(json.dumps(estatisticas, ensure_ascii=False, indent=2))
+        return 0
+    indicadores = estatisticas["indicadores"]
+    print(f"Atendimentos abertos: {indicadores['abertos']}")
+    print(f"Pendentes: {indicadores['pendentes']}")
+    for dimensao, valores in sorted(estatisticas["resumo"].items()):
+        if dimensao == "total":
+            continue
+        print(f"\nPor {dimensao}:")
+        for valor, total in sorted(valores.items(), key=lambda item: item[1], reverse=True):
+            print(f"  {valor:<30} {total:>8}")
+    if args.verificar:
+        print(f"\nDivergências no resumo: {len(estatisticas['divergencias'])}")
+    return 0
+
+
+def _ordem_prioridade(prioridade):
+    return ORDEM_PRIORIDADES.index(prioridade) if prioridade in ORDEM_PRIORIDADES else len(ORDEM_PRIORIDADES)
+
+
+def comando_prazos(controller, args):
+    if args.proximos:
+        titulo = f"Vencem nos próximos {args.proximos} dia(s)"
+        atendimentos = controller.consultar_proximos_prazos(args.proximos, args.limite)
+    else:
+        por_prioridade = controller.contar_atrasados()
+        titulo = f"Atrasados: {sum(por_prioridade.values())} (" + ", ".join(
+            f"{prioridade} {total}" for prioridade, total in sorted(por_prioridade.items(), key=lambda item: _ordem_prioridade(item[0]))
+        ) + ")"
+        atendimentos = controller.consultar_atrasados(args.limite)
+    if args.json:
+        colunas = ["id", "cpf", "nome", "tipo_pedido", "prioridade", "status", "data_limite", "assessor"]
+        print(json.dumps([dict(zip(colunas, linha)) for linha in atendimentos], ensure_ascii=False, indent=2))
+        return 0
+    print(titulo)
+    for atendimento_id, _cpf, nome, tipo_pedido, prioridade, status, data_limite, assessor in atendimentos:
+        print(f"  {atendimento_id:>8}  {prioridade:<8} {data_limite}  {nome[:30]:<30} {tipo_pedido[:20]:<20} {status:<13} {assessor or ''}")
+    return 0
+
+
+def comando_sincronizar(controller, args):
+    if args.servidor:
+        raise SystemExit("A sincronização por pacotes usa o banco local (--banco), não o servidor.")
+    if args.acao == "nova-estacao":
+        print(f"Nova identificação desta estação: {controller.redefinir_estacao()}")
+        return 0
+    if args.acao == "exportar":
+        if not args.arquivo:
+            raise SystemExit("Informe o arquivo do pacote.")
+        pacote = controller.exportar_pacote_sincronizacao(args.arquivo, args.para)
+        tipo = "completo" if pacote["completo"] else f"alterações {pacote['desde']}..{pacote['ate']}"
+        print(f"Pacote {tipo}: {pacote['linhas']['municipes']} munícipes, {pacote['linhas']['atendimentos']} atendimentos")
+        return 0
+    if args.acao == "importar":
+        if not args.arquivo:
+            raise SystemExit("Informe o arquivo do pacote.")
+        try:
+            resultado = controller.importar_pacote_sincronizacao(args.arquivo)
+        except ValueError as erro:
+            raise SystemExit(str(erro))
+        print(f"Pacote da estação {resultado['origem']}")
+        for tabela in ("municipes", "atendimentos"):
+            contagens = resultado[tabela]
+            print(f"  {tabela:<13} inseridos {contagens['inseridos']:>7}  atualizados {contagens['atualizados']:>7}  "
+                  f"ignorados {contagens['ignorados']:>7}")
+        return 0
+    for estacao, local, enviado_ate, recebido_ate, sincronizado_em in controller.consultar_estacoes_sincronizacao():
+        if local:
+            print(f"Esta estação: {estacao}")
+        else:
+            print(f"  {estacao}  enviado até {enviado_ate}  recebido até {recebido_ate}  última sincronização {sincronizado_em or '-'}")
+    return 0
+
+
+def comando_arquivar(controller, args):
+    if args.servidor:
+        raise SystemExit("O arquivamento usa o banco local (--banco), não o servidor.")
+    progresso = None if args.silencioso else (
+        lambda feitos, total: print(f"\rArquivando... {feitos}/{total}", end="", file=sys.stderr, flush=True)
+    )
+    try:
+        movidos = controller.arquivar_atendimentos(args.antes_de, ao_progresso=progresso)
+    except ValueError:
+        raise SystemExit("Informe a data de corte no formato AAAA-MM-DD.")
+    if progresso is not None and movidos:
+        print(file=sys.stderr)
+    print(f"{movidos} atendimento(s) movido(s) para o arquivo morto ({controller.model.caminho_arquivo_morto})")
+    return 0
+
+
+def comando_cpf(controller, args):
+    if args.acao == "duplicados":
+        duplicados = controller.consultar_cpfs_duplicados()
+        print(f"Cadastros repetidos unidos: {len(duplicados)}")
+        for cpf, cpf_mantido, nome, bairro, telefone, atendimentos, unido_em in duplicados:
+            print(f"  {cpf:<16} -> {cpf_mantido}  {nome[:30]:<30} {bairro[:20]:<20} {telefone:<15} "
+                  f"{atendimentos:>5} atendimento(s)  {unido_em}")
+    else:
+        invalidos = controller.consultar_cpfs_invalidos()
+        print(f"Munícipes com CPF inválido: {len(invalidos)}")
+        for cpf, nome, bairro, telefone in invalidos:
+            print(f"  {cpf:<16} {nome[:30]:<30} {bairro[:20]:<20} {telefone}")
+    return 0
+
+
+def comando_backup(controller, args):
+    if args.servidor:
+        raise SystemExit("O backup é feito na máquina do banco de dados (--banco), não pelo servidor.")
+    import backup_atendimento
+    if args.acao == "listar":
+        for caminho, data, tamanho in backup_atendimento.listar_backups(args.banco, args.pasta):
+            print(f"{data:%Y-%m-%d %H:%M:%S}  {tamanho / 1024 / 1024:9.1f} MB  {caminho}")
+        return 0
+    if args.acao == "restaurar":
+        if not args.arquivo:
+            raise SystemExit("Informe o arquivo do backup.")
+        try:
+            resultado = backup_atendimento.restaurar_backup(args.arquivo, args.banco, args.pasta)
+        except (ValueError, backup_atendimento.BackupEmAndamento) as erro:
+            raise SystemExit(str(erro))
+        print(f"Backup restaurado em {resultado['duracao_s']:.1f} s (esquema {resultado['versao_esquema']}); "
+              f"o banco anterior foi guardado em {resultado['anterior']}")
+        if resultado["anterior_danificado"]:
+            print("  o banco anterior estava danificado: a cópia guardada é a dos arquivos como estavam")
+        if resultado["arquivo_morto"]:
+            print(f"  arquivo morto restaurado de {resultado['arquivo_morto']}")
+        return 0
+    try:
+        if args.medir_latencia:
+            resumo, latencias = backup_atendimento.medir_impacto_backup(args.banco, args.pasta)
+        else:
+            resumo, latencias = backup_atendimento.fazer_backup(args.banco, args.pasta), None
+    except backup_atendimento.BackupEmAndamento as erro:
+        raise SystemExit(str(erro))
+    print(f"Backup {resumo['caminho']}: {resumo['paginas']} páginas, {resumo['tamanho'] / 1024 / 1024:.1f} MB, "
+          f"cópia em {resumo['duracao_s']:.1f} s ({resumo['passos']} passos), total {resumo['total_s']:.1f} s")
+    if resumo["arquivo_morto"]:
+        print(f"  arquivo morto: {resumo['arquivo_morto']}")
+    for caminho in resumo["compactados"]:
+        print(f"  compactado: {caminho}")
+    for caminho in resumo["removidos"]:
+        print(f"  removido: {caminho}")
+    for fase, medidas in (latencias or {}).items():
+        if medidas["consultas"]:
+            print(f"  consultas {fase.replace('_', ' ')}: {medidas['consultas']}, mediana {medidas['mediana_ms']:.2f} ms, "
+                  f"p95 {medidas['p95_ms']:.2f} ms, máximo {medidas['maximo_ms']:.2f} ms")
+    return 0
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Sistema de Atendimento ao Gabinete - linha de comando")
+    parser.add_argument("--banco", default=CAMINHO_BANCO, help="arquivo do banco de dados local")
+    parser.add_argument("--servidor", help="URL do servidor de atendimento (ex.: http://127.0.0.1:8765)")
+    parser.add_argument("--tempo", action="store_true", help="mostra o tempo de inicialização e de execução")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    relatorio = comandos.add_parser("relatorio", help="gera um relatório PDF")
+    relatorio.add_argument("tipo", choices=["cpf", "tipo", "bairro", "todos", "estatistico"])
+    relatorio.add_argument("valor", nargs="?", help="CPF, tipo de pedido ou bairro")
+    relatorio.add_argument("--saida", help="arquivo PDF gerado")
+    relatorio.add_argument("--de", help="mês inicial do relatório estatístico (AAAA-MM)")
+    relatorio.add_argument("--ate", help="mês final do relatório estatístico (AAAA-MM)")
+    relatorio.add_argument("--historico-completo", action="store_true", help="inclui o arquivo morto (relatório por cpf)")
+    relatorio.set_defaults(executar=comando_relatorio)
+
+    exportar = comandos.add_parser("exportar", help="exporta atendimentos para CSV, JSON Lines ou XLSX")
+    exportar.add_argument("relatorio", nargs="?", default="atendimentos", choices=["atendimentos", "bairro", "tipo"])
+    exportar.add_argument("--valor", help="bairro ou tipo de pedido")
+    exportar.add_argument("--saida", required=True)
+    exportar.add_argument("--formato", choices=sorted(ESCRITORES_EXPORTACAO), help="padrão: extensão do arquivo")
+    exportar.add_argument("--silencioso", action="store_true", help="não mostra o progresso")
+    exportar.add_argument("--filtro-nome")
+    exportar.add_argument("--filtro-cpf")
+    exportar.add_argument("--filtro-texto")
+    exportar.add_argument("--historico-completo", action="store_true", help="inclui os atendimentos do arquivo morto")
+    exportar.set_defaults(executar=comando_exportar)
+
+    importar = comandos.add_parser("importar", help="importa munícipes ou atendimentos de um CSV")
+    importar.add_argument("tipo", choices=["municipes", "atendimentos"])
+    importar.add_argument("arquivo")
+    importar.add_argument("--max-rejeitados", type=int, default=20, help="linhas rejeitadas exibidas")
+    importar.set_defaults(executar=comando_importar)
+
+    estatisticas = comandos.add_parser("estatisticas", help="mostra os indicadores e o resumo dos atendimentos")
+    estatisticas.add_argument("--verificar", action="store_true", help="confere o resumo com uma contagem completa")
+    estatisticas.add_argument("--json", action="store_true")
+    estatisticas.add_argument("--agrupar", help="dimensões separadas por vírgula: " + ", ".join(DIMENSOES_AGREGACAO))
+    estatisticas.add_argument("--metricas", default="total", help="métricas separadas por vírgula: " + ", ".join(METRICAS_AGREGACAO))
+    estatisticas.add_argument("--de", help="mês inicial (AAAA-MM)")
+    estatisticas.add_argument("--ate", help="mês final (AAAA-MM)")
+    estatisticas.set_defaults(executar=comando_estatisticas)
+
+    prazos = comandos.add_parser("prazos", help="lista os atendimentos atrasados, os mais urgentes primeiro")
+    prazos.add_argument("--proximos", type=int, metavar="DIAS", help="lista os que vencem nos próximos dias")
+    prazos.add_argument("--limite", type=int, default=50)
+    prazos.add_argument("--json", action="store_true")
+    prazos.set_defaults(executar=comando_prazos)
+
+    sincronizar = comandos.add_parser("sincronizar", help="troca pacotes de alterações com outra estação (sem rede)")
+    sincronizar.add_argument("acao", choices=["estacoes", "exportar", "importar", "nova-estacao"])
+    sincronizar.add_argument("arquivo", nargs="?", help="arquivo do pacote (.jsonl.gz)")
+    sincronizar.add_argument("--para", help="estação de destino do pacote; sem ela o pacote é completo")
+    sincronizar.set_defaults(executar=comando_sincronizar)
+
+    arquivar = comandos.add_parser("arquivar", help="move os atendimentos concluídos antigos para o arquivo morto")
+    arquivar.add_argument("--antes-de", required=True, metavar="AAAA-MM-DD", help="data de corte da conclusão")
+    arquivar.add_argument("--silencioso", action="store_true", help="não mostra o progresso")
+    arquivar.set_defaults(executar=comando_arquivar)
+
+    cpf = comandos.add_parser("cpf", help="confere os CPFs: cadastros repetidos unidos e CPFs inválidos")
+    cpf.add_argument("acao", choices=["duplicados", "invalidos"])
+    cpf.set_defaults(executar=comando_cpf)
+
+    backup = comandos.add_parser("backup", help="cópia do banco em uso, rodízio das cópias e restauração conferida")
+    backup.add_argument("acao", choices=["fazer", "listar", "restaurar"])
+    backup.add_argument("arquivo", nargs="?", help="backup a restaurar (.db ou .db.gz)")
+    backup.add_argument("--pasta", help="pasta dos backups (padrão: <banco>_backups, ao lado do banco)")
+    backup.add_argument("--medir-latencia", action="store_true",
+                        help="mede as consultas antes e durante o backup (5 s de referência)")
+    # O backup trabalha direto nos arquivos: abrir o banco (e aplicar as migrações) antes impediria
+    # restaurar sobre um banco danificado
+    backup.set_defaults(executar=comando_backup, sem_controller=True)
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    controller = None if getattr(args, "sem_controller", False) else _abrir_controller(args)
+    inicializacao = time.perf_counter() - INICIO_PROCESSO
+    if inicializacao * 1000 > ORCAMENTO_INICIALIZACAO_MS:
+        registro.warning("Inicialização em %.0f ms (orçamento: %d ms)", inicializacao * 1000, ORCAMENTO_INICIALIZACAO_MS)
+    try:
+        codigo = args.executar(controller, args)
+    except _erros_servidor(args) as erro:
+        raise SystemExit(str(erro))
+    finally:
+        if controller is not None and controller.model is not None:
+            controller.model.fechar_conexao()
+    if args.tempo:
+        print(f"Inicialização: {inicializacao * 1000:.0f} ms (orçamento: {ORCAMENTO_INICIALIZACAO_MS} ms); "
+              f"total: {(time.perf_counter() - INICIO_PROCESSO) * 1000:.0f} ms", file=sys.stderr)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
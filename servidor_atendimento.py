@@ -0,0 +1,274 @@
+# Servidor do Sistema de Atendimento - permite que várias estações usem o mesmo banco
+# As leituras rodam em um pool de threads (uma conexão por thread) e as gravações em uma
+# única thread, em série, evitando os erros de "database is locked" entre as estações
+#
+# Uso:  python servidor_atendimento.py --banco atendimentos.db --porta 8765
+# O servidor também faz o backup do banco em segundo plano (--backup-horas 0 desliga)
+# Na estação: python "Sistema de Atendimento.py" --servidor http://127.0.0.1:8765
+import argparse
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from atendimento_core import (AtendimentoController, AtendimentoModel, CacheAgregacoes, CacheMunicipes, CAMINHO_BANCO,
+                              CABECALHO_ATENDIMENTOS, CABECALHO_RELATORIO_RESUMIDO, TAMANHO_LOTE_EXPORTACAO,
+                              instrumentar_metodos)
+
+# Operações do AtendimentoController disponíveis pela API
+METODOS_LEITURA = {
+    "buscar_municipes", "buscar_municipe_por_cpf", "consultar_municipes",
+    "consultar_atendimentos", "consultar_atendimentos_pagina", "consultar_todos_atendimentos",
+    "buscar_atendimento_por_id", "buscar_atendimentos_por_ids",
+    "gerar_relatorio_municipe", "gerar_relatorio_tipo_pedido", "gerar_relatorio_bairro",
+    "consultar_resumo", "indicadores_dashboard", "versao_alteracoes", "consultar_alteracoes",
+    "estatisticas_cache_municipes", "obter_diagnostico", "zerar_diagnostico", "contar_atendimentos",
+    "agregar_atendimentos", "resumo_estatistico", "estatisticas_cache_agregacoes",
+    "consultar_atrasados", "consultar_proximos_prazos", "contar_atrasados", "consultar_coluna_quadro",
+    "consultar_anexos", "consultar_cpfs_duplicados", "consultar_cpfs_invalidos",
+}
+METODOS_ESCRITA = {
+    "registrar_municipe", "atualizar_municipe", "registrar_atendimento", "atualizar_atendimento",
+    "registrar_municipe_com_atendimento", "verificar_resumo", "limpar_alteracoes", "mover_atendimento",
+    "remover_anexo", "importar_municipes_csv_texto", "importar_atendimentos_csv_texto",
+}
+
+PORTA_PADRAO = 8765
+
+
+class ErroServidor(Exception):
+    pass
+
+
+# Servidor HTTP/JSON - POST /api/<operação> com {"args": [...], "kwargs": {...}}
+class ServidorAtendimento(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, caminho_banco=CAMINHO_BANCO, num_leitores=4):
+        super().__init__(endereco, ManipuladorRequisicoes)
+        self.caminho_banco = caminho_banco
+        self._locais = threading.local()
+        self._cache_municipes = CacheMunicipes()  # compartilhado pelas threads de leitura e de gravação
+        self._cache_agregacoes = CacheAgregacoes()
+        self._leitores = ThreadPoolExecutor(max_workers=num_leitores, initializer=self._iniciar_thread, thread_name_prefix="leitor")
+        self._escritor = ThreadPoolExecutor(max_workers=1, initializer=self._iniciar_thread, thread_name_prefix="escritor")
+
+    def _iniciar_thread(self):
+        self._locais.controller = AtendimentoController(
+            AtendimentoModel(self.caminho_banco), self._cache_municipes, self._cache_agregacoes
+        )
+
+    def _executar_na_thread(self, metodo, args, kwargs):
+        return getattr(self._locais.controller, metodo)(*args, **kwargs)
+
+    def executar(self, metodo, args, kwargs):
+        # Gravações passam todas pela mesma thread; leituras são atendidas em paralelo
+        pool = self._escritor if metodo in METODOS_ESCRITA else self._leitores
+        return pool.submit(self._executar_na_thread, metodo, args, kwargs).result()
+
+    def server_close(self):
+        super().server_close()
+        self._leitores.shutdown(wait=True)
+        self._escritor.shutdown(wait=True)
+
+
+class ManipuladorRequisicoes(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/saude":
+            self._responder(200, {"resultado": "ok"})
+        else:
+            self._responder(404, {"erro": "Recurso não encontrado."})
+
+    def do_POST(self):
+        metodo = self.path.strip("/").removeprefix("api/")
+        if metodo not in METODOS_LEITURA and metodo not in METODOS_ESCRITA:
+            self._responder(404, {"erro": f"Operação desconhecida: {metodo}"})
+            return
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+            resultado = self.server.executar(metodo, corpo.get("args", []), corpo.get("kwargs", {}))
+        except (ValueError, TypeError) as erro:
+            self._responder(400, {"erro": str(erro)})
+            return
+        except Exception as erro:
+            self._responder(500, {"erro": str(erro)})
+            return
+        self._responder(200, {"resultado": resultado})
+
+    def _responder(self, status, conteudo):
+        dados = json.dumps(conteudo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+def _metodo_remoto(nome):
+    def chamar(self, *args, **kwargs):
+        return self._chamar(nome, *args, **kwargs)
+    chamar.__name__ = nome
+    return chamar
+
+
+# Cliente - mesmo uso do AtendimentoController, mas as operações com o banco vão para o servidor
+# A geração de PDF continua local (herdada do AtendimentoController)
+# Os tempos medidos aqui incluem a ida e volta pela rede
+@instrumentar_metodos
+class ControllerRemoto(AtendimentoController):
+    def __init__(self, url, timeout=30):
+        super().__init__(model=None)
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _chamar(self, metodo, *args, **kwargs):
+        # default=list converte tuplas de cursor, range e set em listas JSON
+        dados = json.dumps({"args": args, "kwargs": kwargs}, default=list).encode("utf-8")
+        requisicao = urllib.request.Request(
+            f"{self.url}/api/{metodo}", data=dados, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(requisicao, timeout=self.timeout) as resposta:
+                return json.loads(resposta.read())["resultado"]
+        except urllib.error.HTTPError as erro:
+            try:
+                mensagem = json.loads(erro.read()).get("erro", str(erro))
+            except ValueError:
+                mensagem = str(erro)
+            raise ErroServidor(mensagem) from None
+        except urllib.error.URLError as erro:
+            raise ErroServidor(f"Servidor indisponível em {self.url}: {erro.reason}") from None
+
+    def transacao(self):
+        raise ErroServidor("Transações não podem ser abertas pela rede; use as operações compostas do servidor.")
+
+    # Os arquivos anexados ficam no armazém da máquina do banco; pela rede só se consulta e remove a referência
+    def _anexos_indisponiveis(self, *args, **kwargs):
+        raise ErroServidor("Os arquivos anexados só podem ser gravados e abertos na máquina do banco de dados.")
+
+    anexar_arquivo = copiar_anexo = miniatura_anexo = previa_anexo = _anexos_indisponiveis
+
+    def arquivar_atendimentos(self, *args, **kwargs):
+        raise ErroServidor("O arquivamento roda na máquina do banco de dados (cli_atendimento.py arquivar).")
+
+    # A sincronização por pacotes é entre bancos locais; uma estação ligada ao servidor já usa o banco central
+    def _sincronizacao_indisponivel(self, *args, **kwargs):
+        raise ErroServidor("A sincronização por pacotes não se aplica a uma estação ligada ao servidor.")
+
+    exportar_pacote_sincronizacao = importar_pacote_sincronizacao = _sincronizacao_indisponivel
+    consultar_estacoes_sincronizacao = redefinir_estacao = _sincronizacao_indisponivel
+
+    # Importação: a planilha está nesta máquina, então vai o conteúdo do arquivo, e não o caminho
+    @staticmethod
+    def _ler_planilha(caminho_csv):
+        with open(caminho_csv, newline="", encoding="utf-8-sig") as arquivo:
+            return arquivo.read()
+
+    def importar_municipes_csv(self, caminho_csv):
+        return self._chamar("importar_municipes_csv_texto", self._ler_planilha(caminho_csv))
+
+    def importar_atendimentos_csv(self, caminho_csv):
+        return self._chamar("importar_atendimentos_csv_texto", self._ler_planilha(caminho_csv))
+
+    # Exportações: o arquivo é gravado nesta máquina; os atendimentos vêm do servidor página a página
+    def _paginas_atendimentos(self, filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo=False):
+        cursor = None
+        while True:
+            linhas, cursor = self.consultar_atendimentos_pagina(filtro_nome, filtro_cpf, filtro_texto, cursor,
+                                                                TAMANHO_LOTE_EXPORTACAO, incluir_arquivo=incluir_arquivo)
+            if linhas:
+                yield linhas
+            if cursor is None:
+                break
+
+    @staticmethod
+    def _em_lotes(linhas):
+        for inicio in range(0, len(linhas), TAMANHO_LOTE_EXPORTACAO):
+            yield linhas[inicio:inicio + TAMANHO_LOTE_EXPORTACAO]
+
+    def exportar_atendimentos(self, caminho, formato=None, filtro_nome=None, filtro_cpf=None, filtro_texto=None,
+                              ao_progresso=None, cancelamento=None, incluir_arquivo=False):
+        total = self.contar_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo)
+        lotes = self._paginas_atendimentos(filtro_nome, filtro_cpf, filtro_texto, incluir_arquivo)
+        return self._exportar(lotes, total, CABECALHO_ATENDIMENTOS, caminho, formato, ao_progresso, cancelamento)
+
+    def exportar_relatorio_tipo_pedido(self, tipo_pedido, caminho, formato=None, ao_progresso=None, cancelamento=None):
+        linhas = self.gerar_relatorio_tipo_pedido(tipo_pedido)
+        return self._exportar(self._em_lotes(linhas), len(linhas), CABECALHO_RELATORIO_RESUMIDO, caminho, formato,
+                              ao_progresso, cancelamento)
+
+    def exportar_relatorio_bairro(self, bairro, caminho, formato=None, ao_progresso=None, cancelamento=None):
+        linhas = self.gerar_relatorio_bairro(bairro)
+        return self._exportar(self._em_lotes(linhas), len(linhas), CABECALHO_RELATORIO_RESUMIDO, caminho, formato,
+                              ao_progresso, cancelamento)
+
+    buscar_municipes = _metodo_remoto("buscar_municipes")
+    buscar_municipe_por_cpf = _metodo_remoto("buscar_municipe_por_cpf")
+    consultar_municipes = _metodo_remoto("consultar_municipes")
+    consultar_atendimentos = _metodo_remoto("consultar_atendimentos")
+    consultar_atendimentos_pagina = _metodo_remoto("consultar_atendimentos_pagina")
+    consultar_todos_atendimentos = _metodo_remoto("consultar_todos_atendimentos")
+    buscar_atendimento_por_id = _metodo_remoto("buscar_atendimento_por_id")
+    buscar_atendimentos_por_ids = _metodo_remoto("buscar_atendimentos_por_ids")
+    gerar_relatorio_municipe = _metodo_remoto("gerar_relatorio_municipe")
+    gerar_relatorio_tipo_pedido = _metodo_remoto("gerar_relatorio_tipo_pedido")
+    gerar_relatorio_bairro = _metodo_remoto("gerar_relatorio_bairro")
+    consultar_resumo = _metodo_remoto("consultar_resumo")
+    indicadores_dashboard = _metodo_remoto("indicadores_dashboard")
+    verificar_resumo = _metodo_remoto("verificar_resumo")
+    versao_alteracoes = _metodo_remoto("versao_alteracoes")
+    consultar_alteracoes = _metodo_remoto("consultar_alteracoes")
+    limpar_alteracoes = _metodo_remoto("limpar_alteracoes")
+    estatisticas_cache_municipes = _metodo_remoto("estatisticas_cache_municipes")
+    estatisticas_cache_agregacoes = _metodo_remoto("estatisticas_cache_agregacoes")
+    agregar_atendimentos = _metodo_remoto("agregar_atendimentos")
+    resumo_estatistico = _metodo_remoto("resumo_estatistico")
+    consultar_atrasados = _metodo_remoto("consultar_atrasados")
+    consultar_proximos_prazos = _metodo_remoto("consultar_proximos_prazos")
+    contar_atrasados = _metodo_remoto("contar_atrasados")
+    consultar_coluna_quadro = _metodo_remoto("consultar_coluna_quadro")
+    mover_atendimento = _metodo_remoto("mover_atendimento")
+    consultar_anexos = _metodo_remoto("consultar_anexos")
+    consultar_cpfs_duplicados = _metodo_remoto("consultar_cpfs_duplicados")
+    consultar_cpfs_invalidos = _metodo_remoto("consultar_cpfs_invalidos")
+    remover_anexo = _metodo_remoto("remover_anexo")
+    obter_diagnostico = _metodo_remoto("obter_diagnostico")
+    zerar_diagnostico = _metodo_remoto("zerar_diagnostico")
+    contar_atendimentos = _metodo_remoto("contar_atendimentos")
+    registrar_municipe = _metodo_remoto("registrar_municipe")
+    atualizar_municipe = _metodo_remoto("atualizar_municipe")
+    registrar_atendimento = _metodo_remoto("registrar_atendimento")
+    atualizar_atendimento = _metodo_remoto("atualizar_atendimento")
+    registrar_municipe_com_atendimento = _metodo_remoto("registrar_municipe_com_atendimento")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor do Sistema de Atendimento ao Gabinete")
+    parser.add_argument("--banco", default=CAMINHO_BANCO, help="arquivo do banco de dados")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço de escuta (padrão: apenas esta máquina)")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--leitores", type=int, default=4, help="conexões de leitura simultâneas")
+    parser.add_argument("--backup-horas", type=float, default=24, help="intervalo entre os backups (0 desliga)")
+    args = parser.parse_args()
+
+    servidor = ServidorAtendimento((args.host, args.porta), args.banco, args.leitores)
+    agendador = None
+    if args.backup_horas > 0:
+        from backup_atendimento import AgendadorBackup
+        agendador = AgendadorBackup(args.banco, args.backup_horas * 3600).iniciar()
+    print(f"Servidor de atendimento em http://{args.host}:{args.porta} (banco: {args.banco})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if agendador is not None:
+            agendador.parar()
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Funções comuns aos testes: CPFs válidos e bancos temporários
+import contextlib
+import io
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atendimento_core import AtendimentoModel
+
+
+def cpf_valido(numero):
+    # Acrescenta os dígitos verificadores aos 9 primeiros dígitos
+    digitos = [int(digito) for digito in f"{numero:09d}"]
+    for posicao in (9, 10):
+        soma = sum(digito * peso for digito, peso in zip(digitos, range(posicao + 1, 1, -1)))
+        digitos.append(soma * 10 % 11 % 10)
+    return "".join(map(str, digitos))
+
+
+def abrir_model(caminho_banco, **kwargs):
+    # Abre (ou cria) o banco sem as mensagens das migrações na saída dos testes
+    with contextlib.redirect_stdout(io.StringIO()):
+        return AtendimentoModel(caminho_banco, **kwargs)
+
+
+def registrar_municipes(model, quantidade, inicio=1):
+    # Cadastra munícipes numerados; retorna os CPFs na ordem do cadastro
+    cpfs = []
+    with model.transacao():
+        for numero in range(inicio, inicio + quantidade):
+            cpf = cpf_valido(numero * 101)
+            model.registrar_municipe(cpf, f"Pessoa {numero} Silva", "Rua das Flores", f"Bairro {numero % 9}",
+                                     "11999990000", "", "", "", "")
+            cpfs.append(cpf)
+    return cpfs
+
+
+def registrar_atendimentos(model, cpfs, status="Pendente", data_horario="2025-01-10 10:00:00", tipo_pedido="Iluminação"):
+    # Um atendimento para cada CPF; retorna os ids
+    ids = []
+    with model.transacao():
+        for cpf in cpfs:
+            ids.append(model.registrar_atendimento(cpf, tipo_pedido, f"poste apagado na rua de {cpf}", "", data_horario,
+                                                   "10", "Assessor", "Normal", status))
+    return ids
+
+
+@contextlib.contextmanager
+def servidor_local(caminho_banco):
+    # Servidor de atendimento em uma porta livre desta máquina; entrega a URL
+    from servidor_atendimento import ServidorAtendimento
+    servidor = ServidorAtendimento(("127.0.0.1", 0), caminho_banco, num_leitores=1)
+    thread = threading.Thread(target=servidor.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        thread.join()
+
+
+def escrever_csv(caminho, cabecalho, linhas):
+    # Planilha separada por ponto e vírgula, como as exportadas pelo Excel em português
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as arquivo:
+        arquivo.write(";".join(cabecalho) + "\n")
+        for linha in linhas:
+            arquivo.write(";".join(linha) + "\n")
+    return caminho
@@ -0,0 +1,106 @@
+# Registro de alterações dos atendimentos: versão crescente a cada gravação e busca do que mudou desde uma versão
+import os
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, registrar_atendimentos, registrar_municipes
+
+from atendimento_core import STATUS_CONCLUIDO
+
+
+class TestRegistroAlteracoes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.model = abrir_model(os.path.join(self.pasta.name, "atendimentos.db"))
+        self.cpfs = registrar_municipes(self.model, 6)
+        self.ids = registrar_atendimentos(self.model, self.cpfs)
+
+    def tearDown(self):
+        self.model.fechar_conexao()
+        self.pasta.cleanup()
+
+    def alterados(self, desde, **filtros):
+        versao, ids, linhas = self.model.consultar_alteracoes(desde, **filtros)
+        return versao, sorted(ids), sorted(linha[0] for linha in linhas)
+
+    def atualizar(self, atendimento_id, status, descricao="verificado"):
+        self.model.atualizar_atendimento(atendimento_id, self.cpfs[self.ids.index(atendimento_id)], "Iluminação", descricao,
+                                         status, "10", "Assessor", "Normal")
+
+    def test_cada_gravacao_muda_a_versao(self):
+        versao = self.model.versao_alteracoes()
+        self.assertEqual(versao, len(self.ids))
+        self.assertEqual(self.alterados(versao), (versao, [], []))
+
+        novo = registrar_atendimentos(self.model, self.cpfs[:1])[0]
+        self.atualizar(self.ids[1], "Em Andamento")
+        self.assertTrue(self.model.mover_atendimento(self.ids[2], STATUS_CONCLUIDO))
+        self.assertEqual(self.alterados(versao), (versao + 3, sorted([novo, self.ids[1], self.ids[2]]),
+                                                  sorted([novo, self.ids[1], self.ids[2]])))
+        # Um movimento recusado (outra estação já mudou o status) não grava nada
+        self.assertFalse(self.model.mover_atendimento(self.ids[2], "Pendente", status_atual="Pendente"))
+        self.assertEqual(self.model.versao_alteracoes(), versao + 3)
+
+    def test_municipe_entra_pelo_nome_e_pelo_bairro(self):
+        # Nome e bairro aparecem nas listas e nas estatísticas: mudam a versão de todos os atendimentos do munícipe
+        cpf = self.cpfs[3]
+        outro = registrar_atendimentos(self.model, [cpf])[0]
+        versao = self.model.versao_alteracoes()
+        self.model.atualizar_municipe(cpf, "Pessoa 4 Silva", "Outra Rua", "Bairro 4", "11911112222", "", "", "", "")
+        self.assertEqual(self.model.versao_alteracoes(), versao)
+        self.model.atualizar_municipe(cpf, "Pessoa 4 Souza", "Outra Rua", "Bairro 4", "11911112222", "", "", "", "")
+        self.assertEqual(self.alterados(versao)[1], sorted([self.ids[3], outro]))
+        versao = self.model.versao_alteracoes()
+        self.model.atualizar_municipe(cpf, "Pessoa 4 Souza", "Outra Rua", "Centro", "11911112222", "", "", "", "")
+        self.assertEqual(self.alterados(versao)[1], sorted([self.ids[3], outro]))
+
+    def test_filtros_e_excluidos(self):
+        versao = self.model.versao_alteracoes()
+        self.atualizar(self.ids[0], "Em Andamento")
+        self.atualizar(self.ids[4], "Em Andamento")
+        # O id que não atende ao filtro vem sem linha: a tela o retira da lista
+        self.assertEqual(self.alterados(versao, filtro_cpf=self.cpfs[4]), (versao + 2, sorted([self.ids[0], self.ids[4]]), [self.ids[4]]))
+
+        # Um atendimento que foi para o arquivo morto sai do banco principal, mas continua no histórico completo
+        versao = self.model.versao_alteracoes()
+        antigo = registrar_atendimentos(self.model, self.cpfs[:1], status=STATUS_CONCLUIDO, data_horario="2020-01-10 10:00:00")[0]
+        self.model.arquivar_atendimentos("2021-01-01", pausa=0)
+        self.assertEqual(self.alterados(versao), (self.model.versao_alteracoes(), [antigo], []))
+        self.assertEqual(self.alterados(versao, incluir_arquivo=True)[2], [antigo])
+
+    def test_limpeza_mantem_a_versao(self):
+        for rodada in range(3):
+            self.atualizar(self.ids[0], "Em Andamento", f"rodada {rodada}")
+        versao = self.model.versao_alteracoes()
+        self.assertEqual(self.model.limpar_alteracoes(manter=2), versao - 2)
+        # A versão não volta nem é reutilizada depois da limpeza
+        self.assertEqual(self.model.versao_alteracoes(), versao)
+        self.assertIsNone(self.model.consultar_alteracoes(0))  # a tela precisa recarregar tudo
+        self.assertEqual(self.alterados(versao - 1)[1], [self.ids[0]])
+        self.atualizar(self.ids[5], "Em Andamento")
+        self.assertEqual(self.alterados(versao), (versao + 1, [self.ids[5]], [self.ids[5]]))
+        # Com o registro vazio a versão também se mantém
+        self.model.limpar_alteracoes(manter=0)
+        self.model.cursor.execute("SELECT COUNT(*) FROM alteracoes_atendimentos")
+        self.assertEqual(self.model.cursor.fetchone()[0], 0)
+        self.assertEqual(self.model.versao_alteracoes(), versao + 1)
+
+    def test_alteracoes_demais(self):
+        versao = self.model.versao_alteracoes()
+        for atendimento_id in self.ids:
+            self.atualizar(atendimento_id, "Em Andamento")
+        self.assertIsNone(self.model.consultar_alteracoes(versao, limite=len(self.ids) - 1))
+        self.assertEqual(len(self.model.consultar_alteracoes(versao, limite=len(self.ids))[1]), len(self.ids))
+
+    def test_transacao_desfeita_nao_muda_a_versao(self):
+        versao = self.model.versao_alteracoes()
+        with self.assertRaises(RuntimeError):
+            with self.model.transacao():
+                registrar_atendimentos(self.model, self.cpfs)
+                raise RuntimeError("cancelado")
+        self.assertEqual(self.model.versao_alteracoes(), versao)
+        self.assertEqual(registrar_atendimentos(self.model, self.cpfs[:1]), [self.ids[-1] + 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# Arquivo morto: atendimentos concluídos antigos vão para o banco anexado e continuam no histórico completo
+import os
+import tempfile
+import threading
+import unittest
+
+from auxiliares import abrir_model, registrar_atendimentos, registrar_municipes
+
+from atendimento_core import AtendimentoController, STATUS_CONCLUIDO
+
+
+class TestArquivoMorto(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.model = abrir_model(os.path.join(self.pasta.name, "atendimentos.db"))
+        self.cpfs = registrar_municipes(self.model, 40)
+        # Concluídos antes do corte (vão para o arquivo), concluídos depois e um pendente antigo (ficam)
+        self.antigos = registrar_atendimentos(self.model, self.cpfs[:30], status=STATUS_CONCLUIDO,
+                                              data_horario="2020-03-10 10:00:00", tipo_pedido="Poda de árvore")
+        self.recentes = registrar_atendimentos(self.model, self.cpfs[10:], status=STATUS_CONCLUIDO,
+                                               data_horario="2022-03-10 10:00:00")
+        self.abertos = registrar_atendimentos(self.model, self.cpfs[:5], data_horario="2019-01-10 10:00:00")
+        self.todos = self.model.consultar_atendimentos()
+        self.movidos = self.model.arquivar_atendimentos("2021-01-01", tamanho_lote=7, pausa=0)
+
+    def tearDown(self):
+        self.model.fechar_conexao()
+        self.pasta.cleanup()
+
+    def ids(self, linhas):
+        return [linha[0] for linha in linhas]
+
+    def test_move_os_concluidos_antes_do_corte(self):
+        self.assertEqual(self.movidos, len(self.antigos))
+        self.model.cursor.execute("SELECT id FROM atendimentos ORDER BY id")
+        self.assertEqual([linha[0] for linha in self.model.cursor.fetchall()], sorted(self.recentes + self.abertos))
+        # Mesmos ids e colunas no arquivo morto; a coluna gerada data_limite é recalculada lá
+        self.model.cursor.execute("SELECT id, status, data_conclusao, data_limite FROM arquivo.atendimentos ORDER BY id")
+        arquivados = self.model.cursor.fetchall()
+        self.assertEqual([linha[0] for linha in arquivados], self.antigos)
+        self.assertEqual(set(linha[1:] for linha in arquivados),
+                         {(STATUS_CONCLUIDO, "2020-03-10 10:00:00", "2020-03-20 10:00:00")})
+        # Nada fica para trás nas tabelas de apoio do arquivo morto
+        for tabela in ("arquivamento_lote", "arquivo.alteracoes_atendimentos", "arquivo.registro_sincronizacao"):
+            self.model.cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
+            self.assertEqual(self.model.cursor.fetchone()[0], 0, tabela)
+
+    def test_segunda_execucao_e_cancelamento(self):
+        self.assertEqual(self.model.arquivar_atendimentos("2021-01-01", pausa=0), 0)
+        cancelamento = threading.Event()
+        cancelamento.set()
+        self.assertEqual(self.model.arquivar_atendimentos("2030-01-01", pausa=0, cancelamento=cancelamento), 0)
+        self.assertEqual(self.model.contar_atendimentos(), len(self.recentes) + len(self.abertos))
+        with self.assertRaises(ValueError):
+            self.model.arquivar_atendimentos("01/01/2021")
+
+    def test_historico_completo(self):
+        # Sem o arquivo morto só os atendimentos do banco principal; com ele, o mesmo histórico de antes
+        self.assertEqual(self.ids(self.model.consultar_atendimentos()), self.ids(
+            [linha for linha in self.todos if linha[0] not in self.antigos]
+        ))
+        self.assertEqual(self.model.consultar_atendimentos(incluir_arquivo=True), self.todos)
+        # A paginação por chave percorre os dois bancos na mesma ordem
+        paginas, cursor = [], None
+        while True:
+            pagina, cursor = self.model.consultar_atendimentos_pagina(cursor=cursor, tamanho=9, incluir_arquivo=True)
+            paginas.extend(pagina)
+            if cursor is None:
+                break
+        self.assertEqual(paginas, self.todos)
+        exportados = [linha for lote in self.model.iterar_atendimentos(tamanho_lote=11, incluir_arquivo=True) for linha in lote]
+        self.assertEqual(exportados, self.todos)
+
+    def test_filtros_no_historico_completo(self):
+        cpf = self.cpfs[12]
+        controller = AtendimentoController(self.model)
+        relatorio = controller.gerar_relatorio_municipe(cpf, incluir_arquivo=True)
+        self.assertEqual(sorted(self.ids(relatorio)), sorted(self.ids(
+            [linha for linha in self.todos if linha[1] == cpf]
+        )))
+        self.assertEqual(len(controller.gerar_relatorio_municipe(cpf)), 1)
+        self.assertEqual(len(self.model.consultar_atendimentos(filtro_nome="Pessoa 13", incluir_arquivo=True)), 2)
+
+    def test_busca_textual(self):
+        # O índice textual do principal perde os arquivados; o do arquivo morto os recebe
+        self.assertEqual(self.model.consultar_atendimentos(filtro_texto="poda"), [])
+        encontrados = self.model.consultar_atendimentos(filtro_texto="poda", incluir_arquivo=True)
+        self.assertEqual(sorted(self.ids(encontrados)), self.antigos)
+        for esquema in ("main", "arquivo"):
+            self.model.cursor.execute(f"INSERT INTO {esquema}.atendimentos_fts (atendimentos_fts) VALUES ('integrity-check')")
+
+    def test_contadores(self):
+        self.assertEqual(self.model.contar_atendimentos(), len(self.recentes) + len(self.abertos))
+        self.assertEqual(self.model.contar_atendimentos(incluir_arquivo=True), len(self.todos))
+        self.assertEqual(self.model.contar_atendimentos(filtro_texto="poda", incluir_arquivo=True), len(self.antigos))
+        # O resumo de cada banco acompanha as linhas que ficaram nele
+        self.assertEqual(self.model.verificar_resumo(corrigir=False), [])
+        resumo = self.model.consultar_resumo()
+        self.assertEqual(resumo["status"], {STATUS_CONCLUIDO: len(self.recentes), "Pendente": len(self.abertos)})
+        self.model.cursor.execute("SELECT total FROM arquivo.resumo_atendimentos WHERE dimensao = 'total'")
+        self.assertEqual(self.model.cursor.fetchone()[0], len(self.antigos))
+        indicadores = AtendimentoController(self.model).indicadores_dashboard()
+        self.assertEqual((indicadores["abertos"], indicadores["pendentes"]), (len(self.abertos), len(self.abertos)))
+
+    def test_arquivo_reaberto(self):
+        # Um model aberto depois (outra estação) anexa o arquivo morto existente
+        outro = abrir_model(self.model.caminho_banco)
+        self.addCleanup(outro.fechar_conexao)
+        self.assertTrue(outro.arquivo_anexado)
+        self.assertEqual(outro.consultar_atendimentos(incluir_arquivo=True), self.todos)
+
+
+if __name__ == "__main__":
+    unittest.main()
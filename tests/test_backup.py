@@ -0,0 +1,125 @@
+# Backup e restauração do banco, com o arquivo morto, inclusive sobre um banco danificado
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, registrar_atendimentos, registrar_municipes
+
+import backup_atendimento
+import cli_atendimento
+from atendimento_core import STATUS_CONCLUIDO, caminho_arquivo_morto
+
+
+def corromper_pagina(caminho_banco):
+    # Sobrescreve uma página do meio do arquivo (dados das tabelas), depois de levar o -wal para o banco
+    conexao = sqlite3.connect(caminho_banco)
+    conexao.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    tamanho_pagina = conexao.execute("PRAGMA page_size").fetchone()[0]
+    paginas = conexao.execute("PRAGMA page_count").fetchone()[0]
+    conexao.close()
+    with open(caminho_banco, "r+b") as arquivo:
+        arquivo.seek(tamanho_pagina * (paginas // 2))
+        arquivo.write(b"\xff" * tamanho_pagina)
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho_banco = os.path.join(self.pasta.name, "atendimentos.db")
+        model = abrir_model(self.caminho_banco)
+        self.cpfs = registrar_municipes(model, 200)
+        registrar_atendimentos(model, self.cpfs * 5)
+        registrar_atendimentos(model, self.cpfs[:20], status=STATUS_CONCLUIDO, data_horario="2020-01-10 10:00:00")
+        model.arquivar_atendimentos("2021-01-01", pausa=0)
+        model.fechar_conexao()
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def contar(self):
+        model = abrir_model(self.caminho_banco)
+        try:
+            model.cursor.execute("SELECT (SELECT COUNT(*) FROM municipes), (SELECT COUNT(*) FROM atendimentos), "
+                                 "(SELECT COUNT(*) FROM arquivo.atendimentos)")
+            return model.cursor.fetchone()
+        finally:
+            model.fechar_conexao()
+
+    def fazer_backup(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return backup_atendimento.fazer_backup(self.caminho_banco)
+
+    def restaurar(self, caminho):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return backup_atendimento.restaurar_backup(caminho, self.caminho_banco)
+
+    def test_restauracao_do_par(self):
+        resumo = self.fazer_backup()
+        self.assertIsNotNone(resumo["arquivo_morto"])
+        antes = self.contar()
+        model = abrir_model(self.caminho_banco)
+        registrar_atendimentos(model, self.cpfs[:3])
+        registrar_atendimentos(model, self.cpfs[:2], status=STATUS_CONCLUIDO, data_horario="2020-02-10 10:00:00")
+        model.arquivar_atendimentos("2021-01-01", pausa=0)
+        model.fechar_conexao()
+        self.assertNotEqual(self.contar(), antes)
+
+        resultado = self.restaurar(resumo["caminho"])
+        self.assertEqual(self.contar(), antes)
+        self.assertEqual(resultado["arquivo_morto"], resumo["arquivo_morto"])
+        self.assertFalse(resultado["anterior_danificado"])
+        # A cópia de segurança feita antes da troca não sobrescreve o backup restaurado, mesmo no mesmo segundo
+        self.assertNotEqual(resultado["anterior"], resumo["caminho"])
+        self.assertEqual(len(backup_atendimento.listar_backups(self.caminho_banco)), 2)
+
+    def test_restauracao_sobre_banco_danificado(self):
+        resumo = self.fazer_backup()
+        antes = self.contar()
+        corromper_pagina(self.caminho_banco)
+        conexao = sqlite3.connect(self.caminho_banco)
+        self.assertNotEqual(conexao.execute("PRAGMA quick_check").fetchone()[0], "ok")
+        conexao.close()
+
+        resultado = self.restaurar(resumo["caminho"])
+        self.assertTrue(resultado["anterior_danificado"])
+        self.assertEqual(self.contar(), antes)
+        conexao = sqlite3.connect(self.caminho_banco)
+        self.assertEqual(conexao.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+        conexao.close()
+        # Os arquivos danificados ficam guardados, fora do rodízio dos backups
+        self.assertTrue(os.path.exists(resultado["anterior"]))
+        self.assertEqual([caminho for caminho, _, _ in backup_atendimento.listar_backups(self.caminho_banco)],
+                         [resumo["caminho"]])
+
+    def test_restauracao_pela_linha_de_comando_sobre_banco_danificado(self):
+        resumo = self.fazer_backup()
+        antes = self.contar()
+        corromper_pagina(self.caminho_banco)
+        corromper_pagina(caminho_arquivo_morto(self.caminho_banco))
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            codigo = cli_atendimento.main(["--banco", self.caminho_banco, "backup", "restaurar", resumo["caminho"]])
+        self.assertEqual(codigo, 0)
+        self.assertIn("estava danificado", saida.getvalue())
+        self.assertEqual(self.contar(), antes)
+
+    def test_trava_da_pasta(self):
+        pasta = backup_atendimento.pasta_backups(self.caminho_banco)
+        os.makedirs(pasta)
+        with backup_atendimento._trava_pasta(pasta):
+            with self.assertRaises(backup_atendimento.BackupEmAndamento):
+                self.fazer_backup()
+        # Uma trava abandonada (processo que morreu no meio do backup) é removida
+        caminho_trava = os.path.join(pasta, backup_atendimento.NOME_TRAVA)
+        open(caminho_trava, "w").close()
+        antiga = os.path.getmtime(caminho_trava) - backup_atendimento.VALIDADE_TRAVA_S - 1
+        os.utime(caminho_trava, (antiga, antiga))
+        self.fazer_backup()
+        self.assertFalse(os.path.exists(caminho_trava))
+
+
+if __name__ == "__main__":
+    unittest.main()
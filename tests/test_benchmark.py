@@ -0,0 +1,82 @@
+# Benchmark: dados sintéticos reproduzíveis e uma execução em pequena escala
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from auxiliares import abrir_model
+
+import benchmark_atendimento
+from atendimento_core import STATUS_CONCLUIDO, normalizar_cpf
+
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def popular(self, nome, semente=42):
+        model = abrir_model(os.path.join(self.pasta.name, nome))
+        self.addCleanup(model.fechar_conexao)
+        benchmark_atendimento.popular_banco(model, 60, 400, semente)
+        return model
+
+    def conteudo(self, model):
+        model.cursor.execute("SELECT cpf, nome, endereco, bairro, telefone, rg, titulo_eleitor, zona, secao FROM municipes ORDER BY cpf")
+        municipes = model.cursor.fetchall()
+        model.cursor.execute('''
+        SELECT id, cpf, tipo_pedido, descricao, data_horario, prazo_resolucao, assessor, prioridade, status, data_conclusao
+        FROM atendimentos ORDER BY id
+        ''')
+        return municipes, model.cursor.fetchall()
+
+    def test_cpfs_validos(self):
+        aleatorio = random.Random(7)
+        cpfs = [benchmark_atendimento.gerar_cpf(aleatorio) for _ in range(500)]
+        self.assertEqual([normalizar_cpf(cpf) for cpf in cpfs], cpfs)
+
+    def test_mesma_semente_mesmos_dados(self):
+        primeiro = self.conteudo(self.popular("primeiro.db"))
+        self.assertEqual(self.conteudo(self.popular("segundo.db")), primeiro)
+        self.assertNotEqual(self.conteudo(self.popular("outra_semente.db", semente=43)), primeiro)
+        municipes, atendimentos = primeiro
+        self.assertEqual((len(municipes), len(atendimentos)), (60, 400))
+
+    def test_dados_gerados(self):
+        model = self.popular("benchmark.db")
+        municipes, atendimentos = self.conteudo(model)
+        cpfs = {municipe[0] for municipe in municipes}
+        self.assertTrue(all(normalizar_cpf(cpf) == cpf for cpf in cpfs))
+        for _, cpf, _, _, data_horario, _, _, _, status, data_conclusao in atendimentos:
+            self.assertIn(cpf, cpfs)
+            self.assertTrue("2023-01-01" <= data_horario < "2025-01-01", data_horario)
+            # Só os concluídos têm data de conclusão, sempre depois do registro
+            if status == STATUS_CONCLUIDO:
+                self.assertGreaterEqual(data_conclusao, data_horario)
+            else:
+                self.assertIsNone(data_conclusao)
+        # Os triggers mantiveram o resumo e o agregado das estatísticas
+        self.assertEqual(model.verificar_resumo(corrigir=False), [])
+        self.assertEqual(model.agregar_atendimentos()[0][0], len(atendimentos))
+
+    def test_execucao_pequena(self):
+        model = self.popular("benchmark.db")
+        caminho_banco = model.caminho_banco
+        model.fechar_conexao()
+        with contextlib.redirect_stdout(io.StringIO()):
+            contagens, resultados = benchmark_atendimento.executar_benchmark(caminho_banco, repeticoes=2, filtro="consultar")
+        self.assertEqual(contagens, {"municipes": 60, "atendimentos": 400})
+        self.assertIn("consultar_atendimentos[filtro_cpf]", resultados)
+        self.assertNotIn("gerar_relatorio_municipe", resultados)
+        for medicao in resultados.values():
+            self.assertEqual(medicao["repeticoes"], 2)
+            self.assertLessEqual(medicao["minimo"], medicao["mediana"])
+        self.assertEqual(resultados["consultar_atendimentos"]["linhas"], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# Caches do controller (munícipes e agregações): nenhuma gravação pode deixar um resultado antigo no cache
+import os
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, cpf_valido, escrever_csv, registrar_atendimentos, registrar_municipes
+
+from atendimento_core import (
+    COLUNAS_ATENDIMENTOS, COLUNAS_MUNICIPES, STATUS_CONCLUIDO, AtendimentoController, CacheAgregacoes, CacheMunicipes,
+)
+
+# Agregações que as telas pedem, cada uma guardada no cache com a sua chave
+AGREGACOES = [
+    {"dimensoes": ("bairro",)},
+    {"dimensoes": ("status",), "metricas": ("total", "concluidos", "dias_resolucao")},
+    {"dimensoes": ("mes", "tipo_pedido"), "filtros": {"prioridade": "Normal"}},
+]
+
+
+class TestCachesController(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.model = abrir_model(os.path.join(self.pasta.name, "atendimentos.db"))
+        self.cpfs = registrar_municipes(self.model, 12)
+        self.ids = registrar_atendimentos(self.model, self.cpfs)
+        # Como no servidor: um controller grava, outro (de outra thread) consulta, com os mesmos caches
+        caches = {"cache_municipes": CacheMunicipes(), "cache_agregacoes": CacheAgregacoes()}
+        self.gravacao = AtendimentoController(self.model, **caches)
+        self.consulta = AtendimentoController(self.model, **caches)
+
+    def tearDown(self):
+        self.model.fechar_conexao()
+        self.pasta.cleanup()
+
+    def consultar(self, cpfs):
+        return ([self.consulta.agregar_atendimentos(**agregacao) for agregacao in AGREGACOES],
+                [self.consulta.buscar_municipe_por_cpf(cpf) for cpf in cpfs])
+
+    def conferir_gravacao(self, gravar, cpfs=()):
+        # Consulta duas vezes (a segunda vem do cache), grava e confere o que os caches devolvem com o banco
+        cpfs = list(cpfs) or self.cpfs[:3]
+        self.consultar(cpfs)
+        antes = self.consultar(cpfs)
+        versao = self.model.versao_alteracoes()
+        resultado = gravar()
+        depois = self.consultar(cpfs)
+        self.assertEqual(depois[0], [self.model.agregar_atendimentos(**agregacao) for agregacao in AGREGACOES])
+        self.assertEqual(depois[1], [self.model.buscar_municipe_por_cpf(cpf) for cpf in cpfs])
+        self.assertNotEqual(depois, antes)
+        self.assertEqual(self.model.verificar_resumo(corrigir=False), [])
+        return versao, resultado
+
+    def dados_municipe(self, cpf, **alterados):
+        municipe = dict(zip(["cpf", "nome", "endereco", "bairro", "telefone", "rg", "titulo_eleitor", "zona", "secao"],
+                            self.model.buscar_municipe_por_cpf(cpf)))
+        municipe.update(alterados)
+        return municipe
+
+    def test_consultas_repetidas_vem_do_cache(self):
+        self.consultar(self.cpfs[:3])
+        self.consultar(self.cpfs[:3])
+        self.assertEqual(self.consulta.estatisticas_cache_municipes()["acertos"], 3)
+        self.assertEqual(self.consulta.estatisticas_cache_agregacoes()["acertos"], len(AGREGACOES))
+
+    def test_registrar_municipe(self):
+        novo = cpf_valido(999)
+        self.assertIsNone(self.consulta.buscar_municipe_por_cpf(novo))
+        self.conferir_gravacao(lambda: self.gravacao.registrar_municipe(
+            novo, "Nova Pessoa", "Rua B", "Bairro 1", "11999990000", "", "", "", ""), [novo])
+        # Com o atendimento junto, as agregações também mudam
+        outro = cpf_valido(998)
+        self.conferir_gravacao(lambda: self.gravacao.registrar_municipe_com_atendimento(
+            outro, "Outra Pessoa", "Rua C", "Bairro 2", "11999990000", "", "", "", "",
+            "Saúde", "consulta", "", "2025-02-10 10:00:00", "10", "Assessor", "Normal"), [outro])
+
+    def test_atualizar_municipe(self):
+        cpf = self.cpfs[1]
+        versao, _ = self.conferir_gravacao(lambda: self.gravacao.atualizar_municipe(
+            **self.dados_municipe(cpf, nome="Nome Novo", bairro="Centro")), [cpf])
+        self.assertGreater(self.model.versao_alteracoes(), versao)
+        # Sem mudar nome nem bairro, só o cadastro muda; as agregações continuam valendo
+        self.gravacao.atualizar_municipe(**self.dados_municipe(cpf, telefone="11955554444"))
+        self.assertEqual(self.consulta.buscar_municipe_por_cpf(cpf)[4], "11955554444")
+
+    def test_registrar_e_atualizar_atendimento(self):
+        self.conferir_gravacao(lambda: registrar_atendimentos(self.gravacao, self.cpfs[:2], tipo_pedido="Saúde"))
+        self.conferir_gravacao(lambda: self.gravacao.atualizar_atendimento(
+            self.ids[0], self.cpfs[0], "Iluminação", "resolvido", STATUS_CONCLUIDO, "10", "Assessor", "Normal"))
+        self.conferir_gravacao(lambda: self.gravacao.mover_atendimento(self.ids[1], "Em Andamento"))
+
+    def test_importar_planilhas(self):
+        novo = cpf_valido(997)
+        caminho = escrever_csv(os.path.join(self.pasta.name, "municipes.csv"), COLUNAS_MUNICIPES, [
+            [novo, "Importada Souza", "Rua D", "Bairro 3", "11988887777", "", "", "", ""],
+        ])
+        _, resultado = self.conferir_gravacao(lambda: self.gravacao.importar_municipes_csv(caminho), [novo])
+        self.assertEqual(resultado["inseridos"], 1)
+
+        caminho = escrever_csv(os.path.join(self.pasta.name, "atendimentos.csv"), COLUNAS_ATENDIMENTOS, [
+            [cpf, "Saúde", "importado", "15/03/2025 09:00", "10", "Assessor", "Normal", STATUS_CONCLUIDO]
+            for cpf in (novo, *self.cpfs[:2])
+        ])
+        _, resultado = self.conferir_gravacao(lambda: self.gravacao.importar_atendimentos_csv(caminho))
+        self.assertEqual(resultado["inseridos"], 3)
+
+    def test_importar_pacote_sincronizacao(self):
+        # A outra estação recebe os dados, muda um munícipe de bairro e registra atendimentos
+        outra = abrir_model(os.path.join(self.pasta.name, "estacao_b.db"))
+        self.addCleanup(outra.fechar_conexao)
+        caminho = os.path.join(self.pasta.name, "pacote_ida.jsonl.gz")
+        self.model.exportar_pacote_sincronizacao(caminho, outra.estacao)
+        outra.importar_pacote_sincronizacao(caminho)
+        cpf = self.cpfs[2]
+        outra.atualizar_municipe(**self.dados_municipe(cpf, bairro="Jardim"))
+        registrar_atendimentos(outra, self.cpfs[:4], status=STATUS_CONCLUIDO, tipo_pedido="Saúde")
+
+        caminho = os.path.join(self.pasta.name, "pacote_volta.jsonl.gz")
+        outra.exportar_pacote_sincronizacao(caminho, self.model.estacao)
+        _, resultado = self.conferir_gravacao(lambda: self.gravacao.importar_pacote_sincronizacao(caminho), [cpf])
+        self.assertEqual(resultado["municipes"]["atualizados"], 1)
+        self.assertEqual(resultado["atendimentos"]["inseridos"], 4)
+        self.assertEqual(self.consulta.buscar_municipe_por_cpf(cpf)[3], "Jardim")
+
+
+if __name__ == "__main__":
+    unittest.main()
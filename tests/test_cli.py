@@ -0,0 +1,61 @@
+# Linha de comando: os mesmos comandos com o banco local e pelo servidor
+import contextlib
+import io
+import os
+import socket
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, cpf_valido, escrever_csv, servidor_local
+
+import cli_atendimento
+from atendimento_core import COLUNAS_MUNICIPES
+
+
+class TestLinhaDeComando(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho_banco = os.path.join(self.pasta.name, "atendimentos.db")
+        abrir_model(self.caminho_banco).fechar_conexao()
+        self.caminho_csv = escrever_csv(os.path.join(self.pasta.name, "municipes.csv"), COLUNAS_MUNICIPES, [
+            [cpf_valido(7), "Ana Souza", "Rua A", "Centro", "11988887777", "", "", "", ""],
+            ["111", "CPF Errado", "Rua C", "Centro", "11988887777", "", "", "", ""],
+        ])
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def executar(self, *argumentos):
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            codigo = cli_atendimento.main(list(argumentos))
+        return codigo, saida.getvalue()
+
+    def conferir_importacao(self, *conexao):
+        codigo, saida = self.executar(*conexao, "importar", "municipes", self.caminho_csv)
+        self.assertEqual(codigo, 1)  # há linhas rejeitadas
+        self.assertIn("Inseridos: 1  Duplicados: 0  Rejeitados: 1", saida)
+        self.assertIn("linha 3: CPF inválido", saida)
+        model = abrir_model(self.caminho_banco)
+        self.addCleanup(model.fechar_conexao)
+        self.assertEqual(model.buscar_municipe_por_cpf(cpf_valido(7))[1], "Ana Souza")
+
+    def test_importar_banco_local(self):
+        self.conferir_importacao("--banco", self.caminho_banco)
+
+    def test_importar_pelo_servidor(self):
+        with servidor_local(self.caminho_banco) as url:
+            self.conferir_importacao("--servidor", url)
+
+    def test_servidor_indisponivel(self):
+        # Uma porta sem servidor: a mensagem substitui o traceback
+        with socket.socket() as soquete:
+            soquete.bind(("127.0.0.1", 0))
+            porta = soquete.getsockname()[1]
+        with self.assertRaises(SystemExit) as contexto:
+            self.executar("--servidor", f"http://127.0.0.1:{porta}", "importar", "municipes", self.caminho_csv)
+        self.assertIn("Servidor indisponível", str(contexto.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+# Importação de munícipes e atendimentos por planilha CSV
+import os
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, cpf_valido, escrever_csv, registrar_municipes
+
+from atendimento_core import COLUNAS_ATENDIMENTOS, COLUNAS_MUNICIPES, STATUS_CONCLUIDO
+
+
+class TestImportacaoMunicipes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.model = abrir_model(os.path.join(self.pasta.name, "atendimentos.db"))
+        self.cpf_cadastrado = registrar_municipes(self.model, 1)[0]
+        linhas = [
+            [cpf_valido(7), "Ana Souza", "Rua A", "Centro", "(11) 98888-7777", "", "", "", ""],
+            [self.cpf_cadastrado, "Já Cadastrado", "Rua B", "Centro", "11988887777", "", "", "", ""],
+            ["123.456.789-00", "CPF Errado", "Rua C", "Centro", "11988887777", "", "", "", ""],
+            [cpf_valido(8), "", "Rua D", "Centro", "11988887777", "", "", "", ""],
+            [cpf_valido(9), "Sem Telefone", "Rua E", "Centro", "123", "", "", "", ""],
+        ]
+        self.caminho = escrever_csv(os.path.join(self.pasta.name, "municipes.csv"), COLUNAS_MUNICIPES, linhas)
+
+    def tearDown(self):
+        self.model.fechar_conexao()
+        self.pasta.cleanup()
+
+    def conferir(self, resultado):
+        self.assertEqual(resultado["inseridos"], 1)
+        self.assertEqual(resultado["duplicados"], 1)
+        self.assertEqual(resultado["rejeitados"], [(4, "CPF inválido"), (5, "Nome não informado"), (6, "Telefone inválido")])
+        municipe = self.model.buscar_municipe_por_cpf(cpf_valido(7))
+        self.assertEqual((municipe[1], municipe[4]), ("Ana Souza", "11988887777"))
+
+    def test_importacao(self):
+        self.conferir(self.model.importar_municipes_csv(self.caminho))
+
+    def test_importacao_dentro_de_transacao(self):
+        # O RELEASE do lote interno não pode zerar a contagem de inseridos e duplicados
+        with self.model.transacao():
+            resultado = self.model.importar_municipes_csv(self.caminho)
+        self.conferir(resultado)
+
+
+class TestImportacaoAtendimentos(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.model = abrir_model(os.path.join(self.pasta.name, "atendimentos.db"))
+        self.cpf = registrar_municipes(self.model, 1)[0]
+
+    def tearDown(self):
+        self.model.fechar_conexao()
+        self.pasta.cleanup()
+
+    def importar(self, *linhas):
+        # Cada linha: data_horario, prioridade, status (os demais campos são fixos)
+        caminho = escrever_csv(os.path.join(self.pasta.name, "atendimentos.csv"), COLUNAS_ATENDIMENTOS, [
+            [self.cpf, "Iluminação", "poste apagado", data_horario, "10", "Assessor", prioridade, status]
+            for data_horario, prioridade, status in linhas
+        ])
+        return self.model.importar_atendimentos_csv(caminho)
+
+    def gravados(self):
+        self.model.cursor.execute("SELECT data_horario, prioridade, status, data_conclusao FROM atendimentos ORDER BY id")
+        return self.model.cursor.fetchall()
+
+    def test_campos_normalizados(self):
+        resultado = self.importar(
+            ("2025-03-10 14:30:00", "Alta", "Pendente"),
+            ("15/03/2025 09:00", "urgente", "em andamento"),
+            ("2025-04-01", "", STATUS_CONCLUIDO),
+        )
+        self.assertEqual(resultado, {"inseridos": 3, "rejeitados": []})
+        self.assertEqual(self.gravados(), [
+            ("2025-03-10 14:30:00", "Alta", "Pendente", None),
+            ("2025-03-15 09:00:00", "Urgente", "Em Andamento", None),
+            ("2025-04-01 00:00:00", "Normal", STATUS_CONCLUIDO, "2025-04-01 00:00:00"),
+        ])
+
+    def test_linhas_invalidas_rejeitadas(self):
+        resultado = self.importar(
+            ("10 de março", "Alta", "Pendente"),
+            ("2025-13-40 10:00:00", "Alta", "Pendente"),
+            ("2025-03-10 10:00:00", "Altíssima", "Pendente"),
+            ("2025-03-10 10:00:00", "Alta", "Arquivado"),
+            ("2025-03-10 10:00:00", "Baixa", "Pendente"),
+        )
+        self.assertEqual(resultado["inseridos"], 1)
+        self.assertEqual(resultado["rejeitados"], [
+            (2, "Data do atendimento inválida"), (3, "Data do atendimento inválida"),
+            (4, "Prioridade desconhecida"), (5, "Status desconhecido"),
+        ])
+        self.assertEqual(self.gravados(), [("2025-03-10 10:00:00", "Baixa", "Pendente", None)])
+        # A coluna gerada data_limite continua calculável para o que foi gravado
+        self.model.cursor.execute("SELECT data_limite FROM atendimentos")
+        self.assertEqual(self.model.cursor.fetchone()[0], "2025-03-20 10:00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+# Atualização de um banco no formato original (sem migrações) até a versão atual, com a chave numérica
+# do CPF: CPFs formatados, cadastros repetidos com formatações diferentes e CPFs inválidos
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, cpf_valido
+
+from atendimento_core import AtendimentoController, MIGRACOES
+
+# Tabelas como o sistema as criava antes das migrações
+ESQUEMA_ORIGINAL = [
+    '''
+    CREATE TABLE municipes (
+        cpf TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        endereco TEXT,
+        bairro TEXT NOT NULL DEFAULT 'Bairro Não Informado',
+        telefone TEXT NOT NULL,
+        rg TEXT,
+        titulo_eleitor TEXT,
+        zona TEXT,
+        secao TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE atendimentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cpf TEXT NOT NULL,
+        tipo_pedido TEXT NOT NULL,
+        descricao TEXT,
+        anexos TEXT,
+        data_horario TEXT NOT NULL,
+        prazo_resolucao TEXT,
+        assessor TEXT,
+        prioridade TEXT NOT NULL DEFAULT 'Normal',
+        status TEXT NOT NULL DEFAULT 'Pendente',
+        FOREIGN KEY (cpf) REFERENCES municipes (cpf)
+    )
+    ''',
+]
+
+
+def formatado(cpf):
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+class TestMigracaoChaveCpf(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pasta = tempfile.TemporaryDirectory()
+        cls.caminho_banco = os.path.join(cls.pasta.name, "atendimentos.db")
+        cls.so_digitos = cpf_valido(101)    # gravado só com os dígitos e, depois, de novo com pontuação
+        cls.pontuado = cpf_valido(202)      # gravado só com pontuação
+        cls.duas_formas = cpf_valido(303)   # gravado com pontos e, depois, com espaços
+        cls.invalido = "123.456.789-00"
+        cadastros = [
+            (cls.so_digitos, "Ana Digitada", "Centro"),
+            (formatado(cls.pontuado), "Bruno Pontuado", "Vila Nova"),
+            (formatado(cls.duas_formas), "Carla Pontos", "Centro"),
+            (formatado(cls.so_digitos), "Ana Repetida", "Jardim"),
+            (" ".join((cls.duas_formas[:3], cls.duas_formas[3:6], cls.duas_formas[6:9], cls.duas_formas[9:])),
+             "Carla Espaços", "Jardim"),
+            (cls.invalido, "Davi Inválido", "Centro"),
+        ]
+        conexao = sqlite3.connect(cls.caminho_banco)
+        for comando in ESQUEMA_ORIGINAL:
+            conexao.execute(comando)
+        for cpf, nome, bairro in cadastros:
+            conexao.execute("INSERT INTO municipes (cpf, nome, endereco, bairro, telefone) VALUES (?, ?, 'Rua A', ?, '11999990000')",
+                            (cpf, nome, bairro))
+            # Dois atendimentos por cadastro, gravados com o CPF como estava no cadastro
+            for dia in (10, 11):
+                conexao.execute('''
+                INSERT INTO atendimentos (cpf, tipo_pedido, descricao, anexos, data_horario, prazo_resolucao, assessor)
+                VALUES (?, 'Iluminação', ?, '', ?, '10', 'Assessor')
+                ''', (cpf, f"pedido de {nome}", f"2024-05-{dia} 10:00:00"))
+        conexao.commit()
+        conexao.close()
+        cls.cadastros = cadastros
+        cls.model = abrir_model(cls.caminho_banco)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model.fechar_conexao()
+        cls.pasta.cleanup()
+
+    def test_versao_atual(self):
+        self.model.cursor.execute("PRAGMA user_version")
+        self.assertEqual(self.model.cursor.fetchone()[0], MIGRACOES[-1][0])
+        self.model.cursor.execute("PRAGMA integrity_check")
+        self.assertEqual(self.model.cursor.fetchone()[0], "ok")
+
+    def test_cadastros_unidos(self):
+        self.model.cursor.execute("SELECT cpf, nome FROM municipes ORDER BY cpf")
+        self.assertEqual(self.model.cursor.fetchall(), sorted([
+            (self.so_digitos, "Ana Digitada"),
+            (self.pontuado, "Bruno Pontuado"),
+            (self.duas_formas, "Carla Pontos"),
+            (self.invalido, "Davi Inválido"),
+        ]))
+        # Os repetidos ficam guardados para conferência, com o cadastro ao qual foram unidos
+        duplicados = [(cpf, mantido, nome, atendimentos) for cpf, mantido, nome, _, _, atendimentos, _
+                      in self.model.consultar_cpfs_duplicados()]
+        self.assertEqual(sorted(duplicados), sorted([
+            (formatado(self.so_digitos), self.so_digitos, "Ana Repetida", 2),
+            (self.cadastros[4][0], self.duas_formas, "Carla Espaços", 2),
+        ]))
+        self.assertEqual([linha[:2] for linha in self.model.consultar_cpfs_invalidos()], [(self.invalido, "Davi Inválido")])
+
+    def test_atendimentos_seguem_o_cadastro_mantido(self):
+        self.model.cursor.execute("SELECT cpf, COUNT(*) FROM atendimentos GROUP BY cpf ORDER BY cpf")
+        self.assertEqual(self.model.cursor.fetchall(), sorted([
+            (self.so_digitos, 4), (self.pontuado, 2), (self.duas_formas, 4), (self.invalido, 2),
+        ]))
+        # Nenhum atendimento ficou sem munícipe, e o resumo por bairro acompanhou a união
+        self.model.cursor.execute("SELECT COUNT(*) FROM atendimentos a JOIN municipes m ON a.cpf = m.cpf")
+        self.assertEqual(self.model.cursor.fetchone()[0], 12)
+        self.assertEqual(self.model.verificar_resumo(corrigir=False), [])
+        self.assertEqual(self.model.consultar_resumo()["bairro"], {"Centro": 10, "Vila Nova": 2})
+
+    def test_busca_por_qualquer_formato(self):
+        controller = AtendimentoController(self.model)
+        for cpf in (self.so_digitos, self.pontuado, self.duas_formas):
+            for variante in (cpf, formatado(cpf), f" {cpf[:3]} {cpf[3:6]} {cpf[6:9]} {cpf[9:]} ", int(cpf)):
+                self.assertEqual(self.model.buscar_municipe_por_cpf(variante)[0], cpf, variante)
+            self.assertEqual(len(controller.gerar_relatorio_municipe(formatado(cpf))),
+                             4 if cpf != self.pontuado else 2)
+        # O CPF inválido continua encontrado como foi gravado
+        self.assertEqual(self.model.buscar_municipe_por_cpf(self.invalido)[1], "Davi Inválido")
+
+    def test_chave_unica(self):
+        # Um novo cadastro do mesmo CPF com outra formatação não cria outro munícipe
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.model.cursor.execute("INSERT INTO municipes (cpf, nome, telefone) VALUES (?, 'Outra Ana', '1')",
+                                      (formatado(self.so_digitos),))
+        self.model.conexao.rollback()
+        self.model.cursor.execute("EXPLAIN QUERY PLAN SELECT cpf FROM municipes WHERE cpf_chave = ?", (int(self.pontuado),))
+        self.assertIn("idx_municipes_cpf_chave", " ".join(linha[3] for linha in self.model.cursor.fetchall()))
+
+    def test_migracao_repetida(self):
+        # Abrir de novo não aplica nada nem altera os cadastros
+        outro = abrir_model(self.caminho_banco)
+        self.addCleanup(outro.fechar_conexao)
+        self.assertEqual(sorted(outro.consultar_municipes()), sorted(self.model.consultar_municipes()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+# Navegação repetida entre as telas: o cache de telas e os widgets da janela não podem crescer sem limite
+# O cache do switch_view é conferido com telas de mentira, sem tela (DISPLAY); a navegação pelas telas
+# de verdade precisa de uma e é ignorada sem ela. Rodar com: python -m unittest discover tests
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import tkinter as tk
+
+# Quantas vezes todas as telas são percorridas
+CICLOS = 40
+
+# Tempo (s) dado às consultas em segundo plano ao fim de cada volta, antes de contar os widgets
+ESPERA_CONSULTAS_S = 0.1
+
+
+def _ha_tela():
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        return False
+    return True
+
+
+def _carregar_interface():
+    # O módulo da interface tem espaços no nome do arquivo
+    spec = importlib.util.spec_from_file_location("sistema_atendimento", os.path.join(RAIZ, "Sistema de Atendimento.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def _contar_widgets(widget):
+    return sum(1 + _contar_widgets(filho) for filho in widget.winfo_children())
+
+
+class ExecutorRegistrado:
+    # Registra os cancelamentos pedidos pela aplicação ao descartar uma tela
+    def __init__(self):
+        self.cancelados = []
+
+    def cancelar_de(self, dono):
+        self.cancelados.append(dono)
+
+
+class TelaFalsa:
+    # Mesmo uso que a aplicação faz de uma tela (ttk.Frame), registrando o que acontece com ela
+    construidas = []
+
+    def __init__(self, root, controller, switch_view, executor):
+        self.carregador = object()
+        self.exibicoes = 0
+        self.visivel = False
+        self.descartada = self.destruida = False
+        TelaFalsa.construidas.append(self)
+
+    def pack(self, **opcoes):
+        self.visivel = True
+
+    def pack_forget(self):
+        self.visivel = False
+
+    def ao_exibir(self):
+        self.exibicoes += 1
+
+    def ao_descartar(self):
+        self.descartada = True
+
+    def destroy(self):
+        self.destruida = True
+
+
+class TestCacheTelas(unittest.TestCase):
+    def setUp(self):
+        self.interface = _carregar_interface()
+        # A aplicação sem a janela: só o estado usado por switch_view e _descartar_view
+        self.app = object.__new__(self.interface.MainApplication)
+        self.app.root = None
+        self.app.controller = None
+        self.app.executor = ExecutorRegistrado()
+        self.app.current_view = None
+        self.app.views = OrderedDict()
+        self.app.limite_views = self.interface.LIMITE_VIEWS_EM_CACHE
+        TelaFalsa.construidas = []
+        self.telas = [type(f"Tela{indice}", (TelaFalsa,), {}) for indice in range(self.app.limite_views * 2)]
+
+    def test_tela_reaproveitada(self):
+        self.app.switch_view(self.telas[0])
+        self.app.switch_view(self.telas[1])
+        self.app.switch_view(self.telas[0])
+        self.assertEqual(len(TelaFalsa.construidas), 2)
+        primeira, segunda = TelaFalsa.construidas
+        self.assertIs(self.app.current_view, primeira)
+        self.assertEqual(primeira.exibicoes, 1)
+        self.assertTrue(primeira.visivel)
+        self.assertFalse(segunda.visivel)
+
+    def test_descarta_a_usada_ha_mais_tempo(self):
+        limite = self.app.limite_views
+        for tela in self.telas[:limite]:
+            self.app.switch_view(tela)
+        self.app.switch_view(self.telas[0])  # volta a ser a mais recente
+        self.app.switch_view(self.telas[limite])
+        descartada = TelaFalsa.construidas[1]
+        self.assertNotIn(self.telas[1], self.app.views)
+        self.assertEqual(list(self.app.views), [*self.telas[2:limite], self.telas[0], self.telas[limite]])
+        self.assertTrue(descartada.descartada and descartada.destruida)
+        # As consultas pendentes da tela e do carregador dela são canceladas
+        self.assertEqual(self.app.executor.cancelados, [descartada, descartada.carregador])
+
+    def test_navegacao_repetida(self):
+        for _ in range(CICLOS):
+            for tela in self.telas:
+                self.app.switch_view(tela)
+                self.assertLessEqual(len(self.app.views), self.app.limite_views)
+        vivas = [tela for tela in TelaFalsa.construidas if not tela.destruida]
+        self.assertEqual(len(vivas), self.app.limite_views)
+        self.assertEqual(set(vivas), set(self.app.views.values()))
+        # Toda tela destruída passou pelo descarte completo
+        for tela in TelaFalsa.construidas:
+            if tela.destruida:
+                self.assertTrue(tela.descartada)
+        self.assertEqual(sum(not tela.visivel for tela in vivas), self.app.limite_views - 1)
+
+
+@unittest.skipUnless(_ha_tela(), "sem tela disponível para o Tk")
+class TestNavegacaoMemoria(unittest.TestCase):
+    def setUp(self):
+        self.interface = _carregar_interface()
+        self.pasta = tempfile.TemporaryDirectory()
+        self.root = tk.Tk()
+        self.root.withdraw()
+        # Uma falha de consulta abriria uma caixa de mensagem e travaria o teste: registra e confere no final
+        self.erros = []
+        self.patch_erro = mock.patch.object(self.interface.messagebox, "showerror",
+                                            side_effect=lambda *args, **kwargs: self.erros.append(args))
+        self.patch_erro.start()
+        with contextlib.redirect_stdout(io.StringIO()):  # mensagens das migrações
+            self.app = self.interface.MainApplication(self.root, os.path.join(self.pasta.name, "atendimentos.db"))
+        # Telas do menu e a de diagnóstico; mais telas que o limite do cache, para forçar o descarte
+        self.telas = [
+            self.interface.DashboardView, self.interface.RegistroAtendimentoView, self.interface.RegistroMunicipeView,
+            self.interface.HistoricoAtendimentoView, self.interface.HistoricoMunicipeView, self.interface.RelatorioView,
+            self.interface.TarefasView, self.interface.DiagnosticoView,
+        ]
+
+    def tearDown(self):
+        self.app.fechar()
+        self.patch_erro.stop()
+        self.pasta.cleanup()
+
+    def percorrer_telas(self):
+        for tela in self.telas:
+            self.app.switch_view(tela)
+            # Deixa os resultados das consultas em segundo plano chegarem, como na navegação real
+            self.root.update()
+        limite = time.monotonic() + ESPERA_CONSULTAS_S
+        while time.monotonic() < limite:
+            self.root.update()
+            time.sleep(0.01)
+
+    def test_navegacao_repetida(self):
+        self.assertGreater(len(self.telas), self.app.limite_views)
+        self.percorrer_telas()
+        self.percorrer_telas()
+        filhos_iniciais = len(self.root.winfo_children())
+        widgets_iniciais = _contar_widgets(self.root)
+        for ciclo in range(CICLOS):
+            self.percorrer_telas()
+            self.assertLessEqual(len(self.app.views), self.app.limite_views)
+            self.assertLessEqual(len(self.root.winfo_children()), filhos_iniciais, f"ciclo {ciclo}")
+            self.assertLessEqual(_contar_widgets(self.root), widgets_iniciais, f"ciclo {ciclo}")
+        # Só as telas guardadas no cache continuam existindo
+        telas_vivas = [filho for filho in self.root.winfo_children() if type(filho) in self.telas]
+        self.assertEqual(len(telas_vivas), len(self.app.views))
+        self.assertEqual(self.erros, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# Planos de execução das consultas mais usadas: nenhuma pode ler atendimentos ou municipes inteiros
+# Rodar com: python -m unittest discover tests   (ou python -m pytest tests)
+import os
+import re
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, cpf_valido
+
+from atendimento_core import AtendimentoController, STATUS_CONCLUIDO
+
+# "SCAN <tabela>" sem índice é a leitura da tabela inteira; a e m são os apelidos usados nas consultas.
+# "SCAN a USING INDEX ..." é a leitura do índice em ordem, que termina no LIMIT da página
+_LEITURA_COMPLETA = re.compile(r"^SCAN (atendimentos|municipes|a|m)(?! USING (COVERING )?INDEX)\b")
+
+
+class TestPlanosConsulta(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pasta = tempfile.TemporaryDirectory()
+        cls.model = abrir_model(os.path.join(cls.pasta.name, "atendimentos.db"))
+        cls.controller = AtendimentoController(cls.model)
+        # Alguns milhares de linhas e estatísticas atualizadas, para o planejador decidir como em produção
+        status = ["Pendente", STATUS_CONCLUIDO, "Em Andamento"]
+        with cls.model.transacao():
+            for numero in range(1, 401):
+                cpf = cpf_valido(numero * 101)
+                cls.model.registrar_municipe(cpf, f"Pessoa {numero} Silva", "Rua das Flores", f"Bairro {numero % 9}",
+                                             "11999990000", "", "", "", "")
+                for indice in range(6):
+                    cls.model.registrar_atendimento(
+                        cpf, f"Tipo {indice % 4}", "buraco na rua", "", f"2025-{indice + 1:02d}-1{indice} 10:00:00",
+                        str(indice * 5 + 1), "Assessor", ["Baixa", "Normal", "Alta"][indice % 3], status[indice % 3]
+                    )
+        cls.model.cursor.execute("ANALYZE")
+        cls.model.conexao.commit()
+        cls.cpf = cpf_valido(505)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model.fechar_conexao()
+        cls.pasta.cleanup()
+
+    def planos(self, operacao):
+        # Executa a operação registrando as consultas (com os parâmetros já no texto) e devolve o plano de cada SELECT
+        consultas = []
+        self.model.conexao.set_trace_callback(consultas.append)
+        try:
+            operacao()
+        finally:
+            self.model.conexao.set_trace_callback(None)
+        planos = [
+            [linha[3] for linha in self.model.conexao.execute("EXPLAIN QUERY PLAN " + consulta)]
+            for consulta in consultas if consulta.lstrip().upper().startswith(("SELECT", "WITH"))
+        ]
+        self.assertTrue(planos, "a operação não executou nenhuma consulta")
+        return planos
+
+    def assertSemLeituraCompleta(self, operacao):
+        for plano in self.planos(operacao):
+            completas = [linha for linha in plano if _LEITURA_COMPLETA.match(linha)]
+            self.assertFalse(completas, f"leitura completa da tabela: {plano}")
+
+    def test_busca_por_cpf(self):
+        for cpf in (self.cpf, f"{self.cpf[:3]}.{self.cpf[3:6]}.{self.cpf[6:9]}-{self.cpf[9:]}"):
+            self.assertSemLeituraCompleta(lambda: self.model.buscar_municipe_por_cpf(cpf))
+            self.assertSemLeituraCompleta(lambda: self.model.buscar_municipes(cpf))
+        self.assertSemLeituraCompleta(lambda: self.model.buscar_municipes(self.cpf[:5]))
+
+    def test_busca_por_nome(self):
+        self.assertSemLeituraCompleta(lambda: self.model.buscar_municipes("Silva"))
+        self.assertSemLeituraCompleta(lambda: self.model.consultar_atendimentos_pagina(filtro_nome="Pessoa 12"))
+
+    def test_historico_paginado(self):
+        self.assertSemLeituraCompleta(lambda: self.model.consultar_atendimentos_pagina())
+        # A primeira página percorre o índice da data em ordem (sem ordenar a tabela inteira)
+        plano = self.planos(lambda: self.model.consultar_atendimentos_pagina())[0]
+        self.assertTrue(any("idx_atendimentos_data_horario" in linha for linha in plano), plano)
+        self.assertFalse(any("TEMP B-TREE" in linha for linha in plano), plano)
+        pagina, proximo = self.model.consultar_atendimentos_pagina()
+        self.assertSemLeituraCompleta(lambda: self.model.consultar_atendimentos_pagina(cursor=proximo))
+
+    def test_historico_por_cpf(self):
+        self.assertSemLeituraCompleta(lambda: self.model.consultar_atendimentos(filtro_cpf=self.cpf))
+        self.assertSemLeituraCompleta(lambda: self.controller.gerar_relatorio_municipe(self.cpf))
+
+    def test_fila_de_pendentes(self):
+        self.assertSemLeituraCompleta(lambda: self.controller.consultar_atrasados())
+        self.assertSemLeituraCompleta(lambda: self.controller.consultar_proximos_prazos())
+        self.assertSemLeituraCompleta(lambda: self.controller.contar_atrasados())
+        for status in ("Pendente", "Em Andamento"):
+            self.assertSemLeituraCompleta(lambda: self.controller.consultar_coluna_quadro(status))
+
+    def test_relatorios(self):
+        self.assertSemLeituraCompleta(lambda: self.controller.gerar_relatorio_tipo_pedido("Tipo 1"))
+        self.assertSemLeituraCompleta(lambda: self.controller.gerar_relatorio_bairro("Bairro 1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
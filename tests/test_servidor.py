@@ -0,0 +1,65 @@
+# Modo servidor: a estação usa o ControllerRemoto e o banco fica no servidor
+import contextlib
+import inspect
+import os
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, cpf_valido, escrever_csv, registrar_municipes, servidor_local
+
+from atendimento_core import AtendimentoController, COLUNAS_ATENDIMENTOS, COLUNAS_MUNICIPES
+from servidor_atendimento import ControllerRemoto, ErroServidor
+
+
+class TestServidor(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho_banco = os.path.join(self.pasta.name, "atendimentos.db")
+        model = abrir_model(self.caminho_banco)
+        self.cpf = registrar_municipes(model, 1)[0]
+        model.fechar_conexao()
+        self.pilha = contextlib.ExitStack()
+        self.controller = ControllerRemoto(self.pilha.enter_context(servidor_local(self.caminho_banco)))
+
+    def tearDown(self):
+        self.pilha.close()
+        self.pasta.cleanup()
+
+    def test_importacao_envia_o_conteudo(self):
+        caminho = escrever_csv(os.path.join(self.pasta.name, "municipes.csv"), COLUNAS_MUNICIPES, [
+            [cpf_valido(7), "Ana Souza", "Rua A", "Centro", "11988887777", "", "", "", ""],
+            [self.cpf, "Já Cadastrado", "Rua B", "Centro", "11988887777", "", "", "", ""],
+            ["111", "CPF Errado", "Rua C", "Centro", "11988887777", "", "", "", ""],
+        ])
+        resultado = self.controller.importar_municipes_csv(caminho)
+        self.assertEqual((resultado["inseridos"], resultado["duplicados"]), (1, 1))
+        self.assertEqual(resultado["rejeitados"], [[4, "CPF inválido"]])
+        self.assertEqual(self.controller.buscar_municipe_por_cpf(cpf_valido(7))[1], "Ana Souza")
+
+        caminho = escrever_csv(os.path.join(self.pasta.name, "atendimentos.csv"), COLUNAS_ATENDIMENTOS, [
+            [cpf_valido(7), "Iluminação", "poste apagado", "2025-03-10 10:00:00", "10", "Assessor", "Alta", "Pendente"],
+        ])
+        self.assertEqual(self.controller.importar_atendimentos_csv(caminho), {"inseridos": 1, "rejeitados": []})
+        self.assertEqual(self.controller.contar_atendimentos(), 1)
+
+    def test_operacoes_locais_recusadas(self):
+        for chamada in (
+            lambda: self.controller.exportar_pacote_sincronizacao("pacote.jsonl.gz"),
+            lambda: self.controller.importar_pacote_sincronizacao("pacote.jsonl.gz"),
+            self.controller.consultar_estacoes_sincronizacao,
+            self.controller.redefinir_estacao,
+            lambda: self.controller.arquivar_atendimentos("2020-01-01"),
+            lambda: self.controller.anexar_arquivo(1, "foto.jpg"),
+        ):
+            with self.assertRaises(ErroServidor):
+                chamada()
+
+    def test_nenhum_metodo_herdado_usa_o_model(self):
+        # Todo método do controller local que usa o banco precisa ser repassado ao servidor ou recusado
+        for nome, metodo in inspect.getmembers(AtendimentoController, inspect.isfunction):
+            if nome not in vars(ControllerRemoto) and "self.model" in inspect.getsource(metodo):
+                self.fail(f"ControllerRemoto herda {nome} sem repassar ao servidor")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+# Sincronização por pacotes entre duas estações: ida e volta, conflitos e pacotes repetidos
+import os
+import tempfile
+import unittest
+
+from auxiliares import abrir_model, registrar_atendimentos, registrar_municipes
+
+
+def conteudo(model):
+    # Linhas como a estação as enviaria (origem e id de origem, carimbos de conflito), em ordem
+    return {
+        tabela: sorted(linha for lote in model.iterar_consulta(query, parametros) for linha in lote)
+        for tabela, query, parametros in model._consultas_sincronizacao(None, None)
+    }
+
+
+class TestSincronizacao(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.a = abrir_model(os.path.join(self.pasta.name, "estacao_a.db"))
+        self.b = abrir_model(os.path.join(self.pasta.name, "estacao_b.db"))
+        self.cpfs = registrar_municipes(self.a, 30)
+        self.ids = registrar_atendimentos(self.a, self.cpfs)
+        self.pacotes = 0
+
+    def tearDown(self):
+        self.a.fechar_conexao()
+        self.b.fechar_conexao()
+        self.pasta.cleanup()
+
+    def enviar(self, origem, destino):
+        # Gera o pacote da origem para o destino e o importa; retorna (cabeçalho, resultado da importação)
+        self.pacotes += 1
+        caminho = os.path.join(self.pasta.name, f"pacote_{self.pacotes}.jsonl.gz")
+        cabecalho = origem.exportar_pacote_sincronizacao(caminho, destino.estacao)
+        return cabecalho, destino.importar_pacote_sincronizacao(caminho)
+
+    def id_em_b(self, id_em_a):
+        self.b.cursor.execute("SELECT id FROM atendimentos WHERE origem = ? AND origem_id = ?", (self.a.estacao, id_em_a))
+        return self.b.cursor.fetchone()[0]
+
+    def status(self, model, atendimento_id):
+        model.cursor.execute("SELECT status, descricao FROM atendimentos WHERE id = ?", (atendimento_id,))
+        return model.cursor.fetchone()
+
+    def atualizar(self, model, atendimento_id, status, descricao):
+        atendimento = model.buscar_atendimento_por_id(atendimento_id)
+        model.cursor.execute("SELECT cpf, tipo_pedido, prazo_resolucao, assessor, prioridade FROM atendimentos WHERE id = ?",
+                             (atendimento_id,))
+        cpf, tipo_pedido, prazo, assessor, prioridade = model.cursor.fetchone()
+        self.assertIsNotNone(atendimento)
+        model.atualizar_atendimento(atendimento_id, cpf, tipo_pedido, descricao, status, prazo, assessor, prioridade)
+
+    def test_ida_e_volta(self):
+        cabecalho, resultado = self.enviar(self.a, self.b)
+        self.assertTrue(cabecalho["completo"])
+        self.assertEqual(resultado["municipes"], {"inseridos": 30, "atualizados": 0, "ignorados": 0})
+        self.assertEqual(resultado["atendimentos"], {"inseridos": 30, "atualizados": 0, "ignorados": 0})
+        self.assertEqual(conteudo(self.a), conteudo(self.b))
+
+        # A outra estação grava também; o pacote de volta traz as gravações dela para a primeira
+        registrar_atendimentos(self.b, self.cpfs[:5], tipo_pedido="Saúde")
+        _, resultado = self.enviar(self.b, self.a)
+        self.assertEqual(resultado["atendimentos"]["inseridos"], 5)
+        self.assertEqual(resultado["atendimentos"]["atualizados"], 0)
+        self.assertEqual(conteudo(self.a), conteudo(self.b))
+
+        # Depois da confirmação, o próximo pacote leva só o que foi gravado em A desde então: a alteração e os
+        # 5 atendimentos recebidos de B (repassados, para uma terceira estação), que B ignora
+        self.atualizar(self.a, self.ids[0], "Em Andamento", "equipe enviada")
+        cabecalho, resultado = self.enviar(self.a, self.b)
+        self.assertFalse(cabecalho["completo"])
+        self.assertEqual(cabecalho["linhas"], {"municipes": 0, "atendimentos": 6})
+        self.assertEqual(resultado["atendimentos"], {"inseridos": 0, "atualizados": 1, "ignorados": 5})
+        self.assertEqual(conteudo(self.a), conteudo(self.b))
+
+    def test_conflito_vence_a_estacao_com_mais_alteracoes(self):
+        self.enviar(self.a, self.b)
+        id_b = self.id_em_b(self.ids[0])
+        # A altera uma vez; B altera duas (versão maior), mesmo que antes
+        self.atualizar(self.a, self.ids[0], "Em Andamento", "alterado em A")
+        self.atualizar(self.b, id_b, "Em Andamento", "primeira alteração em B")
+        self.atualizar(self.b, id_b, "Concluído", "alterado em B")
+        self.enviar(self.a, self.b)
+        self.enviar(self.b, self.a)
+        self.assertEqual(self.status(self.a, self.ids[0]), ("Concluído", "alterado em B"))
+        self.assertEqual(self.status(self.b, id_b), ("Concluído", "alterado em B"))
+
+        # Agora A passa à frente; a alteração dela vence nas duas estações, enviando em qualquer ordem
+        self.atualizar(self.a, self.ids[0], "Pendente", "reaberto em A")
+        self.atualizar(self.a, self.ids[0], "Em Andamento", "retomado em A")
+        self.atualizar(self.a, self.ids[0], "Concluído", "concluído de novo em A")
+        self.atualizar(self.b, id_b, "Pendente", "reaberto em B")
+        self.enviar(self.b, self.a)
+        self.enviar(self.a, self.b)
+        self.assertEqual(self.status(self.a, self.ids[0]), ("Concluído", "concluído de novo em A"))
+        self.assertEqual(self.status(self.b, id_b), ("Concluído", "concluído de novo em A"))
+        self.assertEqual(conteudo(self.a), conteudo(self.b))
+
+    def test_empate_de_versao_decidido_pela_data_e_pela_estacao(self):
+        self.enviar(self.a, self.b)
+        id_b = self.id_em_b(self.ids[1])
+        self.atualizar(self.a, self.ids[1], "Em Andamento", "alterado em A")
+        self.atualizar(self.b, id_b, "Em Andamento", "alterado em B")
+        # Mesma versão: vence a alteração mais recente
+        self.a.cursor.execute("UPDATE atendimentos SET alterado_em = '2025-05-01 10:00:00' WHERE id = ?", (self.ids[1],))
+        self.b.cursor.execute("UPDATE atendimentos SET alterado_em = '2025-05-01 09:00:00' WHERE id = ?", (id_b,))
+        self.a.conexao.commit()
+        self.b.conexao.commit()
+        self.enviar(self.b, self.a)
+        self.enviar(self.a, self.b)
+        self.assertEqual(self.status(self.b, id_b), ("Em Andamento", "alterado em A"))
+        self.assertEqual(conteudo(self.a), conteudo(self.b))
+
+        # Mesma versão e mesma data: vence a maior identificação de estação, nas duas estações
+        vencedora, perdedora = sorted([self.a, self.b], key=lambda model: model.estacao, reverse=True)
+        for model, descricao in ((vencedora, "da vencedora"), (perdedora, "da perdedora")):
+            atendimento_id = self.ids[1] if model is self.a else id_b
+            self.atualizar(model, atendimento_id, "Pendente", descricao)
+            model.cursor.execute("UPDATE atendimentos SET alterado_em = '2025-06-01 10:00:00' WHERE id = ?", (atendimento_id,))
+            model.conexao.commit()
+        self.enviar(self.a, self.b)
+        self.enviar(self.b, self.a)
+        self.assertEqual(self.status(self.a, self.ids[1])[1], "da vencedora")
+        self.assertEqual(self.status(self.b, id_b)[1], "da vencedora")
+
+    def test_conflito_no_municipe(self):
+        self.enviar(self.a, self.b)
+        cpf = self.cpfs[2]
+        dados = ["Rua Nova", "Centro", "11977776666", "", "", "", ""]
+        self.a.atualizar_municipe(cpf, "Nome em A", *dados)
+        self.b.atualizar_municipe(cpf, "Nome em B", *dados)
+        self.b.atualizar_municipe(cpf, "Nome em B de novo", *dados)
+        self.enviar(self.a, self.b)
+        self.enviar(self.b, self.a)
+        self.assertEqual(self.a.buscar_municipe_por_cpf(cpf)[1], "Nome em B de novo")
+        self.assertEqual(conteudo(self.a), conteudo(self.b))
+
+    def test_pacote_repetido_nao_altera_nada(self):
+        caminho = os.path.join(self.pasta.name, "pacote.jsonl.gz")
+        self.a.exportar_pacote_sincronizacao(caminho, self.b.estacao)
+        self.b.importar_pacote_sincronizacao(caminho)
+        antes = conteudo(self.b)
+        versao = self.b.versao_alteracoes()
+        resultado = self.b.importar_pacote_sincronizacao(caminho)
+        self.assertEqual(resultado["municipes"], {"inseridos": 0, "atualizados": 0, "ignorados": 30})
+        self.assertEqual(resultado["atendimentos"], {"inseridos": 0, "atualizados": 0, "ignorados": 30})
+        self.assertEqual(conteudo(self.b), antes)
+        self.assertEqual(self.b.versao_alteracoes(), versao)
+
+    def test_pacote_recusado(self):
+        caminho = os.path.join(self.pasta.name, "pacote.jsonl.gz")
+        self.a.exportar_pacote_sincronizacao(caminho, self.b.estacao)
+        with self.assertRaises(ValueError):
+            self.a.importar_pacote_sincronizacao(caminho)  # gerado pela própria estação
+        c = abrir_model(os.path.join(self.pasta.name, "estacao_c.db"))
+        self.addCleanup(c.fechar_conexao)
+        with self.assertRaises(ValueError):
+            c.importar_pacote_sincronizacao(caminho)  # gerado para outra estação
+        self.assertEqual(conteudo(c), {"municipes": [], "atendimentos": []})
+
+
+if __name__ == "__main__":
+    unittest.main()